@@ -1,12 +1,21 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, has_app_context, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 import mysql.connector
 from mysql.connector import Error
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
+import bisect
 import json
 import base64
+import urllib.error
+import urllib.request
 from werkzeug.utils import secure_filename
+from embedding_codec import blob_to_templates, templates_to_blob, pack_gallery, unpack_gallery, EMBEDDING_DIM, PACKED_CONTENT_TYPE
+from db_pool import ConnectionPool, POOL_SIZE, POOL_TIMEOUT
+from face_index import FaceIndex, IDENTIFY_THRESHOLD, MAX_TOP_K, MAX_QUERY_EMBEDDINGS
+from gallery_snapshot import GallerySnapshotCache, GALLERY_VERSION_FILE, GALLERY_CACHE_MAX_AGE
+from attendance_feed import AttendanceFeed, LONG_POLL_MAX_WAIT, CHANGES_LIMIT
+from photo_storage import PhotoStore, backend_from_env, ORIGINAL_KEY_PATTERN, PHOTO_WORKERS
 
 app = Flask(__name__)
 CORS(app)  # Izinkan akses dari frontend Kivy
@@ -20,8 +29,12 @@ DB_CONFIG = {
     'port': 3306
 }
 
+# Pool koneksi MySQL; DB_POOL_SIZE=0 menonaktifkan pooling (connect per request)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', POOL_SIZE))
+db_pool = ConnectionPool(DB_CONFIG, size=DB_POOL_SIZE, timeout=POOL_TIMEOUT)
+
 # ==================== KONFIGURASI UPLOAD ====================
-UPLOAD_FOLDER = '../uploads'  # Folder untuk menyimpan foto
+UPLOAD_FOLDER = '../uploads'  # Folder foto lama {nrp}_{timestamp}.jpg (masih bisa dirujuk foto_ref)
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
 # Buat folder uploads jika belum ada
@@ -30,18 +43,326 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # Maks 16MB
 
+# Foto absensi baru: content-addressed di subfolder hash, thumbnail/audit dibuat di background
+# (PHOTO_BACKEND=local|s3, lihat photo_storage.backend_from_env)
+photo_store = PhotoStore(backend_from_env(), workers=int(os.environ.get('PHOTO_WORKERS', PHOTO_WORKERS)))
+
+# ==================== KONFIGURASI FACE TEMPLATE ====================
+MAX_TEMPLATES_PER_NRP = 10  # Maksimal template embedding yang disimpan per karyawan
+# Kiosk sekarang meng-embed frame BGR dan mengirim `color_order`; kiosk lama tanpa field itu meng-embed RGB.
+# Template RGB tetap dipakai tetapi ditandai 'Perlu Daftar Ulang' di daftar karyawan
+FACE_COLOR_ORDERS = ('BGR', 'RGB')
+LEGACY_FACE_COLOR_ORDER = 'RGB'
+
+# ==================== KONFIGURASI ABSENSI ====================
+MAX_BATCH_RECORDS = 200  # Maksimal record per request /api/v2/absen/batch
+
+# ==================== KONFIGURASI LIST / PAGINATION ====================
+MAX_PAGE_SIZE = 1000     # Maksimal baris per halaman JSON; response memuat `next` untuk halaman berikutnya
+STREAM_BATCH_SIZE = 500  # Baris per fetchmany saat streaming NDJSON
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# ==================== KONFIGURASI SYNC ====================
+SYNC_CURSOR_FORMAT = "%Y-%m-%d %H:%M:%S"
+TOMBSTONE_RETENTION_DAYS = 30  # Tombstone dibersihkan setelah ini; cursor sebelumnya menerima full snapshot
+
+# Galeri wajah in-memory untuk /api/v2/identify (dimuat saat identify pertama)
+face_index = FaceIndex()
+# Proses identify khusus (lihat gunicorn.conf.py), mis. http://127.0.0.1:5001. Jika diisi, worker ini
+# meneruskan /api/v2/identify ke sana dan tidak pernah memuat face_index; kosong = dimuat di worker ini
+IDENTIFY_UPSTREAM = os.environ.get('IDENTIFY_UPSTREAM', '')
+IDENTIFY_UPSTREAM_TIMEOUT = 10  # Detik
+
+# Notifikasi long-poll /api/v2/absensi/changes
+attendance_feed = AttendanceFeed(lambda: read_attendance_seq())
+
+# Snapshot galeri yang sudah diserialisasi untuk API 1/1b; versi dibagi antar worker lewat file
+gallery_cache = GallerySnapshotCache(
+    os.environ.get('GALLERY_VERSION_FILE', GALLERY_VERSION_FILE),
+    max_age=float(os.environ.get('GALLERY_CACHE_MAX_AGE', GALLERY_CACHE_MAX_AGE))
+)
+
+# ==================== QUERY ABSENSI ====================
+# Filter per hari memakai rentang waktu pada kolom waktu apa adanya agar index idx_nrp_waktu /
+# idx_waktu terpakai; DATE(waktu) = %s memaksa scan seluruh tabel.
+# Dipakai juga oleh query_bench.py dan tests/test_query_plans.py untuk pemeriksaan EXPLAIN.
+
+# Absensi terakhir sebelum event terlambat: [awal hari, waktu kejadian]. Batas atas sengaja
+# tertutup seperti query lama (`waktu <= %s`), jadi absensi di detik yang sama tetap terhitung
+SQL_LAST_ABSENSI_OF_DAY = """
+    SELECT * FROM absensi 
+    WHERE nrp = %s AND waktu >= %s AND waktu <= %s
+    ORDER BY waktu DESC LIMIT 1
+"""
+# Semua absensi dalam rentang setengah terbuka [awal, akhir), mis. day_range(...)
+SQL_ABSENSI_BETWEEN = """
+    SELECT * FROM absensi 
+    WHERE waktu >= %s AND waktu < %s
+"""
+# Keyset pagination absensi urut (waktu, id) menurun; id ikut di ujung index sekunder InnoDB
+SQL_ABSENSI_KEYSET_AFTER = " AND (waktu < %s OR (waktu = %s AND id < %s))"
+SQL_ABSENSI_KEYSET_ORDER = " ORDER BY waktu DESC, id DESC"
+
+# Status absensi per karyawan per hari (tabel attendance_day), diperbarui dalam transaksi
+# yang sama dengan INSERT absensi. Assignment dievaluasi kiri ke kanan: last_status
+# dibandingkan dengan last_at lama sebelum last_at diperbarui.
+SQL_ATTENDANCE_DAY = """
+    SELECT nrp, tanggal, check_in_at, check_out_at, last_status, last_at
+    FROM attendance_day
+    WHERE nrp = %s AND tanggal = %s
+"""
+SQL_UPSERT_ATTENDANCE_DAY = """
+    INSERT INTO attendance_day (nrp, tanggal, check_in_at, check_out_at, last_status, last_at, seq)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        check_in_at = COALESCE(LEAST(check_in_at, VALUES(check_in_at)), check_in_at, VALUES(check_in_at)),
+        check_out_at = COALESCE(LEAST(check_out_at, VALUES(check_out_at)), check_out_at, VALUES(check_out_at)),
+        last_status = IF(VALUES(last_at) >= last_at, VALUES(last_status), last_status),
+        last_at = GREATEST(last_at, VALUES(last_at)),
+        seq = VALUES(seq)
+"""
+
+def day_range(waktu):
+    """Rentang [awal hari, awal hari berikutnya) yang memuat `waktu`"""
+    start = waktu.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(days=1)
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def save_photo(foto):
+    """Menyimpan FileStorage ke photo_store; mengembalikan nilai foto_path"""
+    ext = foto.filename.rsplit('.', 1)[1].lower()
+    return photo_store.location(photo_store.save(foto.read(), 'jpg' if ext == 'jpeg' else ext))
+
+def photo_ref_location(foto_ref):
+    """foto_path untuk foto_ref (key photo_store atau nama file lama di UPLOAD_FOLDER); None jika tidak ada"""
+    if ORIGINAL_KEY_PATTERN.match(foto_ref):
+        return photo_store.location(foto_ref) if photo_store.exists(foto_ref) else None
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(foto_ref))
+    return filepath if foto_ref and os.path.isfile(filepath) else None
+
+def normalize_templates(encodings):
+    """Mengubah encodings menjadi list template (list of list float), atau None jika tidak valid
+
+    Setiap template harus EMBEDDING_DIM dimensi: satu blob dengan dimensi lain
+    membuat blob_to_templates gagal untuk seluruh galeri dan identify.
+    """
+    if not isinstance(encodings, list) or len(encodings) == 0:
+        return None
+    # Format lama: satu vektor embedding
+    if not isinstance(encodings[0], list):
+        encodings = [encodings]
+    if any(not isinstance(t, list) or len(t) != EMBEDDING_DIM for t in encodings):
+        return None
+    return encodings[:MAX_TEMPLATES_PER_NRP]
+
 # ==================== FUNGSI DATABASE ====================
 def get_db_connection():
-    """Mendapatkan koneksi ke database MySQL"""
+    """Mendapatkan koneksi dari pool; close() mengembalikannya ke pool
+
+    Koneksi yang diambil selama request dicatat di flask.g dan dikembalikan
+    otomatis saat teardown, sehingga jalur error yang lupa menutup koneksi
+    tidak menghabiskan pool.
+    """
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
+        connection = db_pool.acquire()
     except Error as e:
         print(f"❌ Error koneksi database: {e}")
         return None
+    if has_app_context():
+        g.setdefault('db_connections', []).append(connection)
+    return connection
+
+@app.teardown_appcontext
+def release_db_connections(exc):
+    for connection in g.pop('db_connections', []):
+        if not connection.released:
+            db_pool.recovered_leak()
+            connection.close()
+
+def next_gallery_seq(cursor):
+    """Menaikkan sequence galeri wajah di transaksi yang mengubah karyawan
+
+    Sama seperti next_attendance_seq: baris gallery_seq terkunci sampai
+    commit, jadi perubahan yang commit belakangan selalu mendapat sequence
+    lebih besar dari cursor yang sudah dibagikan ke kiosk.
+    """
+    cursor.execute("UPDATE gallery_seq SET seq = LAST_INSERT_ID(seq + 1) WHERE id = 1")
+    cursor.execute("SELECT LAST_INSERT_ID() AS seq")
+    return cursor.fetchone()['seq']
+
+def record_tombstones(cursor, nrp_list, seq):
+    """Mencatat NRP yang akan dihapus agar kiosk bisa menghapusnya saat delta sync"""
+    placeholders = ', '.join(['%s'] * len(nrp_list))
+    cursor.execute(f"""
+        INSERT INTO karyawan_deleted (nrp, deleted_at, seq)
+        SELECT nrp, NOW(), %s FROM karyawan WHERE nrp IN ({placeholders})
+        ON DUPLICATE KEY UPDATE deleted_at = NOW(), seq = VALUES(seq)
+    """, [seq] + list(nrp_list))
+    # Cursor sebelum tombstone yang dibersihkan tidak bisa dilayani delta lagi
+    cursor.execute("""
+        UPDATE gallery_seq 
+        SET purged_seq = GREATEST(purged_seq, (
+            SELECT COALESCE(MAX(seq), 0) FROM karyawan_deleted WHERE deleted_at < NOW() - INTERVAL %s DAY
+        )) 
+        WHERE id = 1
+    """, (TOMBSTONE_RETENTION_DAYS,))
+    cursor.execute(
+        "DELETE FROM karyawan_deleted WHERE deleted_at < NOW() - INTERVAL %s DAY",
+        (TOMBSTONE_RETENTION_DAYS,)
+    )
+
+def parse_event_time(value):
+    """Waktu kejadian dari kiosk; default sekarang, tidak boleh di masa depan. None jika format salah"""
+    now = datetime.now().replace(microsecond=0)
+    if not value:
+        return now
+    try:
+        return min(datetime.strptime(value, SYNC_CURSOR_FORMAT), now)
+    except ValueError:
+        return None
+
+def resolve_absensi_status(absensi_terakhir, waktu):
+    """Status absensi baru berdasarkan absensi terakhir hari itu (None = belum absen)"""
+    if not absensi_terakhir:
+        return "Check In"
+
+    # Cek apakah sudah check out
+    waktu_absensi = absensi_terakhir['waktu']
+    if isinstance(waktu_absensi, str):
+        waktu_absensi = datetime.strptime(waktu_absensi, "%Y-%m-%d %H:%M:%S")
+
+    # Jika absensi terakhir adalah check in dan sudah lewat 4 jam
+    if "Check In" in absensi_terakhir['status'] and (waktu - waktu_absensi).seconds > 14400:
+        return "Check Out"
+    return f"Sudah {absensi_terakhir['status']}"
+
+def attendance_day_row(nrp, status, waktu, seq):
+    """Parameter SQL_UPSERT_ATTENDANCE_DAY untuk satu absensi baru"""
+    return (
+        nrp,
+        waktu.date(),
+        waktu if status == "Check In" else None,
+        waktu if status == "Check Out" else None,
+        status,
+        waktu,
+        seq
+    )
+
+def next_attendance_seq(cursor):
+    """Menaikkan sequence perubahan absensi; dipanggil tepat sebelum commit
+
+    Baris attendance_seq terkunci sampai commit, sehingga urutan sequence sama
+    dengan urutan commit dan klien yang melanjutkan dari `after` tidak
+    melewatkan perubahan yang commit belakangan.
+    """
+    cursor.execute("UPDATE attendance_seq SET seq = LAST_INSERT_ID(seq + 1) WHERE id = 1")
+    cursor.execute("SELECT LAST_INSERT_ID() AS seq")
+    return cursor.fetchone()['seq']
+
+def day_status(row):
+    """Status ringkas satu baris attendance_day untuk kiosk: Check In / Check Out"""
+    if row['check_out_at']:
+        return "Check Out"
+    if row['check_in_at']:
+        return "Check In"
+    return row['last_status']
+
+def absensi_response(absensi, latitude, longitude):
+    """Body response absensi (dipakai juga untuk event yang dikirim ulang)"""
+    waktu_str = absensi['waktu']
+    if isinstance(waktu_str, datetime):
+        waktu_str = waktu_str.strftime("%Y-%m-%d %H:%M:%S")
+    status = absensi['status']
+    return {
+        'status': 200,
+        'message': f'{status} Berhasil',
+        'data': {
+            'nrp': absensi['nrp'],
+            'name': absensi['nama'],
+            'waktu': waktu_str,
+            'status': status,
+            'latitude': latitude,
+            'longitude': longitude
+        }
+    }
+
+# ==================== PAGINATION ====================
+def parse_limit(default, maximum=MAX_PAGE_SIZE):
+    """Parameter ?limit=; None jika tidak valid"""
+    try:
+        limit = int(request.args.get('limit', default))
+    except ValueError:
+        return None
+    return limit if 1 <= limit <= maximum else None
+
+def wants_ndjson():
+    return request.args.get('format') == 'ndjson' or NDJSON_MIMETYPE in request.headers.get('Accept', '')
+
+def absensi_key(row):
+    """Cursor keyset absensi (waktu, id) urut menurun: 'YYYY-mm-dd HH:MM:SS|id'"""
+    return f"{row['waktu'].strftime(SYNC_CURSOR_FORMAT)}|{row['id']}"
+
+def parse_absensi_key(value):
+    """Kebalikan absensi_key; raise ValueError jika format salah"""
+    waktu, row_id = value.rsplit('|', 1)
+    return datetime.strptime(waktu, SYNC_CURSOR_FORMAT), int(row_id)
+
+def format_absensi_row(row):
+    if isinstance(row['waktu'], datetime):
+        row['waktu'] = row['waktu'].strftime("%Y-%m-%d %H:%M:%S")
+    return row
+
+def list_response(sql, params, limit, key_of, format_row=lambda row: row):
+    """Menjalankan query list keyset dan mengembalikan satu halaman JSON atau stream NDJSON
+
+    `sql` harus sudah berisi ORDER BY sesuai key dan diakhiri tanpa LIMIT.
+    JSON: paling banyak `limit` baris dan `next` (cursor `after` berikutnya,
+    None jika habis). NDJSON: satu objek per baris dibaca bertahap dengan
+    fetchmany sehingga memori tetap konstan; `limit` hanya berlaku jika
+    diberikan di query string.
+    """
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'status': 500, 'message': 'Database connection failed'}), 500
+    
+    if wants_ndjson():
+        cursor = connection.cursor(dictionary=True)  # Unbuffered: baris diambil dari server per batch
+        if 'limit' in request.args:
+            cursor.execute(sql + " LIMIT %s", list(params) + [limit])
+        else:
+            cursor.execute(sql, params)
+        
+        def generate():
+            try:
+                while True:
+                    rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+                    if not rows:
+                        break
+                    yield ''.join(app.json.dumps(format_row(row)) + '\n' for row in rows)
+            finally:
+                cursor.close()
+                connection.close()
+        
+        # stream_with_context: teardown (pengembalian koneksi ke pool) menunggu stream selesai
+        return Response(stream_with_context(generate()), status=200, mimetype=NDJSON_MIMETYPE)
+    
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute(sql + " LIMIT %s", list(params) + [limit + 1])
+    rows = cursor.fetchall()
+    cursor.close()
+    connection.close()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_key = key_of(rows[-1]) if has_more else None  # Sebelum format_row mengubah nilai kolom
+    return jsonify({
+        'status': 200,
+        'message': 'Success',
+        'data': [format_row(row) for row in rows],
+        'next': next_key
+    }), 200
 
 # ==================== API ENDPOINTS ====================
 
@@ -52,10 +373,13 @@ def home():
         'message': 'HRD Absensi API is running',
         'endpoints': [
             '/api/v2/face-recognition',
+            '/api/v2/face-recognition/packed',
             '/api/v2/face-recognition/register',
+            '/api/v2/identify',
             '/api/v2/absen',
             '/api/v2/karyawan/<nrp>',
             '/api/v2/absensi/today',
+            '/api/v2/absensi/changes',
             '/health'
         ]
     })
@@ -76,43 +400,313 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'database': db_status
+        'database': db_status,
+        'pool': db_pool.stats(),
+        'gallery_cache': gallery_cache.stats(),
+        'photo_store': photo_store.stats()
     })
 
+def parse_since_arg():
+    """Membaca parameter ?since=<cursor>; mengembalikan (gallery_seq|None, error_response|None)
+
+    Cursor lama berformat tanggal (sebelum gallery_seq) diperlakukan seperti
+    tanpa cursor sehingga kiosk menerima full snapshot sekali.
+    """
+    since = request.args.get('since')
+    if not since:
+        return None, None
+    if since.isdigit():
+        return int(since), None
+    try:
+        datetime.strptime(since, SYNC_CURSOR_FORMAT)
+        return None, None
+    except ValueError:
+        return None, (jsonify({'status': 400, 'message': 'Format since tidak valid'}), 400)
+
+def fetch_face_gallery(connection, since):
+    """Mengambil baris karyawan berwajah (full atau delta setelah gallery_seq `since`)
+
+    Mengembalikan (karyawan_list, deleted_nrps, seq, since). Semua query
+    dibaca dari satu snapshot konsisten, jadi `seq` (cursor berikutnya)
+    mencakup tepat perubahan yang dikembalikan. `since` menjadi None jika
+    tombstone setelah cursor sudah dibersihkan sehingga perlu full snapshot.
+    """
+    connection.start_transaction(consistent_snapshot=True, readonly=True)
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT seq, purged_seq FROM gallery_seq WHERE id = 1")
+        head = cursor.fetchone()
+        
+        if since is not None and since < head['purged_seq']:
+            since = None
+        
+        deleted_nrps = []
+        if since is not None:
+            cursor.execute("""
+                SELECT nrp, nama, face_embedding 
+                FROM karyawan 
+                WHERE face_embedding IS NOT NULL AND gallery_seq > %s
+                ORDER BY nrp
+            """, (since,))
+            karyawan_list = cursor.fetchall()
+            
+            cursor.execute("""
+                SELECT d.nrp 
+                FROM karyawan_deleted d
+                LEFT JOIN karyawan k ON k.nrp = d.nrp AND k.face_embedding IS NOT NULL
+                WHERE d.seq > %s AND k.nrp IS NULL
+            """, (since,))
+            deleted_nrps = [row['nrp'] for row in cursor.fetchall()]
+        else:
+            cursor.execute("""
+                SELECT nrp, nama, face_embedding 
+                FROM karyawan 
+                WHERE face_embedding IS NOT NULL 
+                ORDER BY nrp
+            """)
+            karyawan_list = cursor.fetchall()
+        
+        return karyawan_list, deleted_nrps, head['seq'], since
+    finally:
+        cursor.close()
+        connection.rollback()  # Transaksi baca saja
+
+def face_gallery_entry(nrp, nama, blob):
+    """Satu item `data` API 1 (face_encoding tetap JSON string untuk kiosk lama)"""
+    return {
+        'nrp': nrp,
+        'name': nama,
+        'face_encoding': json.dumps(blob_to_templates(blob).tolist())
+    }
+
+def face_gallery_json(karyawan_list, cursor, full, deleted_nrps):
+    """Body response API 1"""
+    formatted_data = [
+        face_gallery_entry(karyawan['nrp'], karyawan['nama'], karyawan['face_embedding'])
+        for karyawan in karyawan_list
+    ]
+    return {
+        'status': 200,
+        'message': 'Success',
+        'full': full,
+        'cursor': cursor,
+        'data': formatted_data,
+        'deleted': deleted_nrps
+    }
+
+def build_gallery_snapshot(version):
+    """Satu query galeri penuh -> (cursor, seq, bodies) untuk gallery_cache
+
+    Hanya format packed yang dibuat di sini; full snapshot JSON (beberapa kali
+    lebih besar) dibuat dari file packed saat pertama diminta, lihat iter_gallery_json.
+    """
+    connection = get_db_connection()
+    if not connection:
+        raise Error(msg='Database connection failed')
+    try:
+        karyawan_list, _, seq, _ = fetch_face_gallery(connection, None)
+    finally:
+        connection.close()
+    
+    cursor = str(seq)
+    bodies = {
+        'json_delta': app.json.dumps(face_gallery_json([], cursor, False, [])).encode('utf-8'),
+        'packed': pack_gallery(karyawan_list, cursor=cursor, full=True),
+        'packed_delta': pack_gallery([], cursor=cursor, full=False)
+    }
+    return cursor, seq, bodies
+
+def iter_gallery_json(snapshot):
+    """Full snapshot JSON dari file packed snapshot, ditulis per karyawan tanpa satu string besar di memori"""
+    with open(gallery_cache.body_path(snapshot, 'packed'), 'rb') as f:
+        header, matrix = unpack_gallery(f.read())
+    
+    # Amplop response dibuat oleh face_gallery_json, isi `data` ditulis bertahap di tempat placeholder
+    envelope = face_gallery_json([], snapshot.cursor, True, [])
+    envelope['data'] = '@@data@@'
+    head, tail = app.json.dumps(envelope).split('"@@data@@"')
+    yield head.encode('utf-8') + b'['
+    offset = 0
+    for i, entry in enumerate(header['index']):
+        templates = matrix[offset:offset + entry['count']]
+        offset += entry['count']
+        item = app.json.dumps(face_gallery_entry(entry['nrp'], entry['name'], templates.tobytes()))
+        yield (b',' if i else b'') + item.encode('utf-8')
+    yield b']' + tail.encode('utf-8')
+
+def cached_gallery_response(since, json_variant):
+    """Response dari snapshot jika `since` bisa dilayani tanpa query; None jika perlu delta dari database
+
+    Full snapshot dan cursor yang tidak lebih lama dari snapshot (tidak ada
+    perubahan sejak itu) dilayani dari file snapshot yang sudah diserialisasi.
+    """
+    snapshot = gallery_cache.get(build_gallery_snapshot)
+    if since is None:
+        variant = json_variant
+    elif since >= snapshot.seq:
+        variant = f'{json_variant}_delta'
+    else:
+        return None
+    
+    mimetype = 'application/json' if json_variant == 'json' else PACKED_CONTENT_TYPE
+    derive = iter_gallery_json if variant == 'json' else None
+    response = send_file(
+        gallery_cache.body_path(snapshot, variant, derive),
+        mimetype=mimetype,
+        etag=snapshot.etag_for(variant),
+        conditional=True,
+        max_age=None
+    )
+    response.headers['X-Gallery-Version'] = snapshot.version
+    return response
+
 # API 1: GET semua data karyawan untuk face recognition
 @app.route('/api/v2/face-recognition', methods=['GET'])
 def get_all_karyawan():
-    """Mengambil semua data karyawan yang memiliki face encoding"""
+    """Mengambil data karyawan yang memiliki face encoding
+
+    Tanpa parameter `since` dikembalikan seluruh data (full snapshot). Dengan
+    `since=<cursor>` hanya NRP yang berubah sejak cursor tersebut serta daftar
+    NRP yang dihapus. Cursor berikutnya dikirim di field `cursor`. Full
+    snapshot dan delta kosong dilayani dari gallery_cache (ETag/If-None-Match).
+    """
     try:
+        since, error = parse_since_arg()
+        if error:
+            return error
+        
+        cached = cached_gallery_response(since, 'json')
+        if cached is not None:
+            return cached
+        
         connection = get_db_connection()
         if not connection:
             return jsonify({'status': 500, 'message': 'Database connection failed'}), 500
         
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT nrp, nama, face_encoding 
-            FROM karyawan 
-            WHERE face_encoding IS NOT NULL 
-            ORDER BY nrp
-        """)
-        karyawan_list = cursor.fetchall()
+        try:
+            karyawan_list, deleted_nrps, seq, since = fetch_face_gallery(connection, since)
+        finally:
+            connection.close()
         
-        cursor.close()
-        connection.close()
+        return jsonify(face_gallery_json(
+            karyawan_list, str(seq), since is None, deleted_nrps
+        )), 200
         
-        # Format response
-        formatted_data = []
-        for karyawan in karyawan_list:
-            formatted_data.append({
-                'nrp': karyawan['nrp'],
-                'name': karyawan['nama'],
-                'face_encoding': karyawan['face_encoding']
-            })
+    except Exception as e:
+        return jsonify({'status': 500, 'message': str(e)}), 500
+
+# API 1b: GET galeri wajah dalam format biner
+@app.route('/api/v2/face-recognition/packed', methods=['GET'])
+def get_all_karyawan_packed():
+    """Seperti API 1, tetapi embedding dikirim sebagai satu buffer biner kontigu
+
+    Lihat embedding_codec.pack_gallery untuk format payload.
+    """
+    try:
+        since, error = parse_since_arg()
+        if error:
+            return error
+        
+        cached = cached_gallery_response(since, 'packed')
+        if cached is not None:
+            return cached
+        
+        connection = get_db_connection()
+        if not connection:
+            return jsonify({'status': 500, 'message': 'Database connection failed'}), 500
+        
+        try:
+            karyawan_list, deleted_nrps, seq, since = fetch_face_gallery(connection, since)
+        finally:
+            connection.close()
+        
+        payload = pack_gallery(
+            karyawan_list,
+            cursor=str(seq),
+            full=since is None,
+            deleted=deleted_nrps
+        )
+        return Response(payload, status=200, mimetype=PACKED_CONTENT_TYPE)
+        
+    except Exception as e:
+        return jsonify({'status': 500, 'message': str(e)}), 500
+
+def refresh_face_index():
+    """Delta sync face_index dari database; galeri lama tetap dipakai jika database gagal
+
+    Koneksi baru diambil di dalam `fetch`, yang dipanggil face_index hanya
+    setelah REFRESH_INTERVAL terlewati, jadi identify yang di-throttle tidak
+    menyentuh pool sama sekali.
+    """
+    def fetch(since):
+        connection = get_db_connection()
+        if not connection:
+            raise Error(msg='Database connection failed')
+        try:
+            return fetch_face_gallery(connection, since)
+        finally:
+            connection.close()
+    
+    try:
+        face_index.refresh(fetch)
+    except Error:
+        if not face_index.loaded:
+            raise
+
+def forward_identify():
+    """Meneruskan request identify apa adanya ke IDENTIFY_UPSTREAM"""
+    upstream = urllib.request.Request(
+        IDENTIFY_UPSTREAM.rstrip('/') + '/api/v2/identify',
+        data=request.get_data(),
+        headers={'Content-Type': request.content_type or 'application/json'},
+        method='POST'
+    )
+    try:
+        with urllib.request.urlopen(upstream, timeout=IDENTIFY_UPSTREAM_TIMEOUT) as response:
+            return Response(response.read(), status=response.status, mimetype='application/json')
+    except urllib.error.HTTPError as e:
+        return Response(e.read(), status=e.code, mimetype='application/json')
+    except OSError as e:
+        return jsonify({'status': 503, 'message': f'Proses identify tidak tersedia: {e}'}), 503
+
+# API 1c: Identifikasi wajah di server
+@app.route('/api/v2/identify', methods=['POST'])
+def identify_face():
+    """Mencocokkan satu atau beberapa embedding dengan galeri di server
+
+    Body JSON: `embeddings` (satu vektor atau list vektor), opsional `top_k`
+    dan `threshold`. Response `data[i].matches` berisi kandidat untuk
+    embedding ke-i, urut skor menurun.
+    """
+    if IDENTIFY_UPSTREAM:
+        return forward_identify()
+    try:
+        data = request.get_json(silent=True) or {}
+        embeddings = data.get('embeddings')
+        if not isinstance(embeddings, list) or len(embeddings) == 0:
+            return jsonify({'status': 400, 'message': 'Embeddings are required'}), 400
+        if not isinstance(embeddings[0], list):
+            embeddings = [embeddings]
+        if len(embeddings) > MAX_QUERY_EMBEDDINGS:
+            return jsonify({'status': 400, 'message': f'Maksimal {MAX_QUERY_EMBEDDINGS} embedding per request'}), 400
+        
+        refresh_face_index()
+        try:
+            top_k = min(max(int(data.get('top_k', 1)), 1), MAX_TOP_K)
+            threshold = float(data.get('threshold', IDENTIFY_THRESHOLD))
+            results = face_index.search(embeddings, top_k=top_k, threshold=threshold)
+        except (TypeError, ValueError) as e:
+            return jsonify({'status': 400, 'message': f'Invalid embeddings format: {e}'}), 400
         
         return jsonify({
             'status': 200,
             'message': 'Success',
-            'data': formatted_data
+            'gallery_size': len(face_index),
+            'gallery_version': face_index.version,
+            'data': [
+                {'matches': [{'nrp': nrp, 'name': name, 'score': score} for nrp, name, score in matches]}
+                for matches in results
+            ]
         }), 200
         
     except Exception as e:
@@ -131,12 +725,19 @@ def register_face():
         karyawan_data = data[0]
         nrp = karyawan_data.get('nrp')
         encodings = karyawan_data.get('encodings')
+        color_order = karyawan_data.get('color_order', LEGACY_FACE_COLOR_ORDER)
         
         if not nrp or not encodings:
             return jsonify({'status': 400, 'message': 'NRP and encodings are required'}), 400
+        if color_order not in FACE_COLOR_ORDERS:
+            return jsonify({'status': 400, 'message': f'color_order harus salah satu dari {", ".join(FACE_COLOR_ORDERS)}'}), 400
         
-        # Convert encodings ke JSON string
-        face_encoding_json = json.dumps(encodings)
+        templates = normalize_templates(encodings)
+        if templates is None:
+            return jsonify({'status': 400, 'message': f'Invalid encodings format (harus {EMBEDDING_DIM} dimensi)'}), 400
+        
+        # Simpan templates sebagai blob float16 (jumlah template x dim)
+        face_embedding_blob = templates_to_blob(templates)
         
         connection = get_db_connection()
         if not connection:
@@ -149,12 +750,13 @@ def register_face():
         existing = cursor.fetchone()
         
         if existing:
-            # Update face_encoding untuk karyawan yang sudah ada
+            # Update face_embedding untuk karyawan yang sudah ada (face_encoding JSON lama dikosongkan)
+            seq = next_gallery_seq(cursor)
             cursor.execute("""
                 UPDATE karyawan 
-                SET face_encoding = %s, updated_at = NOW() 
+                SET face_embedding = %s, face_encoding = NULL, face_color_order = %s, updated_at = NOW(), gallery_seq = %s 
                 WHERE nrp = %s
-            """, (face_encoding_json, nrp))
+            """, (face_embedding_blob, color_order, seq, nrp))
             nama = existing['nama']
             message = 'Face registration updated successfully'
         else:
@@ -170,12 +772,16 @@ def register_face():
         cursor.close()
         connection.close()
         
+        face_index.upsert(nrp, nama, templates)
+        gallery_cache.invalidate()
+        
         return jsonify({
             'status': 200,
             'message': message,
             'data': {
                 'nrp': nrp,
-                'name': nama
+                'name': nama,
+                'templates': len(templates)
             }
         }), 200
         
@@ -185,12 +791,18 @@ def register_face():
 # API 3: Absensi (Check In/Out)
 @app.route('/api/v2/absen', methods=['POST'])
 def absen():
-    """Mencatat absensi karyawan"""
+    """Mencatat absensi karyawan
+
+    Field opsional dari outbox kiosk: `waktu` (waktu kejadian, format
+    SYNC_CURSOR_FORMAT) dan `event_id` (idempotency key). Event yang sama
+    dikirim ulang mengembalikan absensi yang sudah tercatat.
+    """
     try:
         # Ambil data dari form-data
         nrp = request.form.get('nrp')
         latitude = request.form.get('latitude')
         longitude = request.form.get('longitude')
+        event_id = request.form.get('event_id') or None
         foto = request.files.get('foto')
         
         if not all([nrp, latitude, longitude, foto]):
@@ -199,21 +811,32 @@ def absen():
         # Validasi file foto
         if not allowed_file(foto.filename):
             return jsonify({'status': 400, 'message': 'Format file tidak valid'}), 400
+
+        waktu_sekarang = parse_event_time(request.form.get('waktu'))
+        if waktu_sekarang is None:
+            return jsonify({'status': 400, 'message': 'Format waktu tidak valid'}), 400
         
-        # Simpan foto
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{nrp}_{timestamp}.jpg"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        foto.save(filepath)
+        # Simpan foto sebelum transaksi agar kunci baris karyawan tidak menunggu I/O;
+        # event yang dikirim ulang menghasilkan key yang sama (tidak ditulis dua kali)
+        filepath = save_photo(foto)
         
         connection = get_db_connection()
         if not connection:
             return jsonify({'status': 500, 'message': 'Database connection failed'}), 500
         
         cursor = connection.cursor(dictionary=True)
-        
-        # Cek data karyawan
-        cursor.execute("SELECT nrp, nama FROM karyawan WHERE nrp = %s", (nrp,))
+
+        # Event yang sudah pernah tercatat (retry dari outbox kiosk)
+        if event_id:
+            cursor.execute("SELECT * FROM absensi WHERE event_id = %s", (event_id,))
+            existing = cursor.fetchone()
+            if existing:
+                cursor.close()
+                connection.close()
+                return jsonify(absensi_response(existing, latitude, longitude)), 200
+        
+        # Cek data karyawan; FOR UPDATE agar absensi paralel untuk NRP yang sama berurutan
+        cursor.execute("SELECT nrp, nama FROM karyawan WHERE nrp = %s FOR UPDATE", (nrp,))
         karyawan = cursor.fetchone()
         
         if not karyawan:
@@ -222,72 +845,202 @@ def absen():
             return jsonify({'status': 404, 'message': 'Karyawan tidak ditemukan'}), 404
         
         nama = karyawan['nama']
-        waktu_sekarang = datetime.now()
-        tanggal_hari_ini = waktu_sekarang.strftime("%Y-%m-%d")
         
-        # Cek absensi hari ini
-        cursor.execute("""
-            SELECT * FROM absensi 
-            WHERE nrp = %s AND DATE(waktu) = %s
-            ORDER BY waktu DESC LIMIT 1
-        """, (nrp, tanggal_hari_ini))
-        
-        absensi_terakhir = cursor.fetchone()
+        # Status hari ini cukup satu lookup primary key di attendance_day
+        cursor.execute(SQL_ATTENDANCE_DAY, (nrp, waktu_sekarang.date()))
+        state = cursor.fetchone()
+        if state is None:
+            absensi_terakhir = None
+        elif state['last_at'] <= waktu_sekarang:
+            absensi_terakhir = {'waktu': state['last_at'], 'status': state['last_status']}
+        else:
+            # Event terkirim terlambat (sudah ada absensi lebih baru): cari absensi sebelum waktu kejadian
+            day_start, _ = day_range(waktu_sekarang)
+            cursor.execute(SQL_LAST_ABSENSI_OF_DAY, (nrp, day_start, waktu_sekarang))
+            absensi_terakhir = cursor.fetchone()
         
         # Tentukan status
-        if not absensi_terakhir:
-            status = "Check In"
-        else:
-            # Cek apakah sudah check out
-            waktu_absensi = absensi_terakhir['waktu']
-            if isinstance(waktu_absensi, str):
-                waktu_absensi = datetime.strptime(waktu_absensi, "%Y-%m-%d %H:%M:%S")
-            
-            # Jika absensi terakhir adalah check in dan sudah lewat 4 jam
-            if "Check In" in absensi_terakhir['status'] and (datetime.now() - waktu_absensi).seconds > 14400:
-                status = "Check Out"
-            else:
-                status = f"Sudah {absensi_terakhir['status']}"
+        status = resolve_absensi_status(absensi_terakhir, waktu_sekarang)
         
         # Simpan data absensi
-        cursor.execute("""
-            INSERT INTO absensi (nrp, nama, status, latitude, longitude, foto_path)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (nrp, nama, status, str(latitude), str(longitude), filepath))
-        
-        connection.commit()
+        try:
+            cursor.execute("""
+                INSERT INTO absensi (nrp, nama, status, waktu, latitude, longitude, foto_path, event_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """, (nrp, nama, status, waktu_sekarang, str(latitude), str(longitude), filepath, event_id))
+            new_id = cursor.lastrowid
+            seq = next_attendance_seq(cursor)
+            cursor.execute(SQL_UPSERT_ATTENDANCE_DAY, attendance_day_row(nrp, status, waktu_sekarang, seq))
+            connection.commit()
+            attendance_feed.publish(seq)
+        except mysql.connector.IntegrityError:
+            # Request paralel dengan event_id yang sama sudah lebih dulu tercatat
+            if not event_id:
+                raise
+            connection.rollback()
+            cursor.execute("SELECT * FROM absensi WHERE event_id = %s", (event_id,))
+            existing = cursor.fetchone()
+            cursor.close()
+            connection.close()
+            return jsonify(absensi_response(existing, latitude, longitude)), 200
         
         # Ambil data yang baru disimpan
-        cursor.execute("""
-            SELECT * FROM absensi 
-            WHERE id = LAST_INSERT_ID()
-        """)
+        cursor.execute("SELECT * FROM absensi WHERE id = %s", (new_id,))
         new_absensi = cursor.fetchone()
         
         cursor.close()
         connection.close()
         
-        # Format response
-        waktu_str = new_absensi['waktu']
-        if isinstance(waktu_str, datetime):
-            waktu_str = waktu_str.strftime("%Y-%m-%d %H:%M:%S")
-        
-        return jsonify({
-            'status': 200,
-            'message': f'{status} Berhasil',
-            'data': {
-                'nrp': nrp,
-                'name': nama,
-                'waktu': waktu_str,
-                'status': status,
-                'latitude': latitude,
-                'longitude': longitude
-            }
-        }), 200
+        return jsonify(absensi_response(new_absensi, latitude, longitude)), 200
         
     except Exception as e:
         return jsonify({'status': 500, 'message': str(e)}), 500
 
+# API 3b: Absensi batch (backlog kiosk / pergantian shift)
+@app.route('/api/v2/absen/batch', methods=['POST'])
+def absen_batch():
+    """Mencatat banyak absensi dalam satu transaksi
+
+    Form-data `records` berisi JSON list {event_id, nrp, latitude, longitude,
+    waktu, foto | foto_ref}: `foto` adalah nama part file pada multipart yang
+    sama, `foto_ref` key foto yang sudah tersimpan (atau nama file lama di
+    folder uploads). Status check
+    in/check out seluruh record ditentukan dari satu query riwayat; response
+    berisi hasil per record dengan urutan yang sama seperti request.
+    """
+    connection = None
+    try:
+        try:
+            records = json.loads(request.form.get('records', ''))
+        except ValueError:
+            return jsonify({'status': 400, 'message': 'records harus berupa JSON list'}), 400
+
+        if not isinstance(records, list) or len(records) == 0:
+            return jsonify({'status': 400, 'message': 'records tidak boleh kosong'}), 400
+        if len(records) > MAX_BATCH_RECORDS:
+            return jsonify({'status': 400, 'message': f'Maksimal {MAX_BATCH_RECORDS} record per batch'}), 400
+
+        results = [None] * len(records)
+        valid = []  # (index, record, waktu)
+        photo_paths = {}  # index -> foto_path (foto upload sudah disimpan, atau foto_ref)
+        for i, record in enumerate(records):
+            if not isinstance(record, dict) or not all(record.get(k) for k in ('nrp', 'latitude', 'longitude')):
+                results[i] = {'status': 400, 'message': 'Semua field harus diisi'}
+                continue
+            waktu = parse_event_time(record.get('waktu'))
+            if waktu is None:
+                results[i] = {'status': 400, 'message': 'Format waktu tidak valid'}
+                continue
+            foto = request.files.get(record.get('foto') or '')
+            if foto is not None:
+                if not allowed_file(foto.filename):
+                    results[i] = {'status': 400, 'message': 'Format file tidak valid'}
+                    continue
+                # Disimpan sebelum transaksi (seperti absen) agar I/O foto di luar kunci FOR UPDATE
+                photo_paths[i] = save_photo(foto)
+            else:
+                photo_paths[i] = photo_ref_location(str(record.get('foto_ref') or ''))
+                if photo_paths[i] is None:
+                    results[i] = {'status': 400, 'message': 'Foto tidak ditemukan'}
+                    continue
+            valid.append((i, record, waktu))
+
+        if not valid:
+            return jsonify({'status': 200, 'message': 'Batch diproses', 'data': results}), 200
+
+        connection = get_db_connection()
+        if not connection:
+            return jsonify({'status': 500, 'message': 'Database connection failed'}), 500
+
+        cursor = connection.cursor(dictionary=True)
+        connection.start_transaction()
+
+        # Event yang sudah pernah tercatat (retry dari outbox kiosk)
+        event_ids = list({record['event_id'] for _, record, _ in valid if record.get('event_id')})
+        existing = {}
+        if event_ids:
+            placeholders = ', '.join(['%s'] * len(event_ids))
+            cursor.execute(f"SELECT * FROM absensi WHERE event_id IN ({placeholders})", event_ids)
+            existing = {row['event_id']: row for row in cursor.fetchall()}
+
+        # Data karyawan; FOR UPDATE agar request paralel untuk NRP yang sama berurutan
+        nrps = sorted({str(record['nrp']) for _, record, _ in valid})
+        placeholders = ', '.join(['%s'] * len(nrps))
+        cursor.execute(f"SELECT nrp, nama FROM karyawan WHERE nrp IN ({placeholders}) FOR UPDATE", nrps)
+        karyawan = {row['nrp']: row['nama'] for row in cursor.fetchall()}
+
+        # Riwayat absensi semua NRP pada rentang tanggal batch dalam satu query
+        first_day, _ = day_range(min(waktu for _, _, waktu in valid))
+        _, last_day = day_range(max(waktu for _, _, waktu in valid))
+        cursor.execute(f"""
+            SELECT nrp, status, waktu FROM absensi
+            WHERE nrp IN ({placeholders}) AND waktu >= %s AND waktu < %s
+        """, nrps + [first_day, last_day])
+        history = {}
+        for row in cursor.fetchall():
+            bisect.insort(history.setdefault(row['nrp'], []), (row['waktu'], row['status'] or ''))
+
+        rows = []
+        processed = {}
+        # Diproses urut waktu kejadian agar check in/check out dalam satu batch konsisten
+        for i, record, waktu in sorted(valid, key=lambda v: v[2]):
+            nrp = str(record['nrp'])
+            event_id = record.get('event_id') or None
+            latitude, longitude = str(record['latitude']), str(record['longitude'])
+
+            if event_id in existing:
+                results[i] = absensi_response(existing[event_id], latitude, longitude)
+                continue
+            if event_id in processed:
+                results[i] = results[processed[event_id]]
+                continue
+            if nrp not in karyawan:
+                results[i] = {'status': 404, 'message': 'Karyawan tidak ditemukan'}
+                continue
+
+            # Absensi terakhir pada hari yang sama sebelum waktu kejadian
+            day_start, _ = day_range(waktu)
+            entries = history.setdefault(nrp, [])
+            pos = bisect.bisect_right(entries, (waktu, chr(0x10FFFF)))
+            absensi_terakhir = None
+            if pos > 0 and entries[pos - 1][0] >= day_start:
+                absensi_terakhir = {'waktu': entries[pos - 1][0], 'status': entries[pos - 1][1]}
+            status = resolve_absensi_status(absensi_terakhir, waktu)
+
+            filepath = photo_paths[i]
+
+            rows.append((nrp, karyawan[nrp], status, waktu, latitude, longitude, filepath, event_id))
+            bisect.insort(entries, (waktu, status))
+            if event_id:
+                processed[event_id] = i
+            results[i] = absensi_response(
+                {'nrp': nrp, 'nama': karyawan[nrp], 'status': status, 'waktu': waktu}, latitude, longitude
+            )
+
+        if rows:
+            cursor.executemany("""
+                INSERT INTO absensi (nrp, nama, status, waktu, latitude, longitude, foto_path, event_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """, rows)
+            seq = next_attendance_seq(cursor)
+            cursor.executemany(
+                SQL_UPSERT_ATTENDANCE_DAY, [attendance_day_row(row[0], row[2], row[3], seq) for row in rows]
+            )
+        connection.commit()
+        if rows:
+            attendance_feed.publish(seq)
+
+        cursor.close()
+        connection.close()
+
+        return jsonify({'status': 200, 'message': f'{len(rows)} absensi dicatat', 'data': results}), 200
+
+    except Exception as e:
+        if connection is not None:
+            connection.rollback()
+            connection.close()
+        return jsonify({'status': 500, 'message': str(e)}), 500
+
 # API 4: Get data karyawan by NRP
 @app.route('/api/v2/karyawan/<nrp>', methods=['GET'])
 def get_karyawan(nrp):
@@ -325,16 +1078,21 @@ def delete_karyawan(nrp):
         if not connection:
             return jsonify({'status': 500, 'message': 'Database connection failed'}), 500
         
-        cursor = connection.cursor()
+        cursor = connection.cursor(dictionary=True)
+        
+        record_tombstones(cursor, [nrp], next_gallery_seq(cursor))
         
         # Hapus data karyawan (ON DELETE CASCADE akan menghapus absensi)
         cursor.execute("DELETE FROM karyawan WHERE nrp = %s", (nrp,))
+        affected_rows = cursor.rowcount
         connection.commit()
         
-        affected_rows = cursor.rowcount
         cursor.close()
         connection.close()
         
+        face_index.remove([nrp])
+        gallery_cache.invalidate()
+        
         if affected_rows > 0:
             return jsonify({
                 'status': 200,
@@ -361,19 +1119,24 @@ def delete_multiple_karyawan():
         if not connection:
             return jsonify({'status': 500, 'message': 'Database connection failed'}), 500
         
-        cursor = connection.cursor()
+        cursor = connection.cursor(dictionary=True)
+        
+        record_tombstones(cursor, nrp_list, next_gallery_seq(cursor))
         
         # Format untuk query IN
         placeholders = ', '.join(['%s'] * len(nrp_list))
         query = f"DELETE FROM karyawan WHERE nrp IN ({placeholders})"
         
         cursor.execute(query, nrp_list)
+        deleted_count = cursor.rowcount
         connection.commit()
         
-        deleted_count = cursor.rowcount
         cursor.close()
         connection.close()
         
+        face_index.remove(nrp_list)
+        gallery_cache.invalidate()
+        
         return jsonify({
             'status': 200,
             'message': f'{deleted_count} data karyawan berhasil dihapus',
@@ -386,35 +1149,134 @@ def delete_multiple_karyawan():
 # API 7: Get absensi hari ini
 @app.route('/api/v2/absensi/today', methods=['GET'])
 def get_absensi_today():
-    """Mengambil semua data absensi hari ini"""
+    """Mengambil semua data absensi hari ini
+
+    `?view=status` mengembalikan peta ringkas {nrp: "Check In" | "Check Out"}
+    dari attendance_day (tanpa foto_path/lokasi) untuk kiosk, beserta
+    `cursor` untuk melanjutkan lewat /api/v2/absensi/changes.
+    
+    List lengkap dipaginasi keyset (`limit`, `after`=`next` halaman
+    sebelumnya) atau di-stream dengan `format=ndjson`.
+    """
     try:
-        connection = get_db_connection()
-        if not connection:
-            return jsonify({'status': 500, 'message': 'Database connection failed'}), 500
+        if request.args.get('view') == 'status':
+            connection = get_db_connection()
+            if not connection:
+                return jsonify({'status': 500, 'message': 'Database connection failed'}), 500
+            
+            cursor = connection.cursor(dictionary=True)
+            today = datetime.now().date()
+            # Sequence dan peta status dibaca dalam snapshot transaksi yang sama
+            cursor.execute("SELECT seq FROM attendance_seq WHERE id = 1")
+            seq = cursor.fetchone()['seq']
+            cursor.execute("""
+                SELECT nrp, check_in_at, check_out_at, last_status FROM attendance_day 
+                WHERE tanggal = %s
+            """, (today,))
+            status_map = {row['nrp']: day_status(row) for row in cursor.fetchall()}
+            cursor.close()
+            connection.close()
+            return jsonify({
+                'status': 200,
+                'message': 'Success',
+                'tanggal': today.strftime("%Y-%m-%d"),
+                'cursor': seq,
+                'data': status_map
+            }), 200
         
-        cursor = connection.cursor(dictionary=True)
+        limit = parse_limit(MAX_PAGE_SIZE)
+        if limit is None:
+            return jsonify({'status': 400, 'message': f'limit harus 1-{MAX_PAGE_SIZE}'}), 400
+        sql = SQL_ABSENSI_BETWEEN
+        params = list(day_range(datetime.now()))
+        if request.args.get('after'):
+            try:
+                after_waktu, after_id = parse_absensi_key(request.args['after'])
+            except ValueError:
+                return jsonify({'status': 400, 'message': 'Format after tidak valid'}), 400
+            sql += SQL_ABSENSI_KEYSET_AFTER
+            params += [after_waktu, after_waktu, after_id]
+        sql += SQL_ABSENSI_KEYSET_ORDER
+        
+        return list_response(sql, params, limit, absensi_key, format_absensi_row)
         
-        today = datetime.now().strftime("%Y-%m-%d")
+    except Exception as e:
+        return jsonify({'status': 500, 'message': str(e)}), 500
+
+def read_attendance_seq():
+    """Sequence perubahan absensi terakhir yang sudah di-commit (dipakai poller attendance_feed)"""
+    connection = get_db_connection()
+    if not connection:
+        raise Error(msg='Database connection failed')
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT seq FROM attendance_seq WHERE id = 1")
+        seq = cursor.fetchone()[0]
+        cursor.close()
+        return seq
+    finally:
+        connection.close()
+
+def fetch_attendance_changes(after):
+    """Baris attendance_day dengan seq > after, urut seq"""
+    connection = get_db_connection()
+    if not connection:
+        raise Error(msg='Database connection failed')
+    try:
+        cursor = connection.cursor(dictionary=True)
         cursor.execute("""
-            SELECT * FROM absensi 
-            WHERE DATE(waktu) = %s 
-            ORDER BY waktu DESC
-        """, (today,))
-        
-        absensi_list = cursor.fetchall()
-        
-        # Format datetime ke string
-        for absensi in absensi_list:
-            if isinstance(absensi['waktu'], datetime):
-                absensi['waktu'] = absensi['waktu'].strftime("%Y-%m-%d %H:%M:%S")
-        
+            SELECT nrp, tanggal, check_in_at, check_out_at, last_status, last_at, seq 
+            FROM attendance_day 
+            WHERE seq > %s 
+            ORDER BY seq 
+            LIMIT %s
+        """, (after, CHANGES_LIMIT))
+        rows = cursor.fetchall()
         cursor.close()
+        return rows
+    finally:
         connection.close()
+
+# API 7b: Long-poll perubahan status absensi
+@app.route('/api/v2/absensi/changes', methods=['GET'])
+def get_absensi_changes():
+    """Perubahan status absensi setelah sequence `after` (long-poll)
+
+    Jika belum ada perubahan, request ditahan sampai ada absensi baru atau
+    `wait` detik (maksimal LONG_POLL_MAX_WAIT) tanpa memegang koneksi
+    database. `cursor` pada response dipakai sebagai `after` berikutnya;
+    `more` bernilai true jika masih ada perubahan yang belum terkirim.
+    """
+    try:
+        try:
+            after = int(request.args.get('after', 0))
+            wait = min(max(float(request.args.get('wait', 0)), 0.0), LONG_POLL_MAX_WAIT)
+        except ValueError:
+            return jsonify({'status': 400, 'message': 'Parameter after/wait tidak valid'}), 400
+        
+        rows = fetch_attendance_changes(after)
+        if not rows and wait > 0 and attendance_feed.wait(after, wait):
+            rows = fetch_attendance_changes(after)
+        
+        today = datetime.now().date()
+        changes = [
+            {
+                'seq': row['seq'],
+                'nrp': row['nrp'],
+                'status': day_status(row),
+                'last_status': row['last_status'],
+                'waktu': row['last_at'].strftime("%Y-%m-%d %H:%M:%S")
+            }
+            for row in rows if row['tanggal'] == today
+        ]
         
         return jsonify({
             'status': 200,
             'message': 'Success',
-            'data': absensi_list
+            'tanggal': today.strftime("%Y-%m-%d"),
+            'cursor': rows[-1]['seq'] if rows else after,
+            'more': len(rows) == CHANGES_LIMIT,
+            'data': changes
         }), 200
         
     except Exception as e:
@@ -423,36 +1285,30 @@ def get_absensi_today():
 # API 8: Get absensi by NRP
 @app.route('/api/v2/absensi/<nrp>', methods=['GET'])
 def get_absensi_by_nrp(nrp):
-    """Mengambil riwayat absensi karyawan berdasarkan NRP"""
+    """Mengambil riwayat absensi karyawan berdasarkan NRP
+
+    Default 50 absensi terbaru; halaman berikutnya dengan `after`=`next`,
+    ukuran halaman dengan `limit`, atau seluruh riwayat dengan `format=ndjson`.
+    """
     try:
-        connection = get_db_connection()
-        if not connection:
-            return jsonify({'status': 500, 'message': 'Database connection failed'}), 500
-        
-        cursor = connection.cursor(dictionary=True)
-        
-        cursor.execute("""
+        limit = parse_limit(50)
+        if limit is None:
+            return jsonify({'status': 400, 'message': f'limit harus 1-{MAX_PAGE_SIZE}'}), 400
+        sql = """
             SELECT * FROM absensi 
-            WHERE nrp = %s 
-            ORDER BY waktu DESC
-            LIMIT 50
-        """, (nrp,))
-        
-        absensi_list = cursor.fetchall()
-        
-        # Format datetime ke string
-        for absensi in absensi_list:
-            if isinstance(absensi['waktu'], datetime):
-                absensi['waktu'] = absensi['waktu'].strftime("%Y-%m-%d %H:%M:%S")
-        
-        cursor.close()
-        connection.close()
-        
-        return jsonify({
-            'status': 200,
-            'message': 'Success',
-            'data': absensi_list
-        }), 200
+            WHERE nrp = %s
+        """
+        params = [nrp]
+        if request.args.get('after'):
+            try:
+                after_waktu, after_id = parse_absensi_key(request.args['after'])
+            except ValueError:
+                return jsonify({'status': 400, 'message': 'Format after tidak valid'}), 400
+            sql += SQL_ABSENSI_KEYSET_AFTER
+            params += [after_waktu, after_waktu, after_id]
+        sql += SQL_ABSENSI_KEYSET_ORDER
+        
+        return list_response(sql, params, limit, absensi_key, format_absensi_row)
         
     except Exception as e:
         return jsonify({'status': 500, 'message': str(e)}), 500
@@ -516,13 +1372,13 @@ def update_karyawan(nrp):
         if not connection:
             return jsonify({'status': 500, 'message': 'Database connection failed'}), 500
         
-        cursor = connection.cursor()
+        cursor = connection.cursor(dictionary=True)
         
         cursor.execute("""
             UPDATE karyawan 
-            SET nama = %s, updated_at = NOW()
+            SET nama = %s, updated_at = NOW(), gallery_seq = %s
             WHERE nrp = %s
-        """, (nama, nrp))
+        """, (nama, next_gallery_seq(cursor), nrp))
         
         connection.commit()
         affected_rows = cursor.rowcount
@@ -530,6 +1386,8 @@ def update_karyawan(nrp):
         connection.close()
         
         if affected_rows > 0:
+            face_index.rename(nrp, nama)
+            gallery_cache.invalidate()
             return jsonify({
                 'status': 200,
                 'message': 'Data karyawan berhasil diupdate'
@@ -543,30 +1401,32 @@ def update_karyawan(nrp):
 # API 11: Get all karyawan (untuk manajemen)
 @app.route('/api/v2/all-karyawan', methods=['GET'])
 def get_all_karyawan_management():
-    """Mengambil semua data karyawan untuk keperluan manajemen"""
+    """Mengambil data karyawan untuk keperluan manajemen, urut NRP
+
+    Dipaginasi keyset: `limit` (maksimal MAX_PAGE_SIZE) dan `after`=NRP
+    terakhir halaman sebelumnya (`next`); `format=ndjson` untuk streaming.
+    """
     try:
-        connection = get_db_connection()
-        if not connection:
-            return jsonify({'status': 500, 'message': 'Database connection failed'}), 500
-        
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("""
+        limit = parse_limit(MAX_PAGE_SIZE)
+        if limit is None:
+            return jsonify({'status': 400, 'message': f'limit harus 1-{MAX_PAGE_SIZE}'}), 400
+        sql = """
             SELECT nrp, nama, 
-                   CASE WHEN face_encoding IS NOT NULL THEN 'Terdaftar' ELSE 'Belum' END as status_wajah,
+                   CASE 
+                       WHEN face_embedding IS NULL THEN 'Belum' 
+                       WHEN face_color_order = 'BGR' THEN 'Terdaftar' 
+                       ELSE 'Perlu Daftar Ulang' 
+                   END as status_wajah,
                    created_at
-            FROM karyawan 
-            ORDER BY nrp
-        """)
-        karyawan_list = cursor.fetchall()
-        
-        cursor.close()
-        connection.close()
+            FROM karyawan
+        """
+        params = []
+        if request.args.get('after'):
+            sql += " WHERE nrp > %s"
+            params.append(request.args['after'])
+        sql += " ORDER BY nrp"
         
-        return jsonify({
-            'status': 200,
-            'message': 'Success',
-            'data': karyawan_list
-        }), 200
+        return list_response(sql, params, limit, lambda row: row['nrp'])
         
     except Exception as e:
         return jsonify({'status': 500, 'message': str(e)}), 500
@@ -577,11 +1437,13 @@ if __name__ == '__main__':
     print("🚀 HRD Absensi API Server")
     print("=" * 50)
     print(f"📁 Upload folder: {UPLOAD_FOLDER}")
+    print(f"🖼️  Photo store: {type(photo_store.backend).__name__}")
     print(f"🗄️  Database: {DB_CONFIG['database']}@{DB_CONFIG['host']}")
     print("\n📡 Endpoints:")
     print("   GET    /                       - Home")
     print("   GET    /health                 - Health check")
     print("   GET    /api/v2/face-recognition - Get all faces")
+    print("   GET    /api/v2/face-recognition/packed - Get all faces (biner)")
     print("   POST   /api/v2/face-recognition/register - Register face")
     print("   POST   /api/v2/absen           - Absensi")
     print("   GET    /api/v2/karyawan/<nrp>  - Get karyawan")
@@ -596,4 +1458,5 @@ if __name__ == '__main__':
     print("✅ Server running on http://localhost:5000")
     print("=" * 50)
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Server development; untuk produksi jalankan `python serve.py` (waitress/gunicorn, debug mati)
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get('APP_ENV') != 'production')
\ No newline at end of file
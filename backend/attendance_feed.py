@@ -0,0 +1,71 @@
+import threading
+import time
+
+# ==================== KONFIGURASI LONG-POLL ====================
+LONG_POLL_MAX_WAIT = 25.0  # Detik; di bawah WEB_TIMEOUT/channel_timeout server (30 detik)
+FEED_POLL_INTERVAL = 0.5   # Detik; cek sequence di database selama ada request yang menunggu
+CHANGES_LIMIT = 500        # Maksimal perubahan per response
+
+
+# ==================== ATTENDANCE FEED ====================
+class AttendanceFeed:
+    """Membangunkan request long-poll saat sequence absensi bertambah
+
+    Sequence global (tabel attendance_seq) dinaikkan di transaksi absensi
+    sehingga urutannya sama dengan urutan commit. Handler di worker yang sama
+    memanggil `publish()` setelah commit; perubahan dari worker lain terdeteksi
+    oleh satu thread poller per worker yang membaca sequence setiap
+    FEED_POLL_INTERVAL detik, dan hanya berjalan selama ada request menunggu.
+    Request yang menunggu tidak memegang koneksi database.
+    """
+
+    def __init__(self, read_seq, poll_interval=FEED_POLL_INTERVAL):
+        self.read_seq = read_seq  # read_seq() -> sequence terakhir yang sudah di-commit
+        self.poll_interval = poll_interval
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._waiters = 0
+        self._poller = None
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def publish(self, seq):
+        with self._cond:
+            if seq > self._seq:
+                self._seq = seq
+                self._cond.notify_all()
+
+    def wait(self, after, timeout):
+        """Menunggu sampai sequence > `after` atau timeout; mengembalikan True jika ada perubahan"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._waiters += 1
+            self._ensure_poller()
+            try:
+                while self._seq <= after:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._waiters -= 1
+
+    def _ensure_poller(self):
+        if self._poller is None or not self._poller.is_alive():
+            self._poller = threading.Thread(target=self._poll, name="attendance-feed", daemon=True)
+            self._poller.start()
+
+    def _poll(self):
+        while True:
+            with self._cond:
+                if self._waiters == 0:
+                    self._poller = None
+                    return
+            try:
+                self.publish(self.read_seq())
+            except Exception as e:
+                print(f"❌ Error poll attendance feed: {e}")
+            time.sleep(self.poll_interval)
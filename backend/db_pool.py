@@ -0,0 +1,183 @@
+import contextlib
+import queue
+import threading
+import time
+
+import mysql.connector
+from mysql.connector import Error
+
+# ==================== KONFIGURASI POOL ====================
+POOL_SIZE = 10                # Maksimal koneksi terbuka; 0 = tanpa pooling (connect per request)
+POOL_TIMEOUT = 5.0            # Detik menunggu koneksi bebas sebelum menyerah
+HEALTH_CHECK_IDLE = 30.0      # Koneksi yang menganggur lebih lama dari ini di-ping saat checkout
+
+
+class PoolTimeout(Error):
+    """Semua koneksi sedang dipakai sampai batas POOL_TIMEOUT"""
+
+
+class PooledConnection:
+    """Proxy koneksi MySQL; close() mengembalikan koneksi ke pool, bukan memutusnya"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self.released = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if not self.released:
+            self.released = True
+            self._pool._release(self._conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+# ==================== CONNECTION POOL ====================
+class ConnectionPool:
+    """Pool koneksi MySQL thread-safe dengan health check dan statistik
+
+    Koneksi dibuat malas sampai `size`; checkout berikutnya menunggu koneksi
+    dikembalikan (maksimal `timeout` detik). Saat dikembalikan, transaksi
+    yang masih terbuka di-rollback agar snapshot REPEATABLE READ tidak
+    terbawa ke request berikutnya. Koneksi rusak dibuang dan diganti.
+    """
+
+    def __init__(self, config, size=POOL_SIZE, timeout=POOL_TIMEOUT, health_check_idle=HEALTH_CHECK_IDLE):
+        self.config = dict(config)
+        self.size = size
+        self.timeout = timeout
+        self.health_check_idle = health_check_idle
+        self._idle = queue.LifoQueue()  # LIFO: koneksi yang baru dipakai (masih hangat) didahulukan
+        self._lock = threading.Lock()
+        self._created = 0
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'health_check_failures': 0,
+            'discarded': 0,
+            'leaks_recovered': 0
+        }
+
+    # ---------- Checkout / release ----------
+    def acquire(self):
+        """Mengembalikan PooledConnection; raise PoolTimeout atau mysql Error jika gagal"""
+        conn = self._checkout()
+        with self._lock:
+            self._stats['checkouts'] += 1
+        return PooledConnection(self, conn)
+
+    @contextlib.contextmanager
+    def connection(self):
+        """`with pool.connection() as conn:` — koneksi selalu kembali walau terjadi exception"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _checkout(self):
+        if self.size <= 0:
+            return mysql.connector.connect(**self.config)
+
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while True:
+            try:
+                conn, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._try_create()
+                if conn is not None:
+                    return conn
+                if not waited:
+                    waited = True
+                    with self._lock:
+                        self._stats['waits'] += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    with self._lock:
+                        self._stats['timeouts'] += 1
+                    raise PoolTimeout(msg=f"Tidak ada koneksi database bebas dalam {self.timeout} detik")
+                try:
+                    conn, idle_since = self._idle.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+
+            if time.monotonic() - idle_since < self.health_check_idle or self._healthy(conn):
+                return conn
+            self._discard(conn)
+
+    def _try_create(self):
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        try:
+            return mysql.connector.connect(**self.config)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _healthy(self, conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._lock:
+                self._stats['health_check_failures'] += 1
+            return False
+
+    def _release(self, conn):
+        if self.size <= 0:
+            conn.close()
+            return
+        try:
+            conn.consume_results()
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created -= 1
+            self._stats['discarded'] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def recovered_leak(self):
+        with self._lock:
+            self._stats['leaks_recovered'] += 1
+
+    # ---------- Statistik ----------
+    def stats(self):
+        with self._lock:
+            idle = self._idle.qsize()
+            return {
+                'size': self.size,
+                'open': self._created,
+                'idle': idle,
+                'in_use': self._created - idle,
+                **self._stats
+            }
+
+    def close_all(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
@@ -0,0 +1,120 @@
+import json
+import struct
+import time
+
+import numpy as np
+
+# ==================== KONFIGURASI FORMAT BINER ====================
+EMBEDDING_DIM = 512
+EMBEDDING_DTYPE = 'float16'  # Disimpan di kolom BLOB karyawan.face_embedding (little-endian)
+PACKED_CONTENT_TYPE = 'application/x-face-gallery'
+HEADER_STRUCT = struct.Struct('<I')  # Panjang header JSON (uint32)
+
+
+def templates_to_blob(templates, dtype=EMBEDDING_DTYPE, dim=EMBEDDING_DIM):
+    """List template (list of list float) -> bytes untuk kolom face_embedding"""
+    array = np.atleast_2d(np.asarray(templates, dtype=np.dtype(dtype).newbyteorder('<')))
+    if array.ndim != 2 or array.shape[1] != dim:
+        raise ValueError(f"Template harus berdimensi {dim}, bukan {array.shape[1:]}")
+    return array.tobytes()
+
+
+def blob_to_templates(blob, dtype=EMBEDDING_DTYPE, dim=EMBEDDING_DIM):
+    """Bytes kolom face_embedding -> matriks float32 (jumlah template x dim)"""
+    array = np.frombuffer(blob, dtype=np.dtype(dtype).newbyteorder('<'))
+    return array.reshape(-1, dim).astype(np.float32)
+
+
+def blob_template_count(blob, dtype=EMBEDDING_DTYPE, dim=EMBEDDING_DIM):
+    return len(blob) // (np.dtype(dtype).itemsize * dim)
+
+
+def pack_gallery(rows, cursor=None, full=True, deleted=(), dtype=EMBEDDING_DTYPE, dim=EMBEDDING_DIM):
+    """Menggabungkan blob seluruh karyawan menjadi satu buffer kontigu
+
+    Format: uint32 panjang header | header JSON (utf-8) | matriks template.
+    Header berisi dtype, dim, cursor dan index [{nrp, name, count}] yang
+    urutannya sama dengan baris matriks.
+    """
+    index = []
+    blobs = []
+    for row in rows:
+        blob = bytes(row['face_embedding'])
+        index.append({
+            'nrp': row['nrp'],
+            'name': row['nama'],
+            'count': blob_template_count(blob, dtype, dim)
+        })
+        blobs.append(blob)
+
+    header = json.dumps({
+        'dtype': dtype,
+        'dim': dim,
+        'cursor': cursor,
+        'full': full,
+        'deleted': list(deleted),
+        'index': index
+    }).encode('utf-8')
+    return HEADER_STRUCT.pack(len(header)) + header + b''.join(blobs)
+
+
+def unpack_gallery(payload):
+    """Kebalikan pack_gallery: (header, matriks) tanpa membuat objek per elemen"""
+    (header_len,) = HEADER_STRUCT.unpack_from(payload, 0)
+    offset = HEADER_STRUCT.size
+    header = json.loads(payload[offset:offset + header_len].decode('utf-8'))
+    dtype = np.dtype(header['dtype']).newbyteorder('<')
+    matrix = np.frombuffer(payload, dtype=dtype, offset=offset + header_len).reshape(-1, header['dim'])
+    return header, matrix
+
+
+# ==================== BENCHMARK ====================
+def benchmark(size=10000, templates=1, dim=EMBEDDING_DIM, seed=0):
+    """Membandingkan ukuran payload dan waktu parse JSON lama vs format biner"""
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((size, templates, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=2, keepdims=True)
+
+    # Format lama: face_encoding JSON string di dalam response JSON
+    json_payload = json.dumps({
+        'status': 200,
+        'data': [
+            {'nrp': str(i), 'name': f"Karyawan {i}", 'face_encoding': json.dumps(embeddings[i].tolist())}
+            for i in range(size)
+        ]
+    }).encode('utf-8')
+
+    rows = [
+        {'nrp': str(i), 'nama': f"Karyawan {i}", 'face_embedding': templates_to_blob(embeddings[i], dim=dim)}
+        for i in range(size)
+    ]
+    packed_payload = pack_gallery(rows, dim=dim)
+
+    start = time.perf_counter()
+    data = json.loads(json_payload)
+    parsed = [np.array(json.loads(entry['face_encoding'])) for entry in data['data']]
+    json_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    header, matrix = unpack_gallery(packed_payload)
+    matrix = matrix.astype(np.float32)
+    packed_s = time.perf_counter() - start
+
+    assert len(parsed) == len(header['index']) == size
+    return {
+        'size': size,
+        'json_bytes': len(json_payload),
+        'packed_bytes': len(packed_payload),
+        'json_parse_ms': json_s * 1000,
+        'packed_parse_ms': packed_s * 1000
+    }
+
+
+if __name__ == '__main__':
+    print("=" * 50)
+    print("⏱  Benchmark format embedding (JSON vs biner)")
+    print("=" * 50)
+    for size in (1000, 10000):
+        r = benchmark(size)
+        print(f"   {size:>6} karyawan | JSON {r['json_bytes'] / 1e6:7.2f} MB {r['json_parse_ms']:8.1f} ms"
+              f" | biner {r['packed_bytes'] / 1e6:6.2f} MB {r['packed_parse_ms']:6.1f} ms")
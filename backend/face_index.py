@@ -0,0 +1,153 @@
+import threading
+import time
+
+import numpy as np
+
+from embedding_codec import EMBEDDING_DIM, blob_to_templates
+
+# ==================== KONFIGURASI IDENTIFIKASI ====================
+IDENTIFY_THRESHOLD = 0.7   # Sama dengan MATCH_THRESHOLD di kiosk
+MAX_TOP_K = 10
+MAX_QUERY_EMBEDDINGS = 32  # Maksimal embedding per request /api/v2/identify
+REFRESH_INTERVAL = 2.0     # Detik; delta sync dari database (perubahan dari worker lain)
+
+
+def normalize_rows(matrix):
+    """Normalisasi L2 tiap baris, aman untuk vektor nol"""
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+class _Snapshot:
+    """Matriks template kontigu per karyawan; tidak pernah diubah setelah dibuat"""
+
+    def __init__(self, entries, dim):
+        self.nrps = list(entries.keys())
+        self.names = [entries[nrp][0] for nrp in self.nrps]
+        templates = [entries[nrp][1] for nrp in self.nrps]
+        counts = [t.shape[0] for t in templates]
+        self.starts = np.cumsum([0] + counts[:-1]).astype(np.int64)
+        self.matrix = np.concatenate(templates) if templates else np.zeros((0, dim), dtype=np.float32)
+
+
+# ==================== SERVER FACE INDEX ====================
+class FaceIndex:
+    """Galeri wajah in-memory untuk identifikasi di server
+
+    Template seluruh karyawan disimpan sebagai satu matriks float32 ternormalisasi
+    yang berurutan per NRP, sehingga satu batch query cukup satu perkalian matriks
+    lalu `np.maximum.reduceat` untuk skor per NRP. Perubahan (register, hapus,
+    ganti nama) ditulis langsung oleh handler di worker yang sama; worker lain
+    menyusul lewat delta sync `since` setiap REFRESH_INTERVAL detik. Galeri
+    yang belum dimuat tidak menerima write-through (load pertama sudah penuh),
+    jadi worker yang meneruskan identify ke proses lain tidak memakan memori.
+    """
+
+    def __init__(self, dim=EMBEDDING_DIM, refresh_interval=REFRESH_INTERVAL):
+        self.dim = dim
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._entries = {}        # nrp -> (nama, matriks template ternormalisasi)
+        self._snapshot = None     # Dibangun ulang malas setelah ada perubahan
+        self._cursor = None       # Cursor delta sync terakhir (gallery_seq)
+        self._last_refresh = 0.0
+        self.version = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def loaded(self):
+        return self._cursor is not None
+
+    # ---------- Sinkronisasi dengan database ----------
+    def refresh(self, fetch, force=False):
+        """Delta sync lewat `fetch(since)` -> (karyawan_list, deleted_nrps, cursor, since)
+
+        Pemanggilan pertama (atau saat cursor kedaluwarsa) memuat seluruh galeri.
+        """
+        now = time.monotonic()
+        if not force and self.loaded and now - self._last_refresh < self.refresh_interval:
+            return False
+        with self._lock:
+            if not force and self.loaded and now - self._last_refresh < self.refresh_interval:
+                return False
+            karyawan_list, deleted_nrps, cursor, since = fetch(self._cursor)
+            if since is None:
+                self._entries = {}
+            for nrp in deleted_nrps:
+                self._entries.pop(nrp, None)
+            for row in karyawan_list:
+                self._entries[row['nrp']] = (row['nama'], normalize_rows(blob_to_templates(row['face_embedding'])))
+            if since is None or karyawan_list or deleted_nrps:
+                self._changed()
+            self._cursor = cursor
+            self._last_refresh = time.monotonic()
+            return True
+
+    # ---------- Write-through dari handler ----------
+    def upsert(self, nrp, name, templates):
+        with self._lock:
+            if not self.loaded:
+                return
+            self._entries[nrp] = (name, normalize_rows(templates))
+            self._changed()
+
+    def remove(self, nrps):
+        with self._lock:
+            if not self.loaded:
+                return 0
+            removed = [nrp for nrp in nrps if self._entries.pop(nrp, None) is not None]
+            if removed:
+                self._changed()
+            return len(removed)
+
+    def rename(self, nrp, name):
+        with self._lock:
+            entry = self._entries.get(nrp)
+            if self.loaded and entry is not None:
+                self._entries[nrp] = (name, entry[1])
+                self._changed()
+
+    def _changed(self):
+        self._snapshot = None
+        self.version += 1
+
+    def _current_snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = _Snapshot(self._entries, self.dim)
+                snapshot = self._snapshot
+        return snapshot
+
+    # ---------- Identifikasi ----------
+    def search(self, queries, top_k=1, threshold=IDENTIFY_THRESHOLD):
+        """Top-k NRP per query (M x dim); list per query berisi (nrp, name, score) urut menurun"""
+        queries = normalize_rows(queries)
+        snapshot = self._current_snapshot()
+        if not snapshot.nrps:
+            return [[] for _ in range(queries.shape[0])]
+        if queries.shape[1] != snapshot.matrix.shape[1]:
+            raise ValueError(f"Dimensi embedding harus {snapshot.matrix.shape[1]}")
+
+        template_scores = queries @ snapshot.matrix.T
+        scores = np.maximum.reduceat(template_scores, snapshot.starts, axis=1)  # M x jumlah NRP
+
+        k = min(top_k, scores.shape[1])
+        if k == scores.shape[1]:
+            top = np.argsort(-scores, axis=1)
+        else:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+        results = []
+        for query_scores, candidates in zip(scores, top):
+            ranked = sorted(candidates[:k], key=lambda i: query_scores[i], reverse=True)
+            results.append([
+                (snapshot.nrps[i], snapshot.names[i], float(query_scores[i]))
+                for i in ranked if query_scores[i] > threshold
+            ])
+        return results
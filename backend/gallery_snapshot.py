@@ -0,0 +1,207 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows (waitress satu proses): kunci antar thread sudah cukup
+    fcntl = None
+
+# ==================== KONFIGURASI CACHE GALERI ====================
+GALLERY_VERSION_FILE = '../cache/gallery.version'  # Dibagi semua worker gunicorn/waitress di host yang sama
+# Detik; hanya jaring pengaman. Perubahan di luar API (SQL manual, script migrasi) harus
+# menghapus GALLERY_VERSION_FILE agar semua worker membangun ulang snapshot saat itu juga
+GALLERY_CACHE_MAX_AGE = 6 * 3600.0
+# Detik; file versi lama baru dihapus setelah ini agar worker yang masih mengirimnya tidak gagal
+STALE_FILE_GRACE = 120.0
+
+
+class GallerySnapshot:
+    """Metadata galeri wajah yang sudah diserialisasi ke file; isi body tidak disimpan di memori worker"""
+
+    def __init__(self, version, cursor, seq, etag, created=None):
+        self.version = version
+        self.cursor = cursor          # String cursor yang dikirim ke kiosk (gallery_seq)
+        self.seq = seq                # gallery_seq saat snapshot diambil, untuk membandingkan `since`
+        self.etag = etag              # Hash isi body; sama di semua worker dan berubah walau token versi tidak berubah
+        self.created = created if created is not None else time.time()
+
+    def etag_for(self, variant):
+        return f"{self.etag}-{variant}"
+
+
+# ==================== GALLERY SNAPSHOT CACHE ====================
+class GallerySnapshotCache:
+    """Snapshot galeri satu per host dengan invalidasi write-through lintas worker
+
+    Versi galeri adalah token acak di GALLERY_VERSION_FILE. Handler yang
+    mengubah karyawan memanggil `invalidate()` setelah commit sehingga token
+    berganti; setiap worker membandingkan token (satu baca file kecil, tanpa
+    query database) dan memuat ulang snapshot hanya jika token berbeda.
+    Selama token sama galeri tidak menyentuh database; GALLERY_CACHE_MAX_AGE
+    hanya jaring pengaman.
+    Token dibaca sebelum query galeri, jadi perubahan yang commit bersamaan
+    dengan pembangunan snapshot selalu memicu pembangunan ulang berikutnya.
+
+    Body ditulis sebagai file `gallery-<versi>.<variant>` di folder yang sama
+    dengan token, dibangun sekali per host di bawah kunci file (fcntl), lalu
+    dikirim dengan send_file sehingga semua worker berbagi page cache OS.
+    Worker hanya menyimpan metadata (GallerySnapshot). Variant yang jarang
+    dipakai dibuat saat pertama diminta lewat `body_path(..., derive)`.
+    """
+
+    def __init__(self, version_path=GALLERY_VERSION_FILE, max_age=GALLERY_CACHE_MAX_AGE):
+        self.version_path = os.path.abspath(version_path)  # send_file mengartikan path relatif dari folder aplikasi
+        self.cache_dir = os.path.dirname(self.version_path)
+        self.max_age = max_age
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'builds': 0, 'loads': 0, 'invalidations': 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def current_version(self):
+        try:
+            with open(self.version_path, 'r') as f:
+                version = f.read().strip()
+            if version:
+                return version
+        except OSError:
+            pass
+        return self._write_version()
+
+    def _write_version(self):
+        version = uuid.uuid4().hex[:16]
+        self._write_file(self.version_path, [version.encode('utf-8')])
+        return version
+
+    def invalidate(self):
+        """Dipanggil setelah commit perubahan karyawan/face embedding"""
+        self._write_version()
+        with self._lock:
+            self._snapshot = None
+            self._stats['invalidations'] += 1
+
+    def get(self, build):
+        """Snapshot versi terbaru
+
+        `build(version)` -> (cursor, seq, bodies) hanya dipanggil jika belum
+        ada worker di host ini yang membangun versi tersebut.
+        """
+        version = self.current_version()
+        snapshot = self._snapshot
+        if self._fresh(snapshot, version):
+            with self._lock:
+                self._stats['hits'] += 1
+            return snapshot
+
+        # Satu thread per worker, satu worker per host membangun; yang lain memakai file hasilnya
+        with self._lock, self._host_lock():
+            snapshot = self._snapshot
+            if self._fresh(snapshot, version):
+                self._stats['hits'] += 1
+                return snapshot
+            snapshot = self._load(version)
+            if self._fresh(snapshot, version):
+                self._stats['loads'] += 1
+            else:
+                snapshot = self._build(version, build)
+                self._stats['builds'] += 1
+            self._snapshot = snapshot
+            return snapshot
+
+    def body_path(self, snapshot, variant, derive=None):
+        """Path file body `variant`; dibuat dengan `derive(snapshot)` -> iterable bytes jika belum ada"""
+        path = self._body_path(snapshot.version, variant)
+        if derive is None or os.path.exists(path):
+            return path
+        with self._lock, self._host_lock():
+            if not os.path.exists(path):
+                self._write_file(path, derive(snapshot))
+        return path
+
+    def _build(self, version, build):
+        cursor, seq, bodies = build(version)
+        digest = hashlib.blake2b(digest_size=12)
+        for variant in sorted(bodies):
+            digest.update(bodies[variant])
+        snapshot = GallerySnapshot(version, cursor, seq, digest.hexdigest())
+        for variant, body in bodies.items():
+            self._write_file(self._body_path(version, variant), [body])
+        # File meta ditulis terakhir: worker lain hanya memuat versi yang body-nya lengkap
+        meta = {'cursor': cursor, 'seq': seq, 'etag': snapshot.etag, 'created': snapshot.created}
+        self._write_file(self._body_path(version, 'meta'), [json.dumps(meta).encode('utf-8')])
+        self._remove_stale(version)
+        return snapshot
+
+    def _load(self, version):
+        try:
+            with open(self._body_path(version, 'meta'), 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return GallerySnapshot(version, meta['cursor'], meta['seq'], meta['etag'], meta['created'])
+
+    def _remove_stale(self, version):
+        keep = self._body_path(version, '')
+        cutoff = time.time() - STALE_FILE_GRACE
+        for path in glob.glob(os.path.join(self.cache_dir, 'gallery-*')):
+            try:
+                if not path.startswith(keep) and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass  # Windows: file yang sedang dikirim tidak bisa dihapus, dicoba lagi saat build berikutnya
+
+    def _body_path(self, version, variant):
+        return os.path.join(self.cache_dir, f"gallery-{version}.{variant}")
+
+    @contextmanager
+    def _host_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.cache_dir, 'gallery.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _write_file(path, chunks):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(tmp_path, path)  # Atomik: pembaca tidak pernah melihat file setengah jadi
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _fresh(self, snapshot, version):
+        return (
+            snapshot is not None
+            and snapshot.version == version
+            and time.time() - snapshot.created < self.max_age
+        )
+
+    def stats(self):
+        with self._lock:
+            snapshot = self._snapshot
+            sizes = {}
+            if snapshot:
+                for path in glob.glob(self._body_path(snapshot.version, '*')):
+                    variant = path.rsplit('.', 1)[-1]
+                    if variant not in ('meta', 'tmp'):
+                        sizes[variant] = os.path.getsize(path)
+            return {
+                'version': snapshot.version if snapshot else None,
+                'size_bytes': sizes,
+                **self._stats
+            }
@@ -0,0 +1,101 @@
+# Konfigurasi gunicorn untuk produksi (Linux). Jalankan dari folder backend:
+#   gunicorn -c gunicorn.conf.py app:app     atau     python serve.py
+# Reload graceful (kode baru tanpa memutus request berjalan): kill -HUP <pid master>
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+
+cpu_count = multiprocessing.cpu_count()
+
+# ==================== PROSES IDENTIFY ====================
+# /api/v2/identify memegang galeri wajah sebagai matriks float32 di memori (~200 MB per 100k template)
+# dan me-refresh-nya dari database setiap REFRESH_INTERVAL. Agar tidak ada satu salinan per worker,
+# master menjalankan satu gunicorn terpisah (1 worker, IDENTIFY_THREADS thread) di IDENTIFY_BIND dan
+# worker utama meneruskan identify ke sana (IDENTIFY_UPSTREAM), jadi memori dan beban refresh galeri
+# tidak ikut naik dengan WEB_WORKERS. IDENTIFY_BIND= (kosong) membuat setiap worker memuat galeri sendiri;
+# dalam mode itu batasi WEB_WORKERS sesuai RAM (workers x ukuran galeri).
+identify_bind = os.environ.get('IDENTIFY_BIND', '127.0.0.1:5001')
+is_identify_process = os.environ.get('IDENTIFY_ROLE') == 'identify'
+
+if is_identify_process:
+    bind = identify_bind
+    # Satu proses = satu galeri; perkalian matriks numpy melepas GIL sehingga thread tetap paralel
+    workers = 1
+    threads = int(os.environ.get('IDENTIFY_THREADS', cpu_count))
+else:
+    bind = os.environ.get('BIND', '0.0.0.0:5000')
+    # Worker proses sesuai core (numpy pack galeri terikat CPU), thread untuk request yang menunggu MySQL.
+    # Long-poll /api/v2/absensi/changes menahan satu thread per kiosk (tanpa koneksi DB) sampai 25 detik,
+    # jadi total thread (workers x threads) harus jauh di atas jumlah kiosk.
+    workers = int(os.environ.get('WEB_WORKERS', cpu_count * 2 + 1))
+    threads = int(os.environ.get('WEB_THREADS', 8))
+worker_class = 'gthread'
+
+# Worker yang macet lebih dari `timeout` detik di-restart; request berjalan diberi waktu saat reload
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+# Worker didaur ulang berkala agar memori tidak terus tumbuh. Proses identify tidak, karena
+# setiap daur ulang berarti memuat ulang seluruh galeri dari database
+max_requests = 0 if is_identify_process else 1000
+max_requests_jitter = 0 if is_identify_process else 100
+
+# Tanpa preload agar HUP memuat ulang kode aplikasi
+preload_app = False
+
+# Setiap worker punya pool MySQL sendiri; lebih kecil dari jumlah thread karena request long-poll
+# tidak memegang koneksi. Total koneksi = workers x pool (+ pool proses identify),
+# pastikan di bawah max_connections (default 151)
+if is_identify_process:
+    db_pool_size = int(os.environ.get('IDENTIFY_DB_POOL_SIZE', 2))
+else:
+    db_pool_size = int(os.environ.get('DB_POOL_SIZE', 4))
+raw_env = [
+    f"DB_POOL_SIZE={db_pool_size}",
+    "APP_ENV=production"
+]
+if identify_bind and not is_identify_process:
+    raw_env.append(f"IDENTIFY_UPSTREAM=http://{identify_bind}")
+
+accesslog = '-'
+errorlog = '-'
+loglevel = 'info'
+
+
+# Handle proses disimpan di `server` (arbiter): HUP membaca ulang file konfigurasi ini
+def on_starting(server):
+    """Master utama menjalankan proses identify sebagai child"""
+    if not identify_bind or is_identify_process:
+        return
+    env = dict(os.environ, IDENTIFY_ROLE='identify')
+    env.pop('IDENTIFY_UPSTREAM', None)
+    server.identify_process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.abspath(__file__), 'app:app'],
+        env=env
+    )
+    server.log.info("Proses identify di %s (pid %s)", identify_bind, server.identify_process.pid)
+
+
+def _running_identify_process(server):
+    process = getattr(server, 'identify_process', None)
+    return process if process is not None and process.poll() is None else None
+
+
+def on_reload(server):
+    """HUP ke master ikut me-reload proses identify"""
+    process = _running_identify_process(server)
+    if process is not None:
+        process.send_signal(signal.SIGHUP)
+
+
+def on_exit(server):
+    process = _running_identify_process(server)
+    if process is not None:
+        process.terminate()
+        try:
+            process.wait(timeout=graceful_timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
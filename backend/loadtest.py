@@ -0,0 +1,226 @@
+"""Load test backend absensi
+
+Perbandingan pool koneksi (in-process, tanpa pool vs dengan pool):
+    python loadtest.py
+
+Throughput server produksi vs server development dengan simulasi kiosk
+(GET /api/v2/face-recognition delta sync + POST /api/v2/absen), jalankan
+terhadap database uji karena absen menulis baris baru:
+    python app.py                      # dev server (Werkzeug, debug)
+    python loadtest.py --url http://localhost:5000 --scenario kiosk --kiosks 20
+    python serve.py                    # waitress (Windows) / gunicorn (Linux)
+    python loadtest.py --url http://localhost:5000 --scenario kiosk --kiosks 20
+Catat req/s dan p95 per endpoint dari kedua run beserta jumlah core CPU.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+# ==================== KONFIGURASI LOAD TEST ====================
+DEFAULT_PATHS = ['/health', '/api/v2/absensi/today', '/api/v2/all-karyawan']
+CONCURRENCY = 16
+DURATION = 10.0
+
+
+def run_load(base_url, paths, concurrency=CONCURRENCY, duration=DURATION):
+    """Menjalankan `concurrency` klien paralel selama `duration` detik; mengembalikan req/s dan latensi"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker(offset):
+        local, failed, i = [], 0, offset
+        while time.perf_counter() < stop_at:
+            url = base_url + paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    response.read()
+                    if response.status != 200:
+                        failed += 1
+            except (urllib.error.URLError, OSError):
+                failed += 1
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95))
+    }
+
+
+# Foto uji kecil; backend hanya memeriksa ekstensi file
+TEST_JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 1024 + b"\xff\xd9"
+
+
+def _multipart(fields, files):
+    boundary = f"----loadtest{random.getrandbits(64):x}"
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: image/jpeg\r\n\r\n'.encode() + content + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def fetch_all_nrps(base_url):
+    """Semua NRP dari /api/v2/all-karyawan, mengikuti `next` sampai halaman terakhir seperti kiosk"""
+    nrps = []
+    after = None
+    while True:
+        query = '?' + urllib.parse.urlencode({'after': after}) if after else ''
+        with urllib.request.urlopen(base_url + '/api/v2/all-karyawan' + query, timeout=30) as response:
+            body = json.loads(response.read())
+        nrps.extend(k['nrp'] for k in body['data'])
+        after = body.get('next')
+        if not after:
+            return nrps
+
+
+def run_kiosks(base_url, kiosks=20, duration=DURATION, absen_ratio=0.5):
+    """Simulasi kiosk paralel: delta sync galeri wajah dan kirim absensi bergantian"""
+    nrps = fetch_all_nrps(base_url)
+    if not nrps:
+        raise SystemExit("❌ Tidak ada karyawan di database uji")
+
+    samples = {'absen': [], 'face-recognition': []}
+    errors = {'absen': 0, 'face-recognition': 0}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def kiosk():
+        cursor = None
+        local = {'absen': [], 'face-recognition': []}
+        failed = {'absen': 0, 'face-recognition': 0}
+        while time.perf_counter() < stop_at:
+            if random.random() < absen_ratio:
+                kind = 'absen'
+                body, content_type = _multipart(
+                    {'nrp': random.choice(nrps), 'latitude': '-6.866641', 'longitude': '107.5347632'},
+                    {'foto': ('loadtest.jpg', TEST_JPEG)}
+                )
+                req = urllib.request.Request(base_url + '/api/v2/absen', data=body,
+                                             headers={'Content-Type': content_type})
+            else:
+                kind = 'face-recognition'
+                query = f"?since={urllib.request.quote(cursor)}" if cursor else ""
+                req = urllib.request.Request(base_url + '/api/v2/face-recognition' + query)
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req, timeout=30) as response:
+                    payload = response.read()
+                if kind == 'face-recognition':
+                    cursor = json.loads(payload).get('cursor')
+            except (urllib.error.URLError, OSError, ValueError):
+                failed[kind] += 1
+            local[kind].append(time.perf_counter() - start)
+        with lock:
+            for kind in samples:
+                samples[kind].extend(local[kind])
+                errors[kind] += failed[kind]
+
+    threads = [threading.Thread(target=kiosk) for _ in range(kiosks)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    results = {}
+    for kind, latencies in samples.items():
+        ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+        results[kind] = {
+            'requests': len(latencies),
+            'errors': errors[kind],
+            'rps': len(latencies) / elapsed,
+            'p50_ms': float(np.percentile(ms, 50)),
+            'p95_ms': float(np.percentile(ms, 95))
+        }
+    return results
+
+
+def compare_pooling(pool_size, paths, concurrency, duration, port=5099):
+    """Menjalankan app in-process dua kali: tanpa pool (connect per request) dan dengan pool"""
+    from werkzeug.serving import make_server
+
+    import app as backend
+    from db_pool import ConnectionPool
+
+    results = {}
+    for label, size in (('tanpa pool', 0), (f'pool {pool_size}', pool_size)):
+        backend.db_pool = ConnectionPool(backend.DB_CONFIG, size=size)
+        server = make_server('127.0.0.1', port, backend.app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            results[label] = run_load(f"http://127.0.0.1:{port}", paths, concurrency, duration)
+            results[label]['pool'] = backend.db_pool.stats()
+        finally:
+            server.shutdown()
+            backend.db_pool.close_all()
+    return results
+
+
+def print_result(label, r):
+    print(f"   {label:<16} {r['rps']:8.1f} req/s | p50 {r['p50_ms']:7.1f} ms | p95 {r['p95_ms']:7.1f} ms"
+          f" | {r['requests']} request, {r['errors']} error")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test backend absensi")
+    parser.add_argument('--url', help="Base URL server yang sudah berjalan, misalnya http://localhost:5000")
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--duration', type=float, default=DURATION)
+    parser.add_argument('--pool-size', type=int, default=10, help="Ukuran pool untuk mode perbandingan")
+    parser.add_argument('--scenario', choices=['read', 'kiosk'], default='read')
+    parser.add_argument('--kiosks', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.scenario == 'kiosk':
+        if not args.url:
+            raise SystemExit("❌ Skenario kiosk membutuhkan --url server yang sedang berjalan")
+        print("=" * 50)
+        print(f"⏱  Simulasi {args.kiosks} kiosk, {args.duration:.0f} detik, {args.url}")
+        print("=" * 50)
+        for kind, r in run_kiosks(args.url.rstrip('/'), args.kiosks, args.duration).items():
+            print_result(kind, r)
+        raise SystemExit(0)
+
+    print("=" * 50)
+    print(f"⏱  Load test: {args.concurrency} klien, {args.duration:.0f} detik, {', '.join(args.paths)}")
+    print("=" * 50)
+    if args.url:
+        print_result("server", run_load(args.url.rstrip('/'), args.paths, args.concurrency, args.duration))
+    else:
+        for label, r in compare_pooling(args.pool_size, args.paths, args.concurrency, args.duration).items():
+            print_result(label, r)
+            print(f"   {'':<16} pool: {r['pool']}")
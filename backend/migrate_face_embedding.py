@@ -0,0 +1,58 @@
+import json
+
+from app import get_db_connection, normalize_templates
+from embedding_codec import templates_to_blob
+
+BATCH_SIZE = 500
+
+
+def migrate():
+    """Mengonversi face_encoding (JSON) lama menjadi face_embedding (BLOB float16)"""
+    connection = get_db_connection()
+    if not connection:
+        print("❌ Database connection failed")
+        return
+
+    read_cursor = connection.cursor(dictionary=True)
+    write_cursor = connection.cursor()
+    migrated, skipped = 0, 0
+    try:
+        read_cursor.execute("""
+            SELECT nrp, face_encoding 
+            FROM karyawan 
+            WHERE face_encoding IS NOT NULL AND face_embedding IS NULL
+        """)
+        rows = read_cursor.fetchall()
+
+        for start in range(0, len(rows), BATCH_SIZE):
+            updates = []
+            for row in rows[start:start + BATCH_SIZE]:
+                try:
+                    templates = normalize_templates(json.loads(row['face_encoding']))
+                except ValueError:
+                    templates = None
+                if templates is None:
+                    print(f"⚠ face_encoding tidak valid untuk {row['nrp']}, dilewati")
+                    skipped += 1
+                    continue
+                updates.append((templates_to_blob(templates), row['nrp']))
+
+            # updated_at tidak diubah agar tidak memicu delta sync ke semua kiosk
+            write_cursor.executemany("""
+                UPDATE karyawan 
+                SET face_embedding = %s, face_encoding = NULL, updated_at = updated_at 
+                WHERE nrp = %s
+            """, updates)
+            connection.commit()
+            migrated += len(updates)
+            print(f"🔄 {migrated}/{len(rows)} baris dikonversi")
+    finally:
+        read_cursor.close()
+        write_cursor.close()
+        connection.close()
+
+    print(f"✅ Migrasi selesai: {migrated} dikonversi, {skipped} dilewati")
+
+
+if __name__ == '__main__':
+    migrate()
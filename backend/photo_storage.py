@@ -0,0 +1,202 @@
+import hashlib
+import io
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow opsional; tanpa itu hanya foto asli yang disimpan
+    Image = None
+
+# ==================== KONFIGURASI PENYIMPANAN FOTO ====================
+PHOTO_ROOT = '../uploads'   # Root backend lokal; file lama {nrp}_{timestamp}.jpg tetap di sini
+SHARD_DEPTH = 2             # Tingkat subfolder: ab/cd/<sha256>.jpg -> maksimal 65536 folder
+PHOTO_WORKERS = 2           # Thread pembuat thumbnail/salinan audit per worker server
+# Turunan foto: nama -> (sisi terpanjang px, kualitas JPEG)
+DERIVATIVES = {
+    'thumb': (160, 75),
+    'audit': (640, 70),
+}
+# Key foto asli yang valid (juga mencegah path traversal dari foto_ref klien)
+ORIGINAL_KEY_PATTERN = re.compile(r'^original/(?:[0-9a-f]{2}/)*[0-9a-f]{64}\.(?:jpg|png)$')
+
+
+def content_key(digest, kind='original', ext='jpg', depth=SHARD_DEPTH):
+    """Key penyimpanan: '<kind>/ab/cd/<digest>.<ext>'"""
+    shards = [digest[i * 2:i * 2 + 2] for i in range(depth)]
+    return '/'.join([kind] + shards + [f"{digest}.{ext}"])
+
+
+# ==================== BACKEND PENYIMPANAN ====================
+class StorageBackend:
+    """Antarmuka backend: key berupa path relatif dengan pemisah '/'"""
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def put(self, key, data, content_type='image/jpeg'):
+        raise NotImplementedError
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def location(self, key):
+        """Nilai yang disimpan di absensi.foto_path"""
+        raise NotImplementedError
+
+
+class LocalBackend(StorageBackend):
+    def __init__(self, root=PHOTO_ROOT):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def exists(self, key):
+        return os.path.isfile(self._path(key))
+
+    def put(self, key, data, content_type='image/jpeg'):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)  # Atomik: penulis paralel dengan isi sama saling menimpa dengan aman
+
+    def get(self, key):
+        with open(self._path(key), 'rb') as f:
+            return f.read()
+
+    def location(self, key):
+        return self._path(key)
+
+
+class S3Backend(StorageBackend):
+    """Object storage S3-compatible (MinIO/SeaweedFS lokal atau S3), butuh boto3 (requirements-s3.txt)
+
+    Kredensial dibaca boto3 dari AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY.
+    """
+
+    def __init__(self, bucket, endpoint_url=None, prefix=''):
+        import boto3
+        from botocore.exceptions import ClientError
+        self._client_error = ClientError
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+            return True
+        except self._client_error as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def put(self, key, data, content_type='image/jpeg'):
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data, ContentType=content_type)
+
+    def get(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)['Body'].read()
+
+    def location(self, key):
+        return f"s3://{self.bucket}/{self.prefix}{key}"
+
+
+def backend_from_env(environ=os.environ):
+    """PHOTO_BACKEND=local (default, PHOTO_ROOT) atau s3 (PHOTO_S3_BUCKET, PHOTO_S3_ENDPOINT, PHOTO_S3_PREFIX)"""
+    kind = environ.get('PHOTO_BACKEND', 'local')
+    if kind == 'local':
+        return LocalBackend(environ.get('PHOTO_ROOT', PHOTO_ROOT))
+    if kind == 's3':
+        return S3Backend(
+            environ['PHOTO_S3_BUCKET'],
+            endpoint_url=environ.get('PHOTO_S3_ENDPOINT') or None,
+            prefix=environ.get('PHOTO_S3_PREFIX', '')
+        )
+    raise ValueError(f"PHOTO_BACKEND tidak dikenal: {kind}")
+
+
+# ==================== PHOTO STORE ====================
+class PhotoStore:
+    """Penyimpanan foto absensi content-addressed dengan turunan di background
+
+    Foto disimpan dengan key dari SHA-256 isinya di subfolder bertingkat
+    (content_key), sehingga foto yang sama hanya ditulis sekali dan tidak ada
+    tabrakan nama walau timestamp sama. Request hanya menulis foto asli;
+    thumbnail dan salinan audit (DERIVATIVES) dibuat oleh thread pool dan
+    dilewati jika sudah ada, jadi aman dijadwalkan ulang. Foto tidak pernah
+    dihapus saat transaksi gagal karena isi yang sama bisa dirujuk absensi lain.
+    """
+
+    def __init__(self, backend, workers=PHOTO_WORKERS, derivatives=DERIVATIVES):
+        self.backend = backend
+        self.derivatives = derivatives if Image is not None else {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='photo-worker') if workers else None
+        self._lock = threading.Lock()
+        self._stats = {'stored': 0, 'deduplicated': 0, 'derived': 0, 'pending': 0, 'errors': 0}
+        if Image is None:
+            print("⚠️ Pillow tidak terpasang, thumbnail dan salinan audit foto dinonaktifkan")
+
+    def save(self, data, ext='jpg'):
+        """Menyimpan bytes foto; mengembalikan key (sama untuk isi yang sama)"""
+        digest = hashlib.sha256(data).hexdigest()
+        key = content_key(digest, ext=ext)
+        if self.backend.exists(key):
+            self._count('deduplicated')
+        else:
+            content_type = 'image/png' if ext == 'png' else 'image/jpeg'
+            self.backend.put(key, data, content_type=content_type)
+            self._count('stored')
+        self._schedule(digest, key)
+        return key
+
+    def exists(self, key):
+        return self.backend.exists(key)
+
+    def location(self, key):
+        return self.backend.location(key)
+
+    def _schedule(self, digest, key):
+        if not self.derivatives or self._executor is None:
+            return
+        self._count('pending')
+        self._executor.submit(self._derive, digest, key)
+
+    def _derive(self, digest, key):
+        try:
+            source = None
+            for kind, (max_side, quality) in self.derivatives.items():
+                target = content_key(digest, kind=kind)
+                if self.backend.exists(target):
+                    continue
+                if source is None:
+                    source = ImageOps.exif_transpose(Image.open(io.BytesIO(self.backend.get(key)))).convert('RGB')
+                image = source.copy()
+                image.thumbnail((max_side, max_side))
+                buffer = io.BytesIO()
+                image.save(buffer, format='JPEG', quality=quality, optimize=True)
+                self.backend.put(target, buffer.getvalue())
+                self._count('derived')
+        except Exception as e:
+            self._count('errors')
+            print(f"❌ Error membuat turunan foto {key}: {e}")
+        finally:
+            self._count('pending', -1)
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def stats(self):
+        with self._lock:
+            return {'backend': type(self.backend).__name__, **self._stats}
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
@@ -0,0 +1,208 @@
+"""Pemeriksaan EXPLAIN dan benchmark query absensi per hari
+
+Membuat database terpisah (BENCH_DATABASE) berisi tabel absensi sintetis
+berukuran jutaan baris dengan index yang sama seperti database_schema.sql,
+lalu:
+  1. EXPLAIN setiap query produksi (SQL_* di app.py) dan gagal (exit 1) jika
+     ada yang melakukan full scan atau tidak memakai index yang diharapkan;
+  2. membandingkan waktu eksekusi dengan versi lama `DATE(waktu) = %s`.
+
+    python query_bench.py                     # seed 2 juta baris + check + benchmark
+    python query_bench.py --skip-seed         # pakai data bench yang sudah ada
+    python query_bench.py --check-only --rows 50000   # cepat, hanya EXPLAIN
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import mysql.connector
+import numpy as np
+
+from app import DB_CONFIG, SQL_ABSENSI_BETWEEN, SQL_ABSENSI_KEYSET_ORDER, SQL_LAST_ABSENSI_OF_DAY, day_range
+
+# ==================== KONFIGURASI BENCHMARK ====================
+BENCH_DATABASE = 'hrd_absensi_bench'
+ROWS = 2_000_000
+EMPLOYEES = 5000
+DAYS = 365
+SEED_BATCH = 20000
+REPEAT = 50
+
+# Index `nrp` meniru index implisit foreign key absensi.nrp di tabel produksi
+BENCH_SCHEMA = """
+CREATE TABLE absensi (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    nrp VARCHAR(20) NOT NULL,
+    nama VARCHAR(100) NOT NULL,
+    status VARCHAR(50),
+    waktu DATETIME DEFAULT CURRENT_TIMESTAMP,
+    latitude VARCHAR(50),
+    longitude VARCHAR(50),
+    foto_path VARCHAR(255),
+    event_id VARCHAR(36) NULL,
+    INDEX nrp (nrp),
+    INDEX idx_waktu (waktu),
+    INDEX idx_nrp_waktu (nrp, waktu),
+    UNIQUE INDEX uq_event_id (event_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+# Query lama sebelum filter tanggal diubah menjadi rentang waktu
+LEGACY_LAST_ABSENSI_OF_DAY = """
+    SELECT * FROM absensi
+    WHERE nrp = %s AND DATE(waktu) = %s AND waktu <= %s
+    ORDER BY waktu DESC LIMIT 1
+"""
+LEGACY_ABSENSI_OF_DAY = """
+    SELECT * FROM absensi
+    WHERE DATE(waktu) = %s
+    ORDER BY waktu DESC
+"""
+
+
+def connect(database=None):
+    config = dict(DB_CONFIG)
+    config['database'] = database
+    return mysql.connector.connect(**config)
+
+
+def seed(rows=ROWS, employees=EMPLOYEES, days=DAYS, seed_value=0):
+    """Membuat ulang BENCH_DATABASE.absensi dengan `rows` baris acak selama `days` hari terakhir"""
+    connection = connect()
+    cursor = connection.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {BENCH_DATABASE}")
+    cursor.execute(f"USE {BENCH_DATABASE}")
+    cursor.execute("DROP TABLE IF EXISTS absensi")
+    cursor.execute(BENCH_SCHEMA)
+
+    rng = np.random.default_rng(seed_value)
+    end = datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=days)
+    span = int((end - start).total_seconds())
+
+    inserted = 0
+    started = time.perf_counter()
+    while inserted < rows:
+        n = min(SEED_BATCH, rows - inserted)
+        nrps = rng.integers(0, employees, n)
+        offsets = rng.integers(0, span, n)
+        batch = [
+            (f"{2200000000 + int(nrp)}", f"Karyawan {int(nrp)}",
+             "Check In" if offset % 2 == 0 else "Check Out",
+             start + timedelta(seconds=int(offset)), "-6.866641", "107.5347632", "../uploads/bench.jpg")
+            for nrp, offset in zip(nrps, offsets)
+        ]
+        cursor.executemany("""
+            INSERT INTO absensi (nrp, nama, status, waktu, latitude, longitude, foto_path)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, batch)
+        connection.commit()
+        inserted += n
+        print(f"🔄 {inserted}/{rows} baris ({inserted / (time.perf_counter() - started):.0f} baris/detik)")
+
+    cursor.execute("ANALYZE TABLE absensi")
+    cursor.fetchall()
+    cursor.close()
+    connection.close()
+
+
+def sample_params(cursor, employees=EMPLOYEES):
+    """Parameter realistis: NRP acak dan waktu acak pada hari yang memiliki data"""
+    cursor.execute("SELECT MIN(waktu) AS first, MAX(waktu) AS last FROM absensi")
+    row = cursor.fetchone()
+    span = int((row['last'] - row['first']).total_seconds())
+    nrp = f"{2200000000 + random.randrange(employees)}"
+    waktu = row['first'] + timedelta(seconds=random.randrange(span))
+    return nrp, waktu
+
+
+def query_cases(nrp, waktu):
+    """(nama, query baru, parameter, index yang diharapkan, query lama, parameter lama)"""
+    day_start, day_end = day_range(waktu)
+    return [
+        ('absen: absensi terakhir hari itu',
+         SQL_LAST_ABSENSI_OF_DAY, (nrp, day_start, waktu), {'idx_nrp_waktu'},
+         LEGACY_LAST_ABSENSI_OF_DAY, (nrp, waktu.strftime("%Y-%m-%d"), waktu)),
+        ('absensi/today: semua absensi satu hari',
+         SQL_ABSENSI_BETWEEN + SQL_ABSENSI_KEYSET_ORDER, (day_start, day_end), {'idx_waktu', 'idx_nrp_waktu'},
+         LEGACY_ABSENSI_OF_DAY, (waktu.strftime("%Y-%m-%d"),)),
+    ]
+
+
+# ==================== PEMERIKSAAN EXPLAIN ====================
+def explain(cursor, sql, params):
+    cursor.execute("EXPLAIN " + sql, params)
+    return cursor.fetchall()[0]
+
+
+def check_plans(cursor):
+    """Mengembalikan daftar pesan kegagalan; kosong berarti semua query memakai index"""
+    failures = []
+    nrp, waktu = sample_params(cursor)
+    for name, sql, params, expected_keys, legacy_sql, legacy_params in query_cases(nrp, waktu):
+        plan = explain(cursor, sql, params)
+        legacy = explain(cursor, legacy_sql, legacy_params)
+        print(f"   {name}")
+        print(f"      baru : type={plan['type']}, key={plan['key']}, rows={plan['rows']}")
+        print(f"      lama : type={legacy['type']}, key={legacy['key']}, rows={legacy['rows']}")
+        if plan['type'] == 'ALL' or plan['key'] not in expected_keys:
+            failures.append(f"{name}: type={plan['type']}, key={plan['key']} (harus {sorted(expected_keys)})")
+    return failures
+
+
+# ==================== BENCHMARK ====================
+def benchmark(cursor, repeat=REPEAT):
+    """Median waktu eksekusi (ms) query baru vs lama dengan parameter acak yang sama"""
+    timings = {}
+    for _ in range(repeat):
+        nrp, waktu = sample_params(cursor)
+        for name, sql, params, _, legacy_sql, legacy_params in query_cases(nrp, waktu):
+            entry = timings.setdefault(name, {'baru': [], 'lama': []})
+            for label, q, p in (('baru', sql, params), ('lama', legacy_sql, legacy_params)):
+                start = time.perf_counter()
+                cursor.execute(q, p)
+                cursor.fetchall()
+                entry[label].append((time.perf_counter() - start) * 1000)
+    return {name: {label: float(np.median(v)) for label, v in entry.items()} for name, entry in timings.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="EXPLAIN check dan benchmark query absensi")
+    parser.add_argument('--rows', type=int, default=ROWS)
+    parser.add_argument('--employees', type=int, default=EMPLOYEES)
+    parser.add_argument('--skip-seed', action='store_true', help="Pakai tabel bench yang sudah ada")
+    parser.add_argument('--check-only', action='store_true', help="Hanya EXPLAIN, tanpa benchmark")
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        print("=" * 50)
+        print(f"🗄️  Seed {args.rows} baris ke {BENCH_DATABASE}.absensi")
+        print("=" * 50)
+        seed(args.rows, args.employees)
+
+    connection = connect(BENCH_DATABASE)
+    cursor = connection.cursor(dictionary=True)
+    try:
+        print("=" * 50)
+        print("🔍 EXPLAIN query absensi")
+        print("=" * 50)
+        failures = check_plans(cursor)
+
+        if not args.check_only:
+            print("=" * 50)
+            print(f"⏱  Median {args.repeat} eksekusi")
+            print("=" * 50)
+            for name, r in benchmark(cursor, args.repeat).items():
+                print(f"   {name:<40} baru {r['baru']:8.2f} ms | lama {r['lama']:8.2f} ms")
+    finally:
+        cursor.close()
+        connection.close()
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ Semua query absensi memakai index")
@@ -0,0 +1,48 @@
+import multiprocessing
+import os
+import sys
+
+# ==================== KONFIGURASI SERVER PRODUKSI ====================
+HOST = os.environ.get('HOST', '0.0.0.0')
+PORT = int(os.environ.get('PORT', 5000))
+CPU_COUNT = multiprocessing.cpu_count()
+# Waitress satu proses: thread diperbanyak karena sebagian besar waktu request menunggu MySQL
+WAITRESS_THREADS = int(os.environ.get('WEB_THREADS', min(32, CPU_COUNT * 4)))
+REQUEST_TIMEOUT = int(os.environ.get('WEB_TIMEOUT', 30))
+
+
+def serve_waitress():
+    """Windows (Laragon/XAMPP): waitress multi-thread, debug mati"""
+    os.environ['DB_POOL_SIZE'] = os.environ.get('DB_POOL_SIZE', str(WAITRESS_THREADS))
+    from waitress import serve
+
+    from app import app
+
+    print(f"✅ Waitress: http://{HOST}:{PORT} ({WAITRESS_THREADS} thread, pool DB {os.environ['DB_POOL_SIZE']})")
+    serve(
+        app,
+        host=HOST,
+        port=PORT,
+        threads=WAITRESS_THREADS,
+        channel_timeout=REQUEST_TIMEOUT,
+        connection_limit=WAITRESS_THREADS * 8,
+        max_request_body_size=16 * 1024 * 1024
+    )
+
+
+def serve_gunicorn():
+    """Linux: gunicorn multi-worker sesuai gunicorn.conf.py (reload graceful via SIGHUP)
+
+    Master juga menjalankan proses identify terpisah (IDENTIFY_BIND), lihat gunicorn.conf.py.
+    """
+    config = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+    os.environ.setdefault('BIND', f"{HOST}:{PORT}")
+    os.execvp('gunicorn', ['gunicorn', '-c', config, 'app:app'])
+
+
+if __name__ == '__main__':
+    os.environ['APP_ENV'] = 'production'
+    if sys.platform == 'win32' or '--waitress' in sys.argv:
+        serve_waitress()
+    else:
+        serve_gunicorn()
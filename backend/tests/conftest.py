@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# app.py memakai import lokal dan path relatif (../uploads, ../cache); arahkan ke folder sementara
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+_tmp = tempfile.mkdtemp(prefix='hrd-absensi-test-')
+os.environ.setdefault('GALLERY_VERSION_FILE', os.path.join(_tmp, 'gallery.version'))
+os.environ.setdefault('PHOTO_ROOT', os.path.join(_tmp, 'uploads'))
+os.environ.setdefault('PHOTO_WORKERS', '0')
+os.environ.setdefault('DB_POOL_SIZE', '0')
@@ -0,0 +1,86 @@
+import io
+import json
+
+import pytest
+
+import app as backend
+
+
+class FakeCursor:
+    def __init__(self, events):
+        self.events = events
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        if 'FROM karyawan' in sql:
+            self.rows = [{'nrp': '1001', 'nama': 'Budi'}]
+        elif 'LAST_INSERT_ID() AS seq' in sql:
+            self.rows = [{'seq': 1}]
+        else:
+            self.rows = []
+
+    def executemany(self, sql, rows):
+        if 'INSERT INTO absensi' in sql:
+            self.events.append(('insert', [row[6] for row in rows]))
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, events):
+        self.events = events
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self.events)
+
+    def start_transaction(self):
+        self.events.append(('start_transaction',))
+
+    def commit(self):
+        self.events.append(('commit',))
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def events(monkeypatch):
+    events = []
+    save_photo = backend.save_photo
+
+    def recording_save_photo(foto):
+        events.append(('save_photo',))
+        return save_photo(foto)
+
+    monkeypatch.setattr(backend, 'save_photo', recording_save_photo)
+    monkeypatch.setattr(backend, 'get_db_connection', lambda: FakeConnection(events))
+    return events
+
+
+def test_batch_saves_photos_before_transaction(events):
+    records = [
+        {'nrp': '1001', 'latitude': '-6.8', 'longitude': '107.5', 'waktu': '2026-01-05 07:00:00', 'foto': 'f1'},
+        {'nrp': '1001', 'latitude': '-6.8', 'longitude': '107.5', 'waktu': '2026-01-05 17:00:00', 'foto': 'f2'},
+    ]
+    response = backend.app.test_client().post('/api/v2/absen/batch', data={
+        'records': json.dumps(records),
+        'f1': (io.BytesIO(b'foto pagi'), 'f1.jpg'),
+        'f2': (io.BytesIO(b'foto sore'), 'f2.jpg'),
+    })
+
+    assert response.status_code == 200
+    assert [r['status'] for r in response.get_json()['data']] == [200, 200]
+    names = [event[0] for event in events]
+    assert names[:3] == ['save_photo', 'save_photo', 'start_transaction']
+    stored = dict(e for e in events if e[0] == 'insert')['insert']
+    assert all(backend.photo_store.backend.root in path for path in stored)
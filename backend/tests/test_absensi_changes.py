@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as backend
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        if 'FROM attendance_seq' in sql:
+            self.rows = [(self.db.seq,)]
+        elif 'FROM attendance_day' in sql:
+            after, limit = params
+            self.rows = sorted((r for r in self.db.days if r['seq'] > after), key=lambda r: r['seq'])[:limit]
+        else:
+            raise AssertionError(f"Query tidak terduga: {sql}")
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self.db)
+
+    def close(self):
+        pass
+
+
+class FakeDB:
+    def __init__(self):
+        now = datetime.now().replace(microsecond=0)
+        self.days = [
+            {'nrp': '1001', 'tanggal': now.date(), 'check_in_at': now, 'check_out_at': None,
+             'last_status': 'Check In', 'last_at': now, 'seq': 1},
+            {'nrp': '1002', 'tanggal': now.date() - timedelta(days=1), 'check_in_at': now, 'check_out_at': now,
+             'last_status': 'Check Out', 'last_at': now, 'seq': 2},
+            {'nrp': '1003', 'tanggal': now.date(), 'check_in_at': now, 'check_out_at': now,
+             'last_status': 'Sudah Check Out', 'last_at': now, 'seq': 3},
+        ]
+        self.seq = 3
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(backend, 'get_db_connection', lambda: FakeConnection(db))
+    return backend.app.test_client()
+
+
+def test_changes_returns_today_after_cursor(client):
+    response = client.get('/api/v2/absensi/changes?after=0')
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert body['cursor'] == 3
+    assert body['more'] is False
+    assert [(c['seq'], c['nrp'], c['status']) for c in body['data']] == [(1, '1001', 'Check In'), (3, '1003', 'Check Out')]
+
+
+def test_changes_without_new_rows_keeps_cursor(client):
+    response = client.get('/api/v2/absensi/changes?after=3&wait=0')
+
+    assert response.status_code == 200
+    assert response.get_json()['cursor'] == 3
+    assert response.get_json()['data'] == []
+
+
+def test_changes_rejects_invalid_after(client):
+    assert client.get('/api/v2/absensi/changes?after=x').status_code == 400
+
+
+def test_feed_reads_committed_sequence(client):
+    assert backend.attendance_feed.read_seq() == 3
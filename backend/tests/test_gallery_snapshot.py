@@ -0,0 +1,43 @@
+import gallery_snapshot
+from gallery_snapshot import GALLERY_CACHE_MAX_AGE, GallerySnapshotCache
+
+
+def test_snapshot_rebuilt_only_when_version_changes(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(gallery_snapshot.time, 'time', lambda: clock[0])
+    cache = GallerySnapshotCache(str(tmp_path / 'gallery.version'))
+    builds = []
+
+    def build(version):
+        builds.append(version)
+        return 'cursor', 1, {'packed': b'{}'}
+
+    cache.get(build)
+    clock[0] += 600  # Jauh melewati TTL lama (60 detik), token tidak berubah
+    cache.get(build)
+    assert len(builds) == 1
+
+    cache.invalidate()
+    cache.get(build)
+    assert len(builds) == 2
+
+    clock[0] += GALLERY_CACHE_MAX_AGE
+    cache.get(build)
+    assert len(builds) == 3
+
+
+def test_derived_variant_built_once(tmp_path):
+    cache = GallerySnapshotCache(str(tmp_path / 'gallery.version'))
+    snapshot = cache.get(lambda version: ('cursor', 1, {'packed': b'packed'}))
+    derived = []
+
+    def derive(snapshot):
+        derived.append(snapshot.version)
+        yield b'{"data": '
+        yield b'[]}'
+
+    path = cache.body_path(snapshot, 'json', derive)
+    assert cache.body_path(snapshot, 'json', derive) == path
+    assert derived == [snapshot.version]
+    with open(path, 'rb') as f:
+        assert f.read() == b'{"data": []}'
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+import app as backend
+from embedding_codec import EMBEDDING_DIM, pack_gallery, templates_to_blob
+from gallery_snapshot import GallerySnapshotCache
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        self.conn.queries.append((' '.join(sql.split()), params))
+        if 'FROM gallery_seq' in sql:
+            self.rows = [{'seq': self.conn.seq, 'purged_seq': self.conn.purged_seq}]
+        elif 'FROM karyawan_deleted' in sql:
+            self.rows = [{'nrp': '1002'}]
+        else:
+            self.rows = [{'nrp': '1001', 'nama': 'Budi', 'face_embedding': b''}]
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, seq=42, purged_seq=0):
+        self.seq = seq
+        self.purged_seq = purged_seq
+        self.queries = []
+        self.snapshot = False
+        self.rolled_back = False
+
+    def start_transaction(self, consistent_snapshot=False, readonly=False):
+        self.snapshot = consistent_snapshot and readonly
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+def test_delta_uses_gallery_seq_from_one_snapshot():
+    conn = FakeConnection(seq=42)
+
+    karyawan_list, deleted, seq, since = backend.fetch_face_gallery(conn, 40)
+
+    assert (seq, since, deleted) == (42, 40, ['1002'])
+    assert conn.snapshot and conn.rolled_back
+    delta_queries = [q for q in conn.queries if 'gallery_seq >' in q[0] or 'd.seq >' in q[0]]
+    assert [params for _, params in delta_queries] == [(40,), (40,)]
+    assert not any('updated_at >=' in sql or 'NOW()' in sql for sql, _ in conn.queries)
+
+
+def test_cursor_before_purged_tombstones_gets_full_snapshot():
+    conn = FakeConnection(seq=42, purged_seq=30)
+
+    _, deleted, seq, since = backend.fetch_face_gallery(conn, 10)
+
+    assert (seq, since, deleted) == (42, None, [])
+
+
+@pytest.mark.parametrize('since, expected', [
+    ('17', (17, None)),
+    ('2024-01-01 08:00:00', (None, None)),  # Cursor tanggal lama -> full resync sekali
+])
+def test_parse_since_arg(since, expected):
+    with backend.app.test_request_context(f'/?since={since}'):
+        assert backend.parse_since_arg() == expected
+
+
+def test_parse_since_arg_rejects_garbage():
+    with backend.app.test_request_context('/?since=kemarin'):
+        _, error = backend.parse_since_arg()
+    assert error[1] == 400
+
+
+@pytest.fixture
+def snapshot_cache(tmp_path, monkeypatch):
+    template = np.zeros((1, EMBEDDING_DIM), dtype=np.float32)
+    template[0, 0] = 1.0
+    rows = [{'nrp': '1001', 'nama': 'Budi', 'face_embedding': templates_to_blob(template)}]
+    builds = []
+
+    def build_gallery_snapshot(version):
+        builds.append(version)
+        return '42', 42, {
+            'json_delta': backend.app.json.dumps(backend.face_gallery_json([], '42', False, [])).encode('utf-8'),
+            'packed': pack_gallery(rows, cursor='42', full=True),
+            'packed_delta': pack_gallery([], cursor='42', full=False)
+        }
+
+    monkeypatch.setattr(backend, 'gallery_cache', GallerySnapshotCache(str(tmp_path / 'gallery.version')))
+    monkeypatch.setattr(backend, 'build_gallery_snapshot', build_gallery_snapshot)
+    return rows, builds
+
+
+def test_legacy_cursor_served_full_snapshot(snapshot_cache):
+    rows, _ = snapshot_cache
+    client = backend.app.test_client()
+
+    full = client.get('/api/v2/face-recognition?since=2024-01-01 08:00:00')
+    assert full.get_json() == backend.face_gallery_json(rows, '42', True, [])
+    assert client.get('/api/v2/face-recognition?since=42').get_json()['data'] == []
+
+
+def test_snapshot_files_shared_between_workers(snapshot_cache, tmp_path):
+    _, builds = snapshot_cache
+    client = backend.app.test_client()
+    first = client.get('/api/v2/face-recognition/packed')
+
+    # Worker lain di host yang sama memakai file yang sudah dibangun
+    backend.gallery_cache = GallerySnapshotCache(str(tmp_path / 'gallery.version'))
+    second = client.get('/api/v2/face-recognition/packed')
+    assert len(builds) == 1
+    assert second.data == first.data and second.headers['ETag'] == first.headers['ETag']
+
+    revalidated = client.get('/api/v2/face-recognition/packed', headers={'If-None-Match': first.headers['ETag']})
+    assert revalidated.status_code == 304
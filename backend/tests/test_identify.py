@@ -0,0 +1,87 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy as np
+import pytest
+
+import app as backend
+from embedding_codec import EMBEDDING_DIM, templates_to_blob
+from face_index import FaceIndex
+
+
+@pytest.fixture
+def gallery(monkeypatch):
+    template = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    template[0] = 1.0
+    state = {'fetches': 0}
+
+    def fetch_face_gallery(connection, since):
+        state['fetches'] += 1
+        rows = [{'nrp': '1001', 'nama': 'Budi', 'face_embedding': templates_to_blob([template])}] if since is None else []
+        return rows, [], 'now', since
+
+    def get_db_connection():
+        state['connections'] = state.get('connections', 0) + 1
+        return type('Conn', (), {'close': lambda self: None})()
+
+    monkeypatch.setattr(backend, 'face_index', FaceIndex(refresh_interval=60))
+    monkeypatch.setattr(backend, 'fetch_face_gallery', fetch_face_gallery)
+    monkeypatch.setattr(backend, 'get_db_connection', get_db_connection)
+    return template, state
+
+
+def test_throttled_identify_does_not_touch_pool(gallery):
+    template, state = gallery
+    client = backend.app.test_client()
+
+    for _ in range(3):
+        response = client.post('/api/v2/identify', json={'embeddings': template.tolist()})
+        assert response.status_code == 200
+        assert response.get_json()['data'][0]['matches'][0]['nrp'] == '1001'
+
+    assert state['fetches'] == 1
+    assert state['connections'] == 1
+
+
+@pytest.fixture
+def identify_upstream(monkeypatch):
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+            body = json.dumps({'status': 200, 'data': [{'matches': []}]}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(backend, 'IDENTIFY_UPSTREAM', f'http://127.0.0.1:{server.server_port}')
+    monkeypatch.setattr(backend, 'face_index', FaceIndex())
+    yield received
+    server.shutdown()
+
+
+def test_identify_forwarded_without_loading_gallery(identify_upstream, monkeypatch):
+    def no_db():
+        raise AssertionError("Worker yang meneruskan identify tidak boleh memuat galeri")
+    monkeypatch.setattr(backend, 'get_db_connection', no_db)
+
+    response = backend.app.test_client().post('/api/v2/identify', json={'embeddings': [0.1] * EMBEDDING_DIM})
+
+    assert response.status_code == 200
+    assert identify_upstream == [{'embeddings': [0.1] * EMBEDDING_DIM}]
+    assert not backend.face_index.loaded
+
+
+def test_write_through_skipped_until_loaded():
+    index = FaceIndex()
+    index.upsert('1001', 'Budi', np.ones((1, EMBEDDING_DIM), dtype=np.float32))
+    assert len(index) == 0
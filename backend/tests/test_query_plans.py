@@ -0,0 +1,25 @@
+import mysql.connector
+import pytest
+
+import query_bench
+
+# Cukup besar agar optimizer memilih index, cukup kecil untuk suite test
+ROWS = 50000
+
+
+@pytest.fixture(scope='module')
+def bench_cursor():
+    try:
+        query_bench.connect().close()
+    except mysql.connector.Error as e:
+        pytest.skip(f"MySQL tidak tersedia untuk pemeriksaan EXPLAIN: {e}")
+    query_bench.seed(ROWS)
+    connection = query_bench.connect(query_bench.BENCH_DATABASE)
+    cursor = connection.cursor(dictionary=True)
+    yield cursor
+    cursor.close()
+    connection.close()
+
+
+def test_absensi_queries_use_index(bench_cursor):
+    assert query_bench.check_plans(bench_cursor) == []
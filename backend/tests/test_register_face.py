@@ -0,0 +1,32 @@
+import pytest
+
+import app as backend
+from embedding_codec import EMBEDDING_DIM, templates_to_blob
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def no_db():
+        raise AssertionError("Encodings tidak valid tidak boleh sampai ke database")
+    monkeypatch.setattr(backend, 'get_db_connection', no_db)
+    return backend.app.test_client()
+
+
+@pytest.mark.parametrize('dim', [128, EMBEDDING_DIM + 1])
+def test_register_rejects_wrong_dimension(client, dim):
+    response = client.post('/api/v2/face-recognition/register', json=[{'nrp': '1001', 'encodings': [[0.1] * dim]}])
+
+    assert response.status_code == 400
+
+
+def test_templates_to_blob_rejects_wrong_dimension():
+    with pytest.raises(ValueError):
+        templates_to_blob([[0.1] * 128])
+    assert len(templates_to_blob([[0.1] * EMBEDDING_DIM])) == EMBEDDING_DIM * 2
+
+
+def test_register_rejects_unknown_color_order(client):
+    payload = [{'nrp': '1001', 'encodings': [[0.1] * EMBEDDING_DIM], 'color_order': 'YUV'}]
+    response = client.post('/api/v2/face-recognition/register', json=payload)
+
+    assert response.status_code == 400
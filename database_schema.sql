@@ -7,12 +7,35 @@ CREATE TABLE IF NOT EXISTS karyawan (
     id INT AUTO_INCREMENT PRIMARY KEY,
     nrp VARCHAR(20) UNIQUE NOT NULL,
     nama VARCHAR(100) NOT NULL,
-    face_encoding TEXT,
+    face_encoding MEDIUMTEXT,  -- Format lama (JSON), diganti face_embedding
+    face_embedding MEDIUMBLOB,  -- Template embedding float16 little-endian (jumlah template x 512)
+    face_color_order CHAR(3) NULL,  -- Urutan warna frame saat embedding: BGR (kiosk sekarang) atau RGB (perlu daftar ulang)
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    INDEX idx_nrp (nrp)
+    gallery_seq BIGINT NOT NULL DEFAULT 0,  -- gallery_seq saat wajah/nama terakhir berubah (cursor delta sync)
+    INDEX idx_nrp (nrp),
+    INDEX idx_updated_at (updated_at),
+    INDEX idx_gallery_seq (gallery_seq)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- Tombstone karyawan yang dihapus (untuk delta sync face encoding di kiosk)
+CREATE TABLE IF NOT EXISTS karyawan_deleted (
+    nrp VARCHAR(20) PRIMARY KEY,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    seq BIGINT NOT NULL DEFAULT 0,  -- gallery_seq saat dihapus
+    INDEX idx_deleted_at (deleted_at),
+    INDEX idx_seq (seq)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Sequence perubahan galeri wajah (satu baris, dinaikkan di setiap transaksi yang mengubah karyawan)
+CREATE TABLE IF NOT EXISTS gallery_seq (
+    id TINYINT PRIMARY KEY,
+    seq BIGINT NOT NULL,
+    purged_seq BIGINT NOT NULL DEFAULT 0  -- Tombstone dengan seq <= ini sudah dibersihkan
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO gallery_seq (id, seq) VALUES (1, 0);
+
 -- Tabel absensi
 CREATE TABLE IF NOT EXISTS absensi (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -23,10 +46,36 @@ CREATE TABLE IF NOT EXISTS absensi (
     latitude VARCHAR(50),
     longitude VARCHAR(50),
     foto_path VARCHAR(255),
+    event_id VARCHAR(36) NULL,  -- Idempotency key dari outbox kiosk
     FOREIGN KEY (nrp) REFERENCES karyawan(nrp) ON DELETE CASCADE,
-    INDEX idx_waktu (waktu)
+    INDEX idx_waktu (waktu),
+    INDEX idx_nrp_waktu (nrp, waktu),
+    UNIQUE INDEX uq_event_id (event_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- Status absensi per karyawan per hari (diperbarui bersama setiap INSERT absensi)
+CREATE TABLE IF NOT EXISTS attendance_day (
+    nrp VARCHAR(20) NOT NULL,
+    tanggal DATE NOT NULL,
+    check_in_at DATETIME NULL,   -- Check In pertama hari itu
+    check_out_at DATETIME NULL,  -- Check Out pertama hari itu
+    last_status VARCHAR(50),     -- Status absensi terakhir (termasuk "Sudah ...")
+    last_at DATETIME NOT NULL,   -- Waktu absensi terakhir, dasar aturan 4 jam check out
+    seq BIGINT NOT NULL DEFAULT 0,  -- attendance_seq saat baris terakhir berubah
+    PRIMARY KEY (nrp, tanggal),
+    INDEX idx_tanggal (tanggal),
+    INDEX idx_seq (seq),
+    FOREIGN KEY (nrp) REFERENCES karyawan(nrp) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Sequence perubahan status absensi (satu baris, dinaikkan di setiap transaksi absensi)
+CREATE TABLE IF NOT EXISTS attendance_seq (
+    id TINYINT PRIMARY KEY,
+    seq BIGINT NOT NULL
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO attendance_seq (id, seq) VALUES (1, 0);
+
 -- Contoh data karyawan (untuk testing)
 INSERT INTO karyawan (nrp, nama) VALUES
 ('2211038022', 'Rifki Hikmali Yusup'),
@@ -0,0 +1,176 @@
+import time
+
+import numpy as np
+
+# ==================== KONFIGURASI INDEKS ====================
+DEFAULT_NPROBE = 8
+TRAIN_ITERATIONS = 10
+TRAIN_SAMPLE_PER_LIST = 64  # Jumlah sampel training per centroid
+
+
+# ==================== IVF INDEX ====================
+class IVFIndex:
+    """Indeks inverted-file (IVF) pure NumPy untuk embedding yang sudah dinormalisasi.
+
+    Ruang embedding dibagi menjadi `nlist` cluster dengan spherical k-means.
+    Setiap baris galeri dimasukkan ke daftar cluster terdekat, dan pencarian
+    hanya memeriksa baris dari `nprobe` cluster yang paling mirip dengan query.
+    Indeks hanya menyimpan nomor baris; vektornya tetap di matriks FaceGallery.
+    """
+
+    def __init__(self, dim, nlist=None, nprobe=DEFAULT_NPROBE, seed=0):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.seed = seed
+        self.centroids = None
+        self.trained_size = 0
+        self._lists = []
+        self._assign = {}   # row -> id cluster
+        self._arrays = {}   # cache numpy array per cluster
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    def __len__(self):
+        return len(self._assign)
+
+    # ---------- Training ----------
+    def train(self, matrix):
+        """Melatih centroid dengan spherical k-means pada baris `matrix`"""
+        n = matrix.shape[0]
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(self.seed)
+
+        sample_size = min(n, nlist * TRAIN_SAMPLE_PER_LIST)
+        sample = matrix[rng.choice(n, sample_size, replace=False)] if sample_size < n else matrix
+        centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+
+        for _ in range(TRAIN_ITERATIONS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=nlist)
+            empty = counts == 0
+            # Cluster kosong diisi ulang dengan sampel acak
+            sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        self.nlist = nlist
+        self.centroids = np.ascontiguousarray(centroids)
+        self.trained_size = n
+        self._lists = [set() for _ in range(nlist)]
+        self._assign = {}
+        self._arrays = {}
+
+    def reset(self):
+        self.centroids = None
+        self.trained_size = 0
+        self._lists = []
+        self._assign = {}
+        self._arrays = {}
+
+    # ---------- Mutasi ----------
+    def _nearest_lists(self, vectors, nprobe):
+        sims = vectors @ self.centroids.T
+        nprobe = min(nprobe, self.nlist)
+        if nprobe == self.nlist:
+            return np.argsort(-sims, axis=1)
+        return np.argpartition(-sims, nprobe - 1, axis=1)[:, :nprobe]
+
+    def add_many(self, rows, matrix, chunk=8192):
+        """Memasukkan banyak baris sekaligus (dipakai setelah training)"""
+        for start in range(0, len(rows), chunk):
+            block = self._nearest_lists(matrix[start:start + chunk], 1)[:, 0]
+            for row, list_id in zip(rows[start:start + chunk], block):
+                self._insert(int(row), int(list_id))
+
+    def add(self, row, vector):
+        list_id = int(self._nearest_lists(vector.reshape(1, -1), 1)[0, 0])
+        self._insert(row, list_id)
+
+    def _insert(self, row, list_id):
+        self.remove(row)
+        self._assign[row] = list_id
+        self._lists[list_id].add(row)
+        self._arrays.pop(list_id, None)
+
+    def remove(self, row):
+        list_id = self._assign.pop(row, None)
+        if list_id is not None:
+            self._lists[list_id].discard(row)
+            self._arrays.pop(list_id, None)
+
+    def move(self, src, dst):
+        """Baris `src` dipindah ke posisi `dst` oleh galeri (swap-remove)"""
+        list_id = self._assign.pop(src, None)
+        if list_id is None:
+            return
+        self._lists[list_id].discard(src)
+        self._insert(dst, list_id)
+
+    # ---------- Pencarian ----------
+    def _list_array(self, list_id):
+        array = self._arrays.get(list_id)
+        if array is None:
+            array = np.fromiter(self._lists[list_id], dtype=np.int64, count=len(self._lists[list_id]))
+            self._arrays[list_id] = array
+        return array
+
+    def candidates(self, query, nprobe=None):
+        """Nomor baris kandidat dari `nprobe` cluster terdekat dengan query"""
+        probe_lists = self._nearest_lists(query.reshape(1, -1), nprobe or self.nprobe)[0]
+        arrays = [self._list_array(int(list_id)) for list_id in probe_lists]
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+
+
+# ==================== LAPORAN RECALL VS LATENSI ====================
+def recall_latency_report(size=100000, dim=512, queries=200, nprobes=(1, 2, 4, 8, 16, 32), noise=0.6, seed=0):
+    """Membandingkan recall@1 dan latensi IVF terhadap pencarian exact di FaceGallery.
+
+    Query dibuat dari embedding galeri ditambah noise agar menyerupai wajah
+    yang sama difoto ulang di kiosk.
+    """
+    from gallery import FaceGallery
+
+    rng = np.random.default_rng(seed)
+    gallery = FaceGallery(dim=dim)
+    encodings = rng.standard_normal((size, dim), dtype=np.float32)
+    gallery.build([str(i) for i in range(size)], [str(i) for i in range(size)], encodings)
+
+    targets = rng.choice(size, queries, replace=False)
+    probes = gallery.embeddings[targets] + noise * rng.standard_normal((queries, dim), dtype=np.float32) / np.sqrt(dim)
+
+    start = time.perf_counter()
+    exact = [gallery.match(probe, threshold=-1.0)[0][0] for probe in probes]
+    exact_ms = (time.perf_counter() - start) * 1000 / queries
+
+    start = time.perf_counter()
+    gallery.enable_ann(min_size=0)
+    build_s = time.perf_counter() - start
+
+    rows = []
+    for nprobe in nprobes:
+        gallery.set_nprobe(nprobe)
+        start = time.perf_counter()
+        approx = [gallery.match(probe, threshold=-1.0) for probe in probes]
+        latency_ms = (time.perf_counter() - start) * 1000 / queries
+        hits = sum(1 for a, e in zip(approx, exact) if a and a[0][0] == e)
+        rows.append({'nprobe': nprobe, 'recall': hits / queries, 'latency_ms': latency_ms})
+
+    return {'size': size, 'exact_ms': exact_ms, 'build_s': build_s, 'rows': rows}
+
+
+if __name__ == '__main__':
+    report = recall_latency_report()
+    print("=" * 50)
+    print(f"📈 Recall vs latensi IVF ({report['size']} identitas)")
+    print("=" * 50)
+    print(f"   Exact search      : {report['exact_ms']:.3f} ms/query")
+    print(f"   Build indeks      : {report['build_s']:.2f} s")
+    for row in report['rows']:
+        print(f"   nprobe={row['nprobe']:<3}: recall@1 {row['recall']:.3f} | {row['latency_ms']:.3f} ms/query")
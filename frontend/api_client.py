@@ -0,0 +1,104 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ==================== KONFIGURASI HTTP CLIENT ====================
+POOL_SIZE = 8             # Koneksi keep-alive per host
+MAX_WORKERS = 4           # Thread pool untuk request async
+DEFAULT_TIMEOUT = 10
+RETRY_BACKOFF = 0.5       # Detik; jeda retry ke-n = RETRY_BACKOFF * 2^n
+RETRY_STATUS = (502, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE')
+
+
+class _InFlight:
+    """Request GET yang sedang berjalan; pemanggil duplikat menunggu hasil yang sama"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+# ==================== API CLIENT ====================
+class ApiClient:
+    """HTTP client bersama untuk kiosk
+
+    Satu requests.Session dengan connection pool keep-alive, timeout dan retry
+    per pemanggilan, penggabungan GET identik yang sedang berjalan, serta API
+    berbasis Future (`submit`, `get_async`) agar UI thread tidak pernah
+    menunggu jaringan.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, max_workers=MAX_WORKERS):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="api")
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    # ---------- Sinkron (dipanggil dari thread background) ----------
+    def request(self, method, url, timeout=DEFAULT_TIMEOUT, retries=0, **kwargs):
+        """Request dengan retry untuk error koneksi/5xx sementara (hanya method idempoten)"""
+        method = method.upper()
+        if method not in IDEMPOTENT_METHODS:
+            retries = 0
+        for attempt in range(retries + 1):
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS or attempt == retries:
+                    return response
+            time.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+    def get(self, url, params=None, timeout=DEFAULT_TIMEOUT, retries=1, **kwargs):
+        """GET; request identik yang sedang berjalan di thread lain dipakai bersama"""
+        key = (url, tuple(sorted((params or {}).items())), tuple(sorted(kwargs.get('headers', {}).items())))
+        with self._lock:
+            call = self._inflight.get(key)
+            owner = call is None
+            if owner:
+                call = self._inflight[key] = _InFlight()
+
+        if not owner:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.response
+
+        try:
+            call.response = self.request('GET', url, params=params, timeout=timeout, retries=retries, **kwargs)
+            return call.response
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    def post(self, url, timeout=DEFAULT_TIMEOUT, **kwargs):
+        return self.request('POST', url, timeout=timeout, **kwargs)
+
+    def delete(self, url, timeout=DEFAULT_TIMEOUT, retries=0, **kwargs):
+        return self.request('DELETE', url, timeout=timeout, retries=retries, **kwargs)
+
+    # ---------- Async ----------
+    def submit(self, fn, *args, **kwargs):
+        """Menjalankan fungsi (misalnya helper API) di thread pool; mengembalikan Future"""
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def get_async(self, url, **kwargs):
+        return self.executor.submit(self.get, url, **kwargs)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
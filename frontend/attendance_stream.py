@@ -0,0 +1,87 @@
+import threading
+
+# ==================== KONFIGURASI STREAM STATUS ====================
+LONG_POLL_WAIT = 25        # Detik ditahan backend jika belum ada perubahan
+RETRY_DELAY = 5.0          # Detik sebelum mencoba lagi setelah error jaringan
+LEGACY_POLL_INTERVAL = 30  # Backend lama tanpa /absensi/changes: muat ulang penuh berkala
+
+
+# ==================== ATTENDANCE STATUS STREAM ====================
+class AttendanceStatusStream:
+    """Menerapkan perubahan status absensi dari backend secara inkremental
+
+    Status hari ini dimuat penuh sekali (`load_snapshot`), lalu thread ini
+    long-poll /api/v2/absensi/changes dengan `after=<cursor>` dan memanggil
+    `on_change(nrp, status)` untuk setiap perubahan, termasuk absensi yang
+    tercatat di kiosk lain. Snapshot hanya dimuat ulang saat tanggal server
+    berganti atau jika backend belum mendukung long-poll; setelah jaringan
+    putus stream dilanjutkan dari cursor terakhir tanpa kehilangan perubahan.
+    """
+
+    def __init__(self, changes_url, client, load_snapshot, on_change, wait=LONG_POLL_WAIT):
+        self.changes_url = changes_url
+        self.client = client                # ApiClient bersama
+        self.load_snapshot = load_snapshot  # load_snapshot() -> (tanggal, cursor) atau None jika gagal
+        self.on_change = on_change
+        self.wait = wait
+        self.tanggal = None
+        self.cursor = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="attendance-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # Request long-poll yang sedang berjalan selesai sendiri paling lama `wait` detik
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.cursor is None and not self._reload():
+                continue
+            try:
+                response = self.client.get(
+                    self.changes_url,
+                    params={'after': self.cursor, 'wait': self.wait},
+                    timeout=self.wait + 10,
+                    retries=0
+                )
+            except Exception as e:
+                print(f"⚠️ Stream status absensi terputus: {e}")
+                self._stop.wait(RETRY_DELAY)
+                continue
+
+            if response.status_code in (404, 405):
+                print("⚠️ Endpoint /absensi/changes tidak tersedia, muat ulang status berkala")
+                self.cursor = None
+                self._stop.wait(LEGACY_POLL_INTERVAL)
+                continue
+            if response.status_code != 200:
+                self._stop.wait(RETRY_DELAY)
+                continue
+
+            body = response.json()
+            if body.get('tanggal') != self.tanggal:
+                # Hari berganti di server: status kemarin tidak berlaku lagi
+                self.cursor = None
+                continue
+            for change in body.get('data', []):
+                self.on_change(change['nrp'], change['status'])
+            self.cursor = body.get('cursor', self.cursor)
+
+    def _reload(self):
+        snapshot = self.load_snapshot()
+        if snapshot is None:
+            self._stop.wait(RETRY_DELAY)
+            return False
+        self.tanggal, self.cursor = snapshot
+        if self.cursor is None:
+            # Backend lama: snapshot tanpa cursor, tidak bisa long-poll
+            self._stop.wait(LEGACY_POLL_INTERVAL)
+            return False
+        return True
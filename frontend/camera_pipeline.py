@@ -0,0 +1,162 @@
+import collections
+import threading
+import time
+
+from latency import latency
+
+# ==================== KONFIGURASI PIPELINE KAMERA ====================
+QUEUE_SIZE = 1        # Hanya frame terbaru yang disimpan; frame lama dibuang
+FPS_WINDOW = 2.0      # Detik; jendela rata-rata FPS per stage
+READ_FAIL_SLEEP = 0.01
+
+
+# ==================== QUEUE ====================
+class LatestQueue:
+    """Queue terbatas yang membuang item paling lama saat penuh (drop-oldest)"""
+
+    def __init__(self, maxsize=QUEUE_SIZE):
+        self._items = collections.deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Menunggu item paling lama yang masih ada; None jika timeout"""
+        with self._cond:
+            if not self._items and not self._cond.wait(timeout):
+                return None
+            return self._items.popleft() if self._items else None
+
+    def get_latest_nowait(self):
+        """Mengambil item terbaru tanpa menunggu, item lain dibuang"""
+        with self._cond:
+            if not self._items:
+                return None
+            item = self._items.pop()
+            self.dropped += len(self._items)
+            self._items.clear()
+            return item
+
+    def clear(self):
+        with self._cond:
+            self._items.clear()
+
+
+# ==================== FPS METER ====================
+class StageMeter:
+    """Menghitung FPS sebuah stage dalam jendela waktu bergulir"""
+
+    def __init__(self, window=FPS_WINDOW):
+        self.window = window
+        self._ticks = collections.deque()
+        self._lock = threading.Lock()
+
+    def tick(self, now=None):
+        now = now or time.perf_counter()
+        with self._lock:
+            self._ticks.append(now)
+            while self._ticks and now - self._ticks[0] > self.window:
+                self._ticks.popleft()
+
+    @property
+    def fps(self):
+        with self._lock:
+            if len(self._ticks) < 2:
+                return 0.0
+            span = self._ticks[-1] - self._ticks[0]
+            return (len(self._ticks) - 1) / span if span > 0 else 0.0
+
+
+# ==================== CAMERA PIPELINE ====================
+class CameraPipeline:
+    """Pipeline kamera bertahap: grabber -> inference worker -> render di UI thread
+
+    Grabber selalu membaca frame terbaru dari kamera, worker menjalankan
+    `process_fn(frame)` (YOLO, tracker, anotasi) pada frame terbaru yang
+    tersedia, dan UI thread cukup mengambil hasil terbaru lewat `latest()`.
+    Antar stage dihubungkan LatestQueue sehingga frame basi dibuang.
+    """
+
+    def __init__(self, cap, process_fn, queue_size=QUEUE_SIZE):
+        self.cap = cap
+        self.process_fn = process_fn
+        self.frames = LatestQueue(queue_size)
+        self.results = LatestQueue(queue_size)
+        self.meters = {
+            'capture': StageMeter(),
+            'inference': StageMeter(),
+            'render': StageMeter()
+        }
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def running(self):
+        return bool(self._threads) and not self._stop.is_set()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._grab_loop, name="camera-grabber", daemon=True),
+            threading.Thread(target=self._inference_loop, name="camera-inference", daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=2.0):
+        """Menghentikan thread; panggil sebelum kamera dilepas"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self.frames.clear()
+        self.results.clear()
+
+    def _grab_loop(self):
+        while not self._stop.is_set():
+            with latency.stage('capture'):
+                success, frame = self.cap.read()
+            if not success:
+                time.sleep(READ_FAIL_SLEEP)
+                continue
+            self.meters['capture'].tick()
+            self.frames.put(frame)
+
+    def _inference_loop(self):
+        while not self._stop.is_set():
+            frame = self.frames.get(timeout=0.1)
+            if frame is None:
+                continue
+            try:
+                result = self.process_fn(frame)
+            except Exception as e:
+                print(f"❌ Error inference pipeline: {e}")
+                continue
+            self.meters['inference'].tick()
+            if result is not None:
+                self.results.put(result)
+
+    def latest(self):
+        """Hasil terbaru untuk dirender (dipanggil dari UI thread), atau None"""
+        result = self.results.get_latest_nowait()
+        if result is not None:
+            self.meters['render'].tick()
+        return result
+
+    def stats(self):
+        """FPS per stage dan jumlah frame yang dibuang"""
+        return {
+            'capture_fps': self.meters['capture'].fps,
+            'inference_fps': self.meters['inference'].fps,
+            'render_fps': self.meters['render'].fps,
+            'dropped_frames': self.frames.dropped,
+            'dropped_results': self.results.dropped
+        }
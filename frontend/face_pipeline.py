@@ -0,0 +1,106 @@
+import time
+
+import numpy as np
+from insightface.app.common import Face
+
+# ==================== KONFIGURASI PIPELINE ====================
+CROP_MARGIN = 0.3          # Margin crop di sekitar box YOLO (relatif terhadap ukuran box)
+LANDMARK_INPUT_SIZE = (160, 160)  # Resolusi input detektor saat hanya dipakai untuk landmark
+# Urutan warna frame yang di-embed (frame OpenCV apa adanya); dikirim saat registrasi agar server
+# bisa menandai template lama yang di-embed dari salinan RGB
+EMBED_COLOR_ORDER = 'BGR'
+
+
+def crop_with_margin(img, bbox, margin=CROP_MARGIN):
+    """Crop box (x1, y1, x2, y2) plus margin; mengembalikan (crop, offset_xy)"""
+    h, w = img.shape[:2]
+    x1, y1, x2, y2 = bbox
+    mx, my = int((x2 - x1) * margin), int((y2 - y1) * margin)
+    cx1, cy1 = max(0, int(x1) - mx), max(0, int(y1) - my)
+    cx2, cy2 = min(w, int(x2) + mx), min(h, int(y2) + my)
+    return img[cy1:cy2, cx1:cx2], np.array([cx1, cy1], dtype=np.float32)
+
+
+# ==================== CROP EMBEDDER ====================
+class CropEmbedder:
+    """Embedding ArcFace dari box YOLO tanpa deteksi ulang satu frame penuh
+
+    Detektor InsightFace hanya dijalankan pada crop kecil di sekitar box YOLO
+    dengan input 160x160 untuk mendapatkan 5 titik landmark, lalu model
+    recognition melakukan alignment (norm_crop) dan embedding.
+    """
+
+    def __init__(self, face_app, input_size=LANDMARK_INPUT_SIZE, margin=CROP_MARGIN):
+        self.detector = face_app.det_model
+        self.recognizer = face_app.models['recognition']
+        self.input_size = input_size
+        self.margin = margin
+
+    def embed(self, img, bbox):
+        """Mengembalikan objek Face (dengan normed_embedding) untuk box, atau None"""
+        crop, offset = crop_with_margin(img, bbox, self.margin)
+        if crop.size == 0:
+            return None
+
+        bboxes, kpss = self.detector.detect(crop, input_size=self.input_size, max_num=1)
+        if bboxes.shape[0] == 0 or kpss is None:
+            return None
+
+        face = Face(
+            bbox=bboxes[0, :4] + np.tile(offset, 2),
+            kps=kpss[0] + offset,
+            det_score=bboxes[0, 4]
+        )
+        # Alignment memakai kps pada frame asli agar resolusi wajah tidak turun
+        self.recognizer.get(img, face)
+        return face
+
+
+# ==================== BENCHMARK ====================
+def benchmark(face_app, embedder, frame, boxes, repeats=20):
+    """Membandingkan latensi app.get (deteksi penuh) vs CropEmbedder pada box yang sama"""
+    face_app.get(frame)
+    for box in boxes:
+        embedder.embed(frame, box)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        face_app.get(frame)
+    full_ms = (time.perf_counter() - start) * 1000 / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for box in boxes:
+            embedder.embed(frame, box)
+    crop_ms = (time.perf_counter() - start) * 1000 / repeats
+
+    return {'full_frame_ms': full_ms, 'yolo_crop_ms': crop_ms, 'faces': len(boxes)}
+
+
+if __name__ == '__main__':
+    import glob
+    import sys
+
+    import cv2
+    from insightface.app import FaceAnalysis
+    from ultralytics import YOLO
+
+    path = sys.argv[1] if len(sys.argv) > 1 else sorted(glob.glob("captures/*.jpg"))[-1]
+    frame = cv2.resize(cv2.imread(path), (1280, 720))
+
+    yolo = YOLO("model/l_versions_3_100.pt")
+    boxes = [tuple(map(int, box.xyxy[0])) for r in yolo(frame, verbose=False) for box in r.boxes]
+
+    print("=" * 50)
+    print(f"⏱  Benchmark embedding 1280x720 ({len(boxes)} wajah, {path})")
+    print("=" * 50)
+
+    # Sebelum: FaceAnalysis default (deteksi penuh + semua model atribut)
+    full_app = FaceAnalysis(providers=['CPUExecutionProvider'])
+    full_app.prepare(ctx_id=-1)
+    lean_app = FaceAnalysis(allowed_modules=['detection', 'recognition'], providers=['CPUExecutionProvider'])
+    lean_app.prepare(ctx_id=-1)
+
+    before = benchmark(full_app, CropEmbedder(lean_app), frame, boxes)
+    print(f"   Sebelum (app.get frame penuh) : {before['full_frame_ms']:.1f} ms")
+    print(f"   Sesudah (crop box YOLO)       : {before['yolo_crop_ms']:.1f} ms")
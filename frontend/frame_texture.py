@@ -0,0 +1,120 @@
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+# ==================== KONFIGURASI DISPLAY KAMERA ====================
+DISPLAY_CROP = (960, 1280)  # (lebar, tinggi) area tengah frame yang ditampilkan di kiosk
+
+
+def center_crop_rect(shape, crop=DISPLAY_CROP):
+    """Rect (x1, y1, x2, y2) area tengah frame, sama seperti crop lama di update_camera"""
+    h, w = shape[:2]
+    crop_w, crop_h = crop
+    x_center, y_center = w // 2, h // 2
+    x1 = max(0, x_center - crop_w // 2)
+    x2 = min(w, x_center + crop_w // 2)
+    y1 = max(0, y_center - crop_h // 2)
+    y2 = min(h, y_center + crop_h // 2)
+    return x1, y1, x2, y2
+
+
+# ==================== FRAME TEXTURE ====================
+class FrameTexture:
+    """Satu texture GPU per resolusi yang dipakai ulang untuk setiap frame kamera
+
+    Frame BGR di-upload langsung (tanpa cvtColor, flip atau tobytes).
+    Orientasi vertikal ditangani dengan membalik UV, dan crop tampilan
+    memakai TextureRegion sehingga tidak ada salinan piksel di CPU.
+    Harus dipanggil dari UI thread Kivy.
+    """
+
+    def __init__(self, colorfmt='bgr'):
+        self.colorfmt = colorfmt
+        self.texture = None
+        self._region = None
+        self._region_rect = None
+        self._char_buffer = False  # Beberapa versi Kivy hanya menerima buffer bertipe char
+
+    def _ensure_texture(self, width, height):
+        from kivy.graphics.texture import Texture
+
+        if self.texture is None or self.texture.size != (width, height):
+            self.texture = Texture.create(size=(width, height), colorfmt=self.colorfmt)
+            self._region = None
+            self._region_rect = None
+
+    def _blit(self, frame):
+        flat = frame.reshape(-1)
+        if not self._char_buffer:
+            try:
+                self.texture.blit_buffer(flat, colorfmt=self.colorfmt, bufferfmt='ubyte')
+                return
+            except ValueError:
+                self._char_buffer = True
+        self.texture.blit_buffer(flat.view(np.int8), colorfmt=self.colorfmt, bufferfmt='ubyte')
+
+    def update(self, frame, rect=None):
+        """Upload frame (H x W x 3, uint8) dan mengembalikan texture untuk area `rect`"""
+        frame = np.ascontiguousarray(frame)
+        h, w = frame.shape[:2]
+        self._ensure_texture(w, h)
+        self._blit(frame)
+
+        rect = rect or (0, 0, w, h)
+        if rect != self._region_rect:
+            x1, y1, x2, y2 = rect
+            # Baris 0 buffer = baris bawah texture, jadi y dihitung dari bawah lalu UV dibalik
+            self._region = self.texture.get_region(x1, h - y2, x2 - x1, y2 - y1)
+            self._region.flip_vertical()
+            self._region_rect = rect
+        return self._region
+
+
+# ==================== BENCHMARK ====================
+def _legacy_prepare(frame):
+    """Jalur lama di CPU: crop, cvtColor, flip vertikal dan tobytes setiap frame"""
+    x1, y1, x2, y2 = center_crop_rect(frame.shape)
+    img = cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2RGB)
+    return cv2.flip(img, 0).tobytes()
+
+
+def _zero_copy_prepare(frame):
+    """Jalur baru di CPU: hanya view tanpa alokasi piksel"""
+    center_crop_rect(frame.shape)
+    return np.ascontiguousarray(frame).reshape(-1)
+
+
+def benchmark(frame_size=(1280, 720), frames=300):
+    """Alokasi per frame (byte) dan waktu persiapan frame (ms) jalur lama vs baru
+
+    Upload GPU tidak diukur karena butuh konteks GL; bagian CPU inilah yang
+    sebelumnya mengalokasikan beberapa salinan frame penuh per tick.
+    """
+    w, h = frame_size
+    frame = np.random.default_rng(0).integers(0, 255, (h, w, 3), dtype=np.uint8)
+    report = {}
+    for name, prepare in (('legacy', _legacy_prepare), ('zero_copy', _zero_copy_prepare)):
+        prepare(frame)
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        allocated = 0
+        for _ in range(frames):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            prepare(frame)
+            allocated += tracemalloc.get_traced_memory()[1] - before
+        elapsed = time.perf_counter() - start
+        tracemalloc.stop()
+        report[name] = {'bytes_per_frame': allocated / frames, 'ms_per_frame': elapsed * 1000 / frames}
+    return report
+
+
+if __name__ == '__main__':
+    print("=" * 50)
+    print("⏱  Benchmark persiapan frame kamera (1280x720)")
+    print("=" * 50)
+    for name, r in benchmark().items():
+        print(f"   {name:<10} {r['bytes_per_frame'] / 1e6:6.2f} MB/frame | {r['ms_per_frame']:6.2f} ms/frame")
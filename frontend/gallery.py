@@ -0,0 +1,379 @@
+import json
+import struct
+import threading
+import time
+
+import numpy as np
+
+from ann_index import IVFIndex, DEFAULT_NPROBE
+
+# ==================== KONFIGURASI GALERI ====================
+EMBEDDING_DIM = 512  # Dimensi embedding ArcFace (InsightFace buffalo_l)
+MATCH_THRESHOLD = 0.7
+ANN_RETRAIN_GROWTH = 4  # Latih ulang indeks saat galeri tumbuh 4x sejak training terakhir
+
+MAX_TEMPLATES_PER_NRP = 5       # Jumlah template yang dikirim saat registrasi
+TEMPLATE_AGGREGATION = 'max'    # 'max' atau 'topk_mean'
+TEMPLATE_AGGREGATION_K = 2      # Jumlah skor template yang dirata-rata untuk 'topk_mean'
+
+
+def normalize_rows(matrix):
+    """Normalisasi L2 tiap baris, aman untuk vektor nol"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+def decode_packed_gallery(payload):
+    """Decode payload /api/v2/face-recognition/packed menjadi (header, matriks float32)
+
+    Format: uint32 panjang header | header JSON | matriks template (dtype di header).
+    Matriks dibaca langsung dengan np.frombuffer tanpa objek Python per elemen.
+    """
+    (header_len,) = struct.unpack_from('<I', payload, 0)
+    header = json.loads(payload[4:4 + header_len].decode('utf-8'))
+    dtype = np.dtype(header['dtype']).newbyteorder('<')
+    matrix = np.frombuffer(payload, dtype=dtype, offset=4 + header_len).reshape(-1, header['dim'])
+    return header, matrix.astype(np.float32)
+
+
+def select_templates(embeddings, max_templates=MAX_TEMPLATES_PER_NRP):
+    """Memilih template yang paling beragam dari embedding hasil rekam (farthest-point)
+
+    Template pertama adalah embedding yang paling dekat ke rata-rata, lalu
+    setiap langkah menambah embedding yang paling jauh dari template terpilih.
+    """
+    embeddings = normalize_rows(embeddings)
+    if embeddings.shape[0] <= max_templates:
+        return embeddings
+
+    mean = normalize_rows(embeddings.mean(axis=0))[0]
+    chosen = [int(np.argmax(embeddings @ mean))]
+    closest = embeddings @ embeddings[chosen[0]]
+    while len(chosen) < max_templates:
+        candidate = int(np.argmin(closest))
+        chosen.append(candidate)
+        closest = np.maximum(closest, embeddings @ embeddings[candidate])
+    return embeddings[chosen]
+
+
+# ==================== FACE GALLERY ====================
+class FaceGallery:
+    """Menyimpan embedding seluruh karyawan dalam satu matriks float32 yang sudah dinormalisasi.
+
+    Setiap karyawan boleh memiliki beberapa template; baris ke-i pada matriks
+    berpasangan dengan nrps[i] dan names[i]. Pencocokan cukup satu perkalian
+    matriks-vektor ke semua template, lalu skor diagregasi per NRP (max atau
+    rata-rata top-k). Jika `ann_min_size` diisi, galeri yang lebih besar dari
+    itu memakai indeks IVF sehingga hanya sebagian baris yang dihitung skornya.
+    """
+
+    def __init__(self, dim=EMBEDDING_DIM, capacity=1024, ann_min_size=None, nprobe=DEFAULT_NPROBE,
+                 aggregation=TEMPLATE_AGGREGATION, aggregation_k=TEMPLATE_AGGREGATION_K):
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._nrps = np.empty(capacity, dtype=object)
+        self._names = np.empty(capacity, dtype=object)
+        self._rows = {}  # nrp -> list index baris template
+        self._size = 0
+        self._max_templates = 1
+        self.ann_min_size = ann_min_size
+        self.nprobe = nprobe
+        self.aggregation = aggregation
+        self.aggregation_k = aggregation_k
+        self._ann = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, nrp):
+        return nrp in self._rows
+
+    # ---------- Akses data ----------
+    @property
+    def template_count(self):
+        return self._size
+
+    @property
+    def embeddings(self):
+        """View matriks template yang terisi (jumlah template x dim)"""
+        return self._matrix[:self._size]
+
+    @property
+    def nrps(self):
+        """NRP pemilik tiap baris template"""
+        return self._nrps[:self._size]
+
+    @property
+    def names(self):
+        return self._names[:self._size]
+
+    def get_name(self, nrp, default=None):
+        rows = self._rows.get(nrp)
+        if not rows:
+            return default
+        return self._names[rows[0]]
+
+    # ---------- Mutasi ----------
+    def _ensure_capacity(self, needed):
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        matrix = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        nrps = np.empty(new_capacity, dtype=object)
+        nrps[:self._size] = self._nrps[:self._size]
+        names = np.empty(new_capacity, dtype=object)
+        names[:self._size] = self._names[:self._size]
+        self._matrix, self._nrps, self._names = matrix, nrps, names
+
+    def build(self, nrps, names, encodings):
+        """Mengganti seluruh isi galeri sekaligus (dipakai saat full reload)
+
+        `encodings[i]` boleh berupa satu vektor atau matriks beberapa template.
+        """
+        templates = [np.atleast_2d(np.asarray(e, dtype=np.float32)) for e in encodings]
+        counts = [t.shape[0] for t in templates]
+        matrix = np.concatenate(templates) if templates else None
+        self.build_from_matrix(nrps, names, counts, matrix)
+
+    def build_from_matrix(self, nrps, names, counts, matrix, normalized=False):
+        """Seperti build, tetapi template sudah berupa satu matriks kontigu
+
+        Baris matriks berurutan per karyawan: `counts[i]` baris milik `nrps[i]`.
+        Jika `normalized` True, matriks (misalnya memmap dari cache disk) dipakai
+        langsung tanpa disalin; salinan baru dibuat saat galeri pertama kali diubah.
+        """
+        total = int(sum(counts))
+        if not total:
+            matrix = None
+        elif normalized:
+            matrix = matrix[:total]
+        else:
+            matrix = normalize_rows(matrix[:total])
+
+        with self._lock:
+            if total:
+                self.dim = matrix.shape[1]
+            capacity = max(total, 1)
+            self._matrix = matrix if total else np.zeros((capacity, self.dim), dtype=np.float32)
+            self._nrps = np.empty(capacity, dtype=object)
+            self._names = np.empty(capacity, dtype=object)
+            self._rows = {}
+            self._size = total
+            self._max_templates = max(counts, default=1)
+            self._ann = None
+
+            row = 0
+            for nrp, name, count in zip(nrps, names, counts):
+                self._nrps[row:row + count] = nrp
+                self._names[row:row + count] = name
+                self._rows.setdefault(nrp, []).extend(range(row, row + count))
+                row += count
+            self._maybe_train_ann()
+
+    def _make_writable(self):
+        """Copy-on-write untuk matriks read-only (memmap cache)"""
+        if not self._matrix.flags.writeable:
+            self._matrix = np.array(self._matrix, dtype=np.float32)
+
+    def export(self):
+        """Snapshot (nrps, names, counts, matrix) dengan template berurutan per karyawan"""
+        with self._lock:
+            nrps = list(self._rows.keys())
+            names = [self.get_name(nrp) for nrp in nrps]
+            counts = [len(self._rows[nrp]) for nrp in nrps]
+            order = [row for nrp in nrps for row in self._rows[nrp]]
+            matrix = self._matrix[np.asarray(order, dtype=np.int64)]
+            return nrps, names, counts, matrix
+
+    def _append_row(self, nrp, name, normed_encoding):
+        self._ensure_capacity(self._size + 1)
+        row = self._size
+        self._size += 1
+        self._matrix[row] = normed_encoding
+        self._nrps[row] = nrp
+        self._names[row] = name
+        self._rows.setdefault(nrp, []).append(row)
+        if self._ann is not None:
+            self._ann.add(row, self._matrix[row])
+        return row
+
+    def _remove_row(self, row):
+        """Menghapus satu baris template; baris terakhir dipindah ke posisi kosong"""
+        last = self._size - 1
+        if self._ann is not None:
+            self._ann.remove(row)
+        if row != last:
+            moved_nrp = self._nrps[last]
+            self._matrix[row] = self._matrix[last]
+            self._nrps[row] = moved_nrp
+            self._names[row] = self._names[last]
+            moved_rows = self._rows[moved_nrp]
+            moved_rows[moved_rows.index(last)] = row
+            if self._ann is not None:
+                self._ann.move(last, row)
+        self._nrps[last] = None
+        self._names[last] = None
+        self._size = last
+
+    def _remove_identity(self, nrp):
+        rows = self._rows.get(nrp)
+        if rows is None:
+            return False
+        # Hapus dari baris terbesar agar swap-remove tidak memindahkan baris milik NRP ini
+        for row in sorted(rows, reverse=True):
+            rows.remove(row)
+            self._remove_row(row)
+        del self._rows[nrp]
+        return True
+
+    def upsert(self, nrp, name, encodings):
+        """Menambah atau mengganti seluruh template satu karyawan"""
+        normed = normalize_rows(encodings)
+        with self._lock:
+            if self._size == 0 and normed.shape[1] != self.dim:
+                self.dim = normed.shape[1]
+                self._matrix = np.zeros((self._matrix.shape[0], self.dim), dtype=np.float32)
+            self._make_writable()
+            self._remove_identity(nrp)
+            for encoding in normed:
+                self._append_row(nrp, name, encoding)
+            self._max_templates = max(self._max_templates, normed.shape[0])
+            self._maybe_train_ann()
+            return self._rows[nrp]
+
+    def remove(self, nrp):
+        """Menghapus karyawan beserta semua templatenya dari galeri"""
+        with self._lock:
+            if nrp not in self._rows:
+                return False
+            self._make_writable()
+            return self._remove_identity(nrp)
+
+    def clear(self):
+        with self._lock:
+            self._rows = {}
+            self._size = 0
+            self._max_templates = 1
+            self._ann = None
+
+    # ---------- Indeks ANN ----------
+    def enable_ann(self, min_size=0, nprobe=None):
+        """Mengaktifkan indeks IVF untuk galeri dengan jumlah template >= min_size"""
+        with self._lock:
+            self.ann_min_size = min_size
+            if nprobe:
+                self.nprobe = nprobe
+            self._maybe_train_ann()
+
+    def disable_ann(self):
+        with self._lock:
+            self.ann_min_size = None
+            self._ann = None
+
+    def set_nprobe(self, nprobe):
+        self.nprobe = nprobe
+        if self._ann is not None:
+            self._ann.nprobe = nprobe
+
+    def _maybe_train_ann(self):
+        if self.ann_min_size is None or self._size == 0 or self._size < self.ann_min_size:
+            self._ann = None
+            return
+        if self._ann is not None and self._size < self._ann.trained_size * ANN_RETRAIN_GROWTH:
+            return
+        ann = IVFIndex(self.dim, nprobe=self.nprobe)
+        ann.train(self._matrix[:self._size])
+        ann.add_many(np.arange(self._size), self._matrix[:self._size])
+        self._ann = ann
+
+    # ---------- Pencocokan ----------
+    def scores(self, query):
+        """Cosine similarity query (1 x dim atau M x dim) terhadap seluruh template"""
+        query = normalize_rows(query)
+        with self._lock:
+            return query @ self._matrix[:self._size].T
+
+    def _aggregate(self, template_scores):
+        if self.aggregation == 'topk_mean' and template_scores.size > 1:
+            k = min(self.aggregation_k, template_scores.size)
+            return float(np.mean(np.partition(template_scores, -k)[-k:]))
+        return float(template_scores.max())
+
+    def match(self, query, threshold=MATCH_THRESHOLD, top_k=1):
+        """Mengembalikan list (nrp, name, score) terbaik di atas threshold, urut menurun"""
+        query = normalize_rows(query)[0]
+        with self._lock:
+            if self._size == 0:
+                return []
+
+            if self._ann is not None:
+                rows = self._ann.candidates(query)
+                if rows.size == 0:
+                    return []
+                scores = self._matrix[rows] @ query
+            else:
+                rows = None
+                scores = self._matrix[:self._size] @ query
+
+            # top_k * template terbanyak baris teratas pasti memuat top_k NRP berbeda
+            c = min(scores.size, top_k * self._max_templates)
+            if c == scores.size:
+                top = np.argsort(-scores)
+            else:
+                top = np.argpartition(-scores, c - 1)[:c]
+
+            results = {}
+            for i in top:
+                nrp = self._nrps[i if rows is None else rows[i]]
+                if nrp in results:
+                    continue
+                template_rows = self._rows[nrp]
+                if len(template_rows) == 1:
+                    results[nrp] = float(scores[i])
+                elif rows is None:
+                    results[nrp] = self._aggregate(scores[template_rows])
+                else:
+                    results[nrp] = self._aggregate(self._matrix[template_rows] @ query)
+
+            ranked = sorted(results.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            return [
+                (nrp, self.get_name(nrp), score)
+                for nrp, score in ranked if score > threshold
+            ]
+
+    # ---------- Benchmark ----------
+    @classmethod
+    def benchmark(cls, sizes=(1000, 10000, 100000), dim=EMBEDDING_DIM, queries=200, templates=1, seed=0):
+        """Mengukur jumlah pencocokan per detik untuk beberapa ukuran galeri"""
+        rng = np.random.default_rng(seed)
+        report = {}
+        for size in sizes:
+            gallery = cls(dim=dim)
+            encodings = rng.standard_normal((size, templates, dim), dtype=np.float32)
+            gallery.build([str(i) for i in range(size)], [f"Karyawan {i}" for i in range(size)], encodings)
+            probes = rng.standard_normal((queries, dim), dtype=np.float32)
+
+            gallery.match(probes[0])  # warm-up
+            start = time.perf_counter()
+            for probe in probes:
+                gallery.match(probe)
+            elapsed = time.perf_counter() - start
+            report[size] = queries / elapsed if elapsed > 0 else float('inf')
+        return report
+
+
+if __name__ == '__main__':
+    print("=" * 50)
+    print("⏱  Benchmark FaceGallery.match")
+    print("=" * 50)
+    for templates in (1, MAX_TEMPLATES_PER_NRP):
+        print(f"   -- {templates} template per NRP --")
+        for size, rate in FaceGallery.benchmark(templates=templates).items():
+            print(f"   {size:>7} identitas : {rate:>10.1f} match/detik")
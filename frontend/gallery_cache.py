@@ -0,0 +1,77 @@
+import json
+import os
+
+import numpy as np
+
+# ==================== KONFIGURASI CACHE GALERI ====================
+GALLERY_CACHE_FOLDER = "./gallery_cache"  # Terpisah dari ./cache yang dibersihkan berkala
+MATRIX_FILE = "embeddings.npy"
+INDEX_FILE = "index.json"
+CACHE_VERSION = 1
+
+
+def _replace_atomic(tmp_path, path):
+    # os.replace atomik di Windows maupun Linux, jadi file lama tetap utuh jika proses mati
+    os.replace(tmp_path, path)
+
+
+def save_gallery_cache(gallery, cursor, folder=GALLERY_CACHE_FOLDER):
+    """Menyimpan galeri ke disk: matriks .npy (float32, ternormalisasi) + index JSON
+
+    Matriks ditulis lebih dulu; index memuat jumlah baris sehingga pasangan
+    file yang tidak cocok (misalnya listrik mati di tengah penulisan) ditolak
+    saat load.
+    """
+    os.makedirs(folder, exist_ok=True)
+    nrps, names, counts, matrix = gallery.export()
+
+    matrix_path = os.path.join(folder, MATRIX_FILE)
+    tmp_matrix = matrix_path + ".tmp"
+    with open(tmp_matrix, "wb") as file:
+        np.save(file, np.ascontiguousarray(matrix, dtype=np.float32))
+    _replace_atomic(tmp_matrix, matrix_path)
+
+    index_path = os.path.join(folder, INDEX_FILE)
+    tmp_index = index_path + ".tmp"
+    with open(tmp_index, "w") as file:
+        json.dump({
+            'version': CACHE_VERSION,
+            'cursor': cursor,
+            'rows': int(matrix.shape[0]),
+            'dim': int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+            'nrps': nrps,
+            'names': names,
+            'counts': counts
+        }, file)
+    _replace_atomic(tmp_index, index_path)
+    return len(nrps)
+
+
+def load_gallery_cache(gallery, folder=GALLERY_CACHE_FOLDER):
+    """Memetakan cache disk ke galeri (memmap, tanpa membaca seluruh file)
+
+    Mengembalikan cursor sync yang tersimpan, atau None jika cache tidak ada/rusak.
+    """
+    matrix_path = os.path.join(folder, MATRIX_FILE)
+    index_path = os.path.join(folder, INDEX_FILE)
+    if not (os.path.isfile(matrix_path) and os.path.isfile(index_path)):
+        return None
+
+    try:
+        with open(index_path, "r") as file:
+            index = json.load(file)
+        if index.get('version') != CACHE_VERSION:
+            return None
+
+        matrix = np.load(matrix_path, mmap_mode='r')
+        if matrix.shape[0] != index['rows'] or sum(index['counts']) != index['rows']:
+            print("⚠ Cache galeri tidak konsisten, diabaikan")
+            return None
+        if index['rows'] == 0:
+            return None
+
+        gallery.build_from_matrix(index['nrps'], index['names'], index['counts'], matrix, normalized=True)
+        return index.get('cursor')
+    except Exception as e:
+        print(f"⚠ Gagal membaca cache galeri: {e}")
+        return None
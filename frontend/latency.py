@@ -0,0 +1,129 @@
+import collections
+import contextlib
+import csv
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# ==================== KONFIGURASI INSTRUMENTASI ====================
+# Aktifkan dengan environment variable KIOSK_LATENCY=1 (overlay: KIOSK_LATENCY_OVERLAY=1)
+LATENCY_ENABLED = os.environ.get("KIOSK_LATENCY", "0") == "1"
+LATENCY_OVERLAY = os.environ.get("KIOSK_LATENCY_OVERLAY", "0") == "1"
+LATENCY_WINDOW = 1000             # Jumlah sampel terakhir per stage
+LATENCY_DUMP_INTERVAL = 60        # Detik antar dump ke file
+LATENCY_DUMP_PATH = "./logs/latency.csv"  # .csv atau .json
+STAGES = ('capture', 'yolo', 'recognition', 'send_absensi', 'texture_upload')
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class RollingHistogram:
+    """Menyimpan N sampel latensi terakhir (ms) dan menghitung persentil saat diminta"""
+
+    def __init__(self, maxlen=LATENCY_WINDOW):
+        self._samples = collections.deque(maxlen=maxlen)
+        self.total = 0
+
+    def add(self, ms):
+        self._samples.append(ms)
+        self.total += 1
+
+    def summary(self):
+        if not self._samples:
+            return {'count': self.total, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+        samples = np.fromiter(self._samples, dtype=np.float64, count=len(self._samples))
+        p50, p95, p99 = np.percentile(samples, (50, 95, 99))
+        return {'count': self.total, 'p50': float(p50), 'p95': float(p95),
+                'p99': float(p99), 'max': float(samples.max())}
+
+
+class _Stage:
+    __slots__ = ('recorder', 'name', 'start')
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.record(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+# ==================== LATENCY RECORDER ====================
+class LatencyRecorder:
+    """Histogram latensi per stage frame loop kiosk
+
+    Pemakaian: `with latency.stage('yolo'): ...`. Saat nonaktif, stage()
+    mengembalikan context manager kosong bersama sehingga biayanya hanya
+    satu pemanggilan fungsi.
+    """
+
+    def __init__(self, enabled=LATENCY_ENABLED, window=LATENCY_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name, ms):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = RollingHistogram(self.window)
+            histogram.add(ms)
+
+    def snapshot(self):
+        with self._lock:
+            names = sorted(self._histograms, key=lambda n: STAGES.index(n) if n in STAGES else len(STAGES))
+            return {name: self._histograms[name].summary() for name in names}
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+    def overlay_text(self):
+        """Ringkasan satu baris per stage untuk overlay di layar kamera"""
+        lines = []
+        for name, s in self.snapshot().items():
+            if s['p50'] is not None:
+                lines.append(f"{name:<14} p50 {s['p50']:6.1f}  p95 {s['p95']:6.1f}  p99 {s['p99']:6.1f} ms")
+        return "\n".join(lines)
+
+    def dump(self, path=LATENCY_DUMP_PATH):
+        """Menambahkan snapshot ke file CSV (satu baris per stage) atau menulis ulang file JSON"""
+        if not self.enabled:
+            return
+        snapshot = self.snapshot()
+        if not snapshot:
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump({'timestamp': timestamp, 'stages': snapshot}, f, indent=2)
+            return
+
+        new_file = not os.path.exists(path)
+        with open(path, "a", newline="") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(['timestamp', 'stage', 'count', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'])
+            for name, s in snapshot.items():
+                writer.writerow([timestamp, name, s['count'], s['p50'], s['p95'], s['p99'], s['max']])
+
+
+latency = LatencyRecorder()
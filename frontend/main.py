@@ -4,7 +4,6 @@ from kivy.uix.image import Image
 from kivy.uix.boxlayout import BoxLayout
 from kivy.graphics import Color, Rectangle, Ellipse
 from kivy.clock import Clock
-from kivy.graphics.texture import Texture
 from kivymd.uix.datatables import MDDataTable
 from kivy.metrics import dp, sp
 from kivymd.uix.label import MDLabel
@@ -37,21 +36,36 @@ import os
 import json
 import cvzone
 import numpy as np
-from ultralytics import YOLO
 from insightface.app import FaceAnalysis
 import time
 import threading
+from gallery import FaceGallery, MATCH_THRESHOLD, MAX_TEMPLATES_PER_NRP, select_templates, decode_packed_gallery
+from gallery_cache import save_gallery_cache, load_gallery_cache
+from tracker import FaceTracker
+from face_pipeline import CropEmbedder, EMBED_COLOR_ORDER
+from camera_pipeline import CameraPipeline
+from yolo_runtime import load_yolo_model
+from motion_gate import MotionGate
+from frame_texture import FrameTexture, center_crop_rect
+from latency import latency, LATENCY_OVERLAY, LATENCY_DUMP_INTERVAL
+from outbox import AttendanceOutbox
+from api_client import ApiClient
+from attendance_stream import AttendanceStatusStream
 
 # ==================== KONFIGURASI API ====================
 API_BASE_URL = "http://localhost:5000"  # Untuk local
 
 API_ENDPOINTS = {
     'face_recognition': f"{API_BASE_URL}/api/v2/face-recognition",
+    'face_recognition_packed': f"{API_BASE_URL}/api/v2/face-recognition/packed",
     'register': f"{API_BASE_URL}/api/v2/face-recognition/register",
+    'identify': f"{API_BASE_URL}/api/v2/identify",
     'absen': f"{API_BASE_URL}/api/v2/absen",
+    'absen_batch': f"{API_BASE_URL}/api/v2/absen/batch",
     'karyawan': f"{API_BASE_URL}/api/v2/karyawan",
     'karyawan_delete': f"{API_BASE_URL}/api/v2/karyawan",
     'absensi_today': f"{API_BASE_URL}/api/v2/absensi/today",
+    'absensi_changes': f"{API_BASE_URL}/api/v2/absensi/changes",
     'all_karyawan': f"{API_BASE_URL}/api/v2/all-karyawan",
     'health': f"{API_BASE_URL}/health"
 }
@@ -63,22 +77,45 @@ os.makedirs(CAPTURE_FOLDER, exist_ok=True)
 CACHE_FOLDER = "./cache"
 os.makedirs(CACHE_FOLDER, exist_ok=True)
 
+# Galeri dengan jumlah wajah >= nilai ini memakai indeks IVF (None = selalu exact search)
+ANN_INDEX_MIN_SIZE = 20000
+ANN_NPROBE = 16
+
+# Mode pengenalan wajah: 'local' (galeri disinkron ke kiosk) atau 'server' (POST /api/v2/identify,
+# kiosk tidak mengunduh galeri; cache galeri lokal hanya dipakai saat backend tidak bisa dihubungi)
+RECOGNITION_MODE = "local"
+IDENTIFY_TIMEOUT = 3
+
+# Backend YOLO anti-spoof: 'pt' (Ultralytics/PyTorch), 'onnx' (FP32) atau 'onnx-int8' (opt-in)
+# File ONNX + parity check dibuat dengan: python yolo_runtime.py export int8
+# Model ONNX hanya dipakai jika lolos parity check terhadap .pt (lihat yolo_runtime.parity_passed)
+YOLO_BACKEND = "pt"
+
 Window.fullscreen = True
 Window.size = (1080, 1920)
 
 # ==================== LOAD MODEL ====================
-model = YOLO("model/l_versions_3_100.pt")
+model = load_yolo_model(YOLO_BACKEND)
 classNames = ["fake", "real"]
 
-app = FaceAnalysis(providers=['CPUExecutionProvider'])
+# Hanya detektor (untuk landmark pada crop) dan ArcFace; model atribut tidak dipakai
+app = FaceAnalysis(allowed_modules=['detection', 'recognition'], providers=['CPUExecutionProvider'])
 app.prepare(ctx_id=-1)
+face_embedder = CropEmbedder(app)
 
 # ==================== VARIABEL GLOBAL ====================
 confidence = 0.75
 last_seen = {}
-face_data = {}
+face_gallery = FaceGallery(ann_min_size=ANN_INDEX_MIN_SIZE, nprobe=ANN_NPROBE)
+face_sync_cursor = None  # Cursor delta sync dari /api/v2/face-recognition
+face_sync_lock = threading.Lock()
+# Satu HTTP client (keep-alive pool + thread pool) untuk semua pemanggilan API
+api_client = ApiClient()
+# Absensi disimpan ke SQLite lokal dulu lalu dikirim worker di background
+absensi_outbox = AttendanceOutbox(
+    API_ENDPOINTS['absen'], batch_url=API_ENDPOINTS['absen_batch'], session=api_client.session
+)
 loading_done = False
-recognized_faces = {}
 manual_lat = -6.866641
 manual_lon = 107.5347632
 
@@ -86,35 +123,69 @@ manual_lon = 107.5347632
 today_attendance_status = {}
 
 # ==================== FUNGSI API ====================
+def run_api(fn, *args, on_done=None):
+    """Menjalankan helper API di thread pool; on_done(hasil) dipanggil di UI thread Kivy"""
+    future = api_client.submit(fn, *args)
+    if on_done is not None:
+        future.add_done_callback(lambda f: Clock.schedule_once(lambda dt: on_done(f.result())))
+    return future
+
 def check_api_health():
     try:
-        response = requests.get(API_ENDPOINTS['health'], timeout=3)
+        response = api_client.get(API_ENDPOINTS['health'], timeout=3, retries=0)
         return response.status_code == 200
     except:
         return False
 
-def load_face_data_from_api():
-    global face_data, loading_done
-    face_data.clear()
+def load_face_data_from_api(full=False):
+    """Sinkronisasi galeri wajah; setelah load pertama hanya perubahan yang diambil"""
+    global loading_done
+    if RECOGNITION_MODE == "server":
+        loading_done = True
+        return
+    with face_sync_lock:
+        _sync_face_data(full)
+
+def _sync_face_data(full):
+    global face_gallery, face_sync_cursor, loading_done
+    
+    params = {}
+    if not full and face_sync_cursor:
+        params['since'] = face_sync_cursor
     
     try:
-        response = requests.get(API_ENDPOINTS['face_recognition'], timeout=10)
+        # Format biner: satu buffer embedding kontigu + index NRP
+        response = api_client.get(API_ENDPOINTS['face_recognition_packed'], params=params, timeout=10, retries=2)
         
         if response.status_code == 200:
-            data = response.json()
-            if data.get('status') == 200:
-                for entry in data.get('data', []):
-                    if 'nrp' in entry and 'face_encoding' in entry:
-                        try:
-                            encodings = json.loads(entry['face_encoding'])
-                            face_data[entry['nrp']] = {
-                                'encodings': np.array(encodings),
-                                'name': entry.get('name', entry['nrp'])
-                            }
-                        except Exception as e:
-                            print(f"⚠ Gagal parse face_encoding untuk {entry['nrp']}: {e}")
+            header, matrix = decode_packed_gallery(response.content)
+            index = header.get('index', [])
+            nrps = [entry['nrp'] for entry in index]
+            names = [entry.get('name', entry['nrp']) for entry in index]
+            counts = [entry['count'] for entry in index]
             
-            print(f"✅ {len(face_data)} data wajah dimuat dari API")
+            changed = bool(nrps) or bool(header.get('deleted'))
+            if header.get('full', True):
+                # Galeri diganti sekaligus agar pengenalan tidak kosong selama reload
+                face_gallery.build_from_matrix(nrps, names, counts, matrix)
+                changed = True
+                print(f"✅ {len(face_gallery)} data wajah dimuat dari API")
+            else:
+                deleted = header.get('deleted', [])
+                for nrp in deleted:
+                    face_gallery.remove(nrp)
+                row = 0
+                for nrp, name, count in zip(nrps, names, counts):
+                    face_gallery.upsert(nrp, name, matrix[row:row + count])
+                    row += count
+                print(f"🔄 Delta sync: {len(nrps)} berubah, {len(deleted)} dihapus, total {len(face_gallery)}")
+            
+            face_sync_cursor = header.get('cursor')
+            loading_done = True
+            
+            # Simpan ke cache disk agar boot berikutnya langsung bisa mengenali wajah
+            if changed:
+                save_gallery_cache(face_gallery, face_sync_cursor)
         else:
             print(f"⚠ Gagal mengambil data dari API: {response.status_code}")
             
@@ -122,46 +193,50 @@ def load_face_data_from_api():
         print("❌ Tidak dapat terhubung ke API server")
     except Exception as e:
         print(f"❌ Error load data: {e}")
-    
-    loading_done = True
 
-def send_absensi_to_api(nrp, image_path, latitude, longitude):
+def load_face_data_from_cache():
+    """Memetakan galeri dari cache disk (memmap) tanpa menunggu jaringan"""
+    global face_sync_cursor, loading_done
+    
+    with face_sync_lock:
+        # Sync dari API sudah lebih dulu selesai, cache pasti lebih lama
+        if face_sync_cursor is not None:
+            return
+        cursor = load_gallery_cache(face_gallery)
+        if cursor is not None:
+            face_sync_cursor = cursor
+            loading_done = True
+            print(f"💾 {len(face_gallery)} data wajah dimuat dari cache, sync sejak {cursor}")
+
+def identify_face_via_api(face_encoding):
+    """Identifikasi di server; list (nrp, name, score) atau None jika backend gagal dihubungi"""
     try:
-        with open(image_path, "rb") as img_file:
-            files = {"foto": (os.path.basename(image_path), img_file, "image/jpeg")}
-            data = {
-                "nrp": str(nrp),
-                "latitude": str(latitude),
-                "longitude": str(longitude)
-            }
-            
-            response = requests.post(
-                API_ENDPOINTS['absen'],
-                data=data,
-                files=files,
-                timeout=15
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"❌ API Error: {response.status_code} - {response.text}")
-                return None
-                
+        response = api_client.post(
+            API_ENDPOINTS['identify'],
+            json={'embeddings': np.asarray(face_encoding, dtype=np.float32).tolist(),
+                  'top_k': 1, 'threshold': MATCH_THRESHOLD},
+            timeout=IDENTIFY_TIMEOUT
+        )
+        if response.status_code != 200:
+            print(f"❌ API identify error: {response.status_code}")
+            return None
+        matches = response.json()['data'][0]['matches']
+        return [(m['nrp'], m['name'], m['score']) for m in matches]
     except Exception as e:
-        print(f"❌ Error send absensi: {e}")
+        print(f"❌ Error identify: {e}")
         return None
 
 def send_registration_to_api(nrp, encodings):
     try:
         data = [{
             "nrp": str(nrp),
-            "encodings": encodings
+            "encodings": encodings,
+            "color_order": EMBED_COLOR_ORDER
         }]
         
         headers = {"Content-Type": "application/json"}
         
-        response = requests.post(
+        response = api_client.post(
             API_ENDPOINTS['register'],
             json=data,
             headers=headers,
@@ -183,7 +258,7 @@ def delete_karyawan_from_api(nrp_list):
         data = {"nrp_list": nrp_list}
         headers = {"Content-Type": "application/json"}
         
-        response = requests.delete(
+        response = api_client.delete(
             API_ENDPOINTS['karyawan_delete'],
             json=data,
             headers=headers,
@@ -202,128 +277,153 @@ def delete_karyawan_from_api(nrp_list):
 def get_karyawan_from_api(nrp=None):
     try:
         if nrp:
-            url = f"{API_ENDPOINTS['karyawan']}/{nrp}"
-        else:
-            url = API_ENDPOINTS['all_karyawan']
-        
-        response = requests.get(url, timeout=10)
-        
-        if response.status_code == 200:
+            response = api_client.get(f"{API_ENDPOINTS['karyawan']}/{nrp}", timeout=10)
+            return response.json().get('data') if response.status_code == 200 else None
+        
+        # Semua karyawan: ikuti `next` sampai halaman terakhir (backend lama tanpa `next` = satu halaman)
+        karyawan_list = []
+        params = {}
+        while True:
+            response = api_client.get(API_ENDPOINTS['all_karyawan'], params=params, timeout=10)
+            if response.status_code != 200:
+                return []
             data = response.json()
-            return data.get('data', []) if not nrp else data.get('data')
-        else:
-            return [] if not nrp else None
+            karyawan_list.extend(data.get('data', []))
+            if not data.get('next'):
+                return karyawan_list
+            params = {'after': data['next']}
             
     except Exception as e:
         print(f"❌ Error get karyawan: {e}")
         return [] if not nrp else None
 
 def get_absensi_today_from_api():
-    """Mengambil data absensi hari ini dari API untuk cek status"""
+    """Peta status absensi hari ini: (status_map, tanggal, cursor) atau None jika gagal"""
     try:
-        response = requests.get(API_ENDPOINTS['absensi_today'], timeout=10)
+        response = api_client.get(API_ENDPOINTS['absensi_today'], params={'view': 'status'}, timeout=10)
         
         if response.status_code == 200:
-            data = response.json()
-            return data.get('data', [])
+            body = response.json()
+            data = body.get('data', {})
+            if isinstance(data, list):
+                # Backend lama tanpa view=status: ringkas list absensi menjadi Check In / Check Out
+                status_map = {}
+                for absensi in data:
+                    status = absensi.get('status') or ''
+                    if "Check Out" in status:
+                        status_map[absensi['nrp']] = "Check Out"
+                    elif "Check In" in status:
+                        status_map.setdefault(absensi['nrp'], "Check In")
+                return status_map, None, None
+            return data, body.get('tanggal'), body.get('cursor')
         else:
-            return []
+            return None
             
     except Exception as e:
         print(f"❌ Error get absensi: {e}")
-        return []
+        return None
 
 def load_today_attendance_status():
-    """Memuat status absensi hari ini dari API"""
+    """Memuat status absensi hari ini dari API; (tanggal, cursor) untuk stream atau None jika gagal"""
     global today_attendance_status
+    result = get_absensi_today_from_api()
+    if result is None:
+        return None
+    status_map, tanggal, cursor = result
     today_attendance_status.clear()
-    
-    absensi_list = get_absensi_today_from_api()
-    for absensi in absensi_list:
-        nrp = absensi.get('nrp')
-        status = absensi.get('status')
-        if nrp and status:
-            # Simpan status terakhir untuk NRP ini
-            today_attendance_status[nrp] = status
+    today_attendance_status.update(status_map)
     
     print(f"📊 Status absensi hari ini: {today_attendance_status}")
+    return tanggal, cursor
+
+def apply_attendance_change(nrp, status):
+    """Perubahan status dari stream backend (termasuk absensi di kiosk lain)"""
+    today_attendance_status[nrp] = status
+    print(f"📡 Status absensi {nrp}: {status}")
+
+# Status absensi hari ini diperbarui lewat long-poll, bukan unduh ulang setiap 30 detik
+attendance_stream = AttendanceStatusStream(
+    API_ENDPOINTS['absensi_changes'], api_client, load_today_attendance_status, apply_attendance_change
+)
 
 # ==================== FUNGSI LAINNYA ====================
 def is_internet_available():
     try:
-        requests.get("https://www.google.com", timeout=3)
+        api_client.get("https://www.google.com", timeout=3, retries=0)
         return True
     except:
         return False
 
-def cosine_similarity(a, b):
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+def recognize_face(img, main_content, track, epoch=None):
+    """Mengenali wajah milik `track` lalu menyimpan identitasnya di track tersebut
 
-def recognize_face(img, main_content):
-    global recognized_faces, face_data, last_seen, today_attendance_status
+    `epoch` adalah track.epoch saat frame diambil; jika track sudah di-reset
+    (orang lain di posisi yang sama) hasilnya tidak ditempel ke track.
+    """
+    global face_gallery
     
     img = cv2.flip(img, 1)
-    faces = app.get(img)
 
-    for face in faces:
-        bbox = face.bbox.astype(int)
-        x1, y1, x2, y2 = bbox
+    # Box YOLO dipakai langsung; tidak ada deteksi ulang satu frame penuh
+    face = face_embedder.embed(img, track.bbox)
+    if face is None:
+        return
 
-        frame_width = img.shape[1]
-        mirrored_x1 = frame_width - x1
-        face_encoding = np.array(face.normed_embedding)
+    face_encoding = np.array(face.normed_embedding)
 
-        matched_nrps = []
+    matches = None
+    if RECOGNITION_MODE == "server":
+        matches = identify_face_via_api(face_encoding)
+    if matches is None:
+        # Satu perkalian matriks-vektor terhadap seluruh galeri, ambil kandidat terbaik
+        matches = face_gallery.match(face_encoding, threshold=MATCH_THRESHOLD, top_k=1)
 
-        for nrp, face_info in face_data.items():
-            stored_encoding = face_info['encodings']
-            similarity = cosine_similarity(face_encoding, stored_encoding)
-            if similarity > 0.7:
-                matched_nrps.append(nrp)
+    if not matches:
+        track.set_identity(None, None, 0.0, epoch=epoch)
+        print(f"❓ Wajah tidak dikenal (track {track.id})")
+        return
 
-        if not matched_nrps:
-            recognized_faces["Unknown"] = (mirrored_x1, y1, time.time())
-            print(f"❓ Wajah tidak dikenal")
-        else:
-            for matched_nrp in matched_nrps:
-                current_time = time.time()
-                name = face_data.get(matched_nrp, {}).get('name', matched_nrp)
+    matched_nrp, name, score = matches[0]
+    track.set_identity(matched_nrp, name, score, epoch=epoch)
+    process_attendance(matched_nrp, name, img, main_content)
 
-                # Cek status absensi hari ini
-                current_status = today_attendance_status.get(matched_nrp)
-                
-                # Logika: Jika sudah check in, jangan check in lagi, tunggu check out
-                if current_status == "Check In":
-                    # Cek apakah sudah lewat 4 jam untuk check out
-                    # Ini akan ditangani di backend, kita hanya mencegah pengiriman berulang
-                    if matched_nrp not in last_seen or (current_time - last_seen.get(matched_nrp, 0) > 300):
-                        # Kirim untuk check out (backend yang akan menentukan)
-                        last_seen[matched_nrp] = current_time
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        image_filename = f"{matched_nrp}_{timestamp}.jpg"
-                        image_path_local = os.path.join(CAPTURE_FOLDER, image_filename)
-                        cv2.imwrite(image_path_local, img)
-
-                        print(f"📸 Mencoba check out - {name} ({matched_nrp})")
-                        main_content.send_absensi(matched_nrp, image_path_local)
-                
-                elif not current_status:
-                    # Belum absen hari ini, lakukan check in
-                    if matched_nrp not in last_seen or (current_time - last_seen.get(matched_nrp, 0) > 300):
-                        last_seen[matched_nrp] = current_time
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        image_filename = f"{matched_nrp}_{timestamp}.jpg"
-                        image_path_local = os.path.join(CAPTURE_FOLDER, image_filename)
-                        cv2.imwrite(image_path_local, img)
-
-                        print(f"📸 Check in - {name} ({matched_nrp})")
-                        main_content.send_absensi(matched_nrp, image_path_local)
-                
-                else:
-                    # Sudah check out atau status lain, jangan kirim lagi
-                    print(f"⏭️ {name} sudah {current_status}, tidak mengirim ulang")
+def process_attendance(matched_nrp, name, img, main_content):
+    """Mengirim absensi untuk NRP yang dikenali sesuai status absensi hari ini"""
+    global last_seen, today_attendance_status
+    
+    current_time = time.time()
 
-                recognized_faces[matched_nrp] = (mirrored_x1, y1, time.time())
+    # Cek status absensi hari ini
+    current_status = today_attendance_status.get(matched_nrp)
+    
+    # Logika: Jika sudah check in, jangan check in lagi, tunggu check out
+    if current_status == "Check In":
+        # Cek apakah sudah lewat 4 jam untuk check out
+        # Ini akan ditangani di backend, kita hanya mencegah pengiriman berulang
+        if matched_nrp not in last_seen or (current_time - last_seen.get(matched_nrp, 0) > 300):
+            # Kirim untuk check out (backend yang akan menentukan)
+            last_seen[matched_nrp] = current_time
+            print(f"📸 Mencoba check out - {name} ({matched_nrp})")
+            enqueue_absensi(matched_nrp, name, img, main_content)
+    
+    elif not current_status:
+        # Belum absen hari ini, lakukan check in
+        if matched_nrp not in last_seen or (current_time - last_seen.get(matched_nrp, 0) > 300):
+            last_seen[matched_nrp] = current_time
+            print(f"📸 Check in - {name} ({matched_nrp})")
+            enqueue_absensi(matched_nrp, name, img, main_content)
+    
+    else:
+        # Sudah check out atau status lain, jangan kirim lagi
+        print(f"⏭️ {name} sudah {current_status}, tidak mengirim ulang")
+
+def enqueue_absensi(nrp, name, img, main_content):
+    """Menyimpan event absensi (foto JPEG + waktu kejadian) ke outbox; tidak menunggu backend"""
+    success, jpeg = cv2.imencode(".jpg", img)
+    if not success:
+        print(f"❌ Gagal encode foto absensi {nrp}")
+        return
+    absensi_outbox.enqueue(nrp, name, jpeg.tobytes(), main_content.manual_lat, main_content.manual_lon)
 
 # ==================== FONT ====================
 font_dir = os.path.join(os.path.dirname(__file__), "assets", "font")
@@ -492,8 +592,9 @@ class Sidebar(BoxLayout):
         
         self.animate_button_click(instance)
         
-        karyawan_list = get_karyawan_from_api()
-        
+        run_api(get_karyawan_from_api, on_done=self.show_delete_dialog)
+
+    def show_delete_dialog(self, karyawan_list):
         if not karyawan_list:
             dialog = MDDialog(
                 title="Info",
@@ -618,12 +719,14 @@ class Sidebar(BoxLayout):
         if not selected_nrp:
             return
 
-        result = delete_karyawan_from_api(selected_nrp)
-        
-        thread = threading.Thread(target=load_face_data_from_api)
-        thread.start()
-
         self.dialog_hapus_nrp.dismiss()
+        run_api(
+            delete_karyawan_from_api, selected_nrp,
+            on_done=lambda result: self.on_karyawan_deleted(selected_nrp, result)
+        )
+
+    def on_karyawan_deleted(self, selected_nrp, result):
+        threading.Thread(target=load_face_data_from_api).start()
 
         if result:
             dialog = MDDialog(
@@ -687,16 +790,27 @@ class MainContent(BoxLayout):
         self.last_recognition_time = 0
         self.recognition_interval = 0.5
         self.recognition_thread_running = False
+        self.face_tracker = FaceTracker()
+        self.camera_pipeline = None
+        self.frame_texture = FrameTexture()
+        self.motion_gate = MotionGate()
+        self.last_detections = []
+        self.last_tracks = []
         
         self.manual_lat = manual_lat
         self.manual_lon = manual_lon
+
+        absensi_outbox.on_result = self.handle_absensi_result
+        absensi_outbox.on_retry = self.handle_absensi_queued
         
         Clock.schedule_interval(self.hapus_file_capture, 600)
         Clock.schedule_interval(self.hapus_file_cache, 300)
         Clock.schedule_interval(self.update_time, 1)
         Clock.schedule_interval(self.check_internet_connection, 10)
         Clock.schedule_interval(self.check_new_day, 60)
-        Clock.schedule_interval(self.refresh_attendance_status, 30)  # Refresh status setiap 30 detik
+        Clock.schedule_interval(self.log_pipeline_stats, 30)
+        if latency.enabled:
+            Clock.schedule_interval(lambda dt: threading.Thread(target=latency.dump).start(), LATENCY_DUMP_INTERVAL)
         
         try:
             locale.setlocale(locale.LC_TIME, "id_ID.UTF-8")
@@ -817,6 +931,24 @@ class MainContent(BoxLayout):
         self.instruction_container.add_widget(self.instruction_main)
         self.camera_layout.add_widget(self.instruction_container)
 
+        # Overlay latensi per stage (opsional, KIOSK_LATENCY=1 dan KIOSK_LATENCY_OVERLAY=1)
+        self.latency_label = None
+        if latency.enabled and LATENCY_OVERLAY:
+            self.latency_label = Label(
+                text="",
+                color=(1, 1, 0, 1),
+                font_name="RobotoMono-Regular",
+                font_size="13sp",
+                halign="left",
+                valign="top",
+                size_hint=(None, None),
+                size=(dp(520), dp(120)),
+                pos_hint={"x": 0.02, "top": 0.88}
+            )
+            self.latency_label.bind(size=self.latency_label.setter('text_size'))
+            self.camera_layout.add_widget(self.latency_label)
+            Clock.schedule_interval(self.update_latency_overlay, 1)
+
         root_layout.add_widget(self.camera_layout)
 
         self.active_notif_bar = None
@@ -901,9 +1033,6 @@ class MainContent(BoxLayout):
     def on_enter(self):
         thread = threading.Thread(target=load_face_data_from_api)
         thread.start()
-        
-        # Load status absensi hari ini
-        threading.Thread(target=load_today_attendance_status).start()
 
         self.cap = CameraSingleton.get_instance(screen_name="MainContent")
         if self.cap is None or not self.cap.isOpened():
@@ -912,118 +1041,141 @@ class MainContent(BoxLayout):
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
 
+        self.camera_pipeline = CameraPipeline(self.cap, self.process_frame)
+        self.camera_pipeline.start()
         Clock.schedule_interval(self.update_camera, 1.0 / 30.0)
 
     def on_leave(self):
         Clock.unschedule(self.update_camera)
+        if self.camera_pipeline is not None:
+            self.camera_pipeline.stop()
+            self.camera_pipeline = None
         CameraSingleton.release(screen_name="MainContent")
+        self.face_tracker.reset()
+        self.motion_gate.reset()
+        self.last_detections, self.last_tracks = [], []
 
-    def refresh_attendance_status(self, dt):
-        """Refresh status absensi setiap 30 detik"""
-        threading.Thread(target=load_today_attendance_status).start()
+    def log_pipeline_stats(self, dt):
+        """Menampilkan FPS per stage agar terlihat stage mana yang membatasi throughput"""
+        if self.camera_pipeline is None:
+            return
+        stats = self.camera_pipeline.stats()
+        print(f"📷 Pipeline kamera | capture {stats['capture_fps']:.1f} FPS"
+              f" | inference {stats['inference_fps']:.1f} FPS"
+              f" | render {stats['render_fps']:.1f} FPS"
+              f" | frame dibuang {stats['dropped_frames']}")
+
+        gate = self.motion_gate.stats()
+        wake = f"{gate['wake_latency_ms']:.0f} ms" if gate['wake_latency_ms'] is not None else "-"
+        print(f"💤 Motion gate | {'idle' if gate['idle'] else 'aktif'}"
+              f" | inference dilewati {gate['skip_ratio'] * 100:.0f}%"
+              f" | latensi bangun {wake}")
+
+    def update_latency_overlay(self, dt):
+        self.latency_label.text = latency.overlay_text()
 
     def update_camera(self, dt):
-        global recognized_faces, face_data
-        
-        if not hasattr(self, 'cap') or self.cap is None:
+        """Render: hanya blit frame teranotasi terbaru dari pipeline (UI thread)"""
+        if self.camera_pipeline is None:
             return
-            
-        success, img = self.cap.read()
-        if not success:
+
+        img = self.camera_pipeline.latest()
+        if img is None:
             return
-            
+
+        self.show_frame(img)
+
+    def show_frame(self, img):
+        """Upload frame BGR ke texture persisten dan menampilkan area crop tengah"""
+        with latency.stage('texture_upload'):
+            texture = self.frame_texture.update(img, center_crop_rect(img.shape))
+        if self.camera_display.texture is not texture:
+            self.camera_display.texture = texture
+        self.camera_display.canvas.ask_update()
+
+    def process_frame(self, img):
+        """Inference: YOLO, tracker dan anotasi; dijalankan di worker CameraPipeline"""
+        now = time.time()
+        # Scene diam dan tidak ada wajah di-track: YOLO dilewati, anotasi sebelumnya dipakai ulang
+        run_inference = self.motion_gate.should_infer(img, now, active=bool(self.face_tracker.tracks))
+
         img = cv2.flip(img, 1)
-        frame_width = img.shape[1]
         img_for_detection = cv2.flip(img, 1)
-        
-        results = model(img, stream=True, verbose=False)
 
-        for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                w, h = x2 - x1, y2 - y1
-                conf = float(box.conf[0])  
-                cls = int(box.cls[0])
+        if run_inference:
+            detections = []
+            with latency.stage('yolo'):
+                results = model(img, stream=True, verbose=False)
+
+                for r in results:
+                    boxes = r.boxes
+                    for box in boxes:
+                        x1, y1, x2, y2 = map(int, box.xyxy[0])
+                        conf = float(box.conf[0])  
+                        cls = int(box.cls[0])
+
+                        if conf > confidence:
+                            detections.append((x1, y1, x2, y2, classNames[cls]))
+
+            real_boxes = [d[:4] for d in detections if d[4] == 'real']
+            tracks = self.face_tracker.update(real_boxes, now)
+            self.motion_gate.inference_done()
+            self.last_detections, self.last_tracks = detections, tracks
+        else:
+            detections, tracks = self.last_detections, self.last_tracks
+
+        for x1, y1, x2, y2, cls_name in detections:
+            color = (0, 255, 0) if cls_name == 'real' else (0, 0, 255)
+            cvzone.cornerRect(img, (x1, y1, x2 - x1, y2 - y1), colorC=color, colorR=color)
+
+        # Embedding hanya dihitung untuk track baru atau yang skor identitasnya sudah meluruh
+        if run_inference and not self.recognition_thread_running and (now - self.last_recognition_time > self.recognition_interval):
+            track = next((t for t in tracks if t.needs_recognition(now)), None)
+            if track is not None:
+                self.recognition_thread_running = True
+                self.last_recognition_time = now
+                track.pending = True
+
+                def recognition_done(*a):
+                    self.recognition_thread_running = False
+
+                def thread_func(frame=img_for_detection.copy(), track=track, epoch=track.epoch):
+                    try:
+                        with latency.stage('recognition'):
+                            recognize_face(frame, self, track, epoch)
+                    finally:
+                        track.pending = False
+                        Clock.schedule_once(recognition_done)
+                threading.Thread(target=thread_func).start()
+
+        for track in tracks:
+            if track.recognized_at is None:
+                continue
+            if track.nrp is None:
+                label = "Tidak Dikenal"
+                color = (0, 0, 255)
+            else:
+                label = f"{track.name}"
+                color = (0, 255, 0)
+
+            x1, y1 = track.bbox[0], track.bbox[1]
+            cvzone.putTextRect(
+                img,
+                label,
+                (max(0, x1), max(100, y1)),
+                scale=1.5,
+                thickness=2,
+                colorR=color
+            )
 
-                if conf > confidence:
-                    color = (0, 255, 0) if classNames[cls] == 'real' else (0, 0, 255)
-                    cvzone.cornerRect(img, (x1, y1, w, h), colorC=color, colorR=color)
-
-                    if classNames[cls] == 'real':
-                        now = time.time()
-                        if not self.recognition_thread_running and (now - self.last_recognition_time > self.recognition_interval):
-                            self.recognition_thread_running = True
-                            self.last_recognition_time = now
-
-                            def recognition_done(*a):
-                                self.recognition_thread_running = False
-
-                            def thread_func():
-                                recognize_face(img_for_detection.copy(), self)
-                                Clock.schedule_once(recognition_done)
-                            threading.Thread(target=thread_func).start()
-
-                        current_time = time.time()
-                        recognized_faces = {nrp: (x, y, t) for nrp, (x, y, t) in recognized_faces.items() if current_time - t < 2}
-
-                        valid_faces = {}
-                        for nrp, (x1, y1, _) in recognized_faces.items():
-                            if nrp != "Unknown":
-                                valid_faces[nrp] = (x1, y1, _)
-
-                        if not valid_faces:
-                            valid_faces = recognized_faces
-
-                        for nrp, (x1, y1, _) in valid_faces.items():
-                            if nrp == "Unknown":
-                                label = "Tidak Dikenal"
-                                color = (0, 0, 255)
-                            else:
-                                name = face_data.get(nrp, {}).get('name', nrp)
-                                label = f"{name}"
-                                color = (0, 255, 0)
-
-                            mirrored_text_x = frame_width - x1
-                            cvzone.putTextRect(
-                                img,
-                                label,
-                                (max(0, mirrored_text_x), max(100, y1)),
-                                scale=1.5,
-                                thickness=2,
-                                colorR=color
-                            )
-
-        h, w, _ = img.shape
-        x_center, y_center = w // 2, h // 2
-        crop_w, crop_h = 960, 1280
-        x1 = max(0, x_center - crop_w // 2)
-        x2 = min(w, x_center + crop_w // 2)
-        y1 = max(0, y_center - crop_h // 2)
-        y2 = min(h, y_center + crop_h // 2)
-        img = img[y1:y2, x1:x2]
-
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = cv2.flip(img, 0)
-        texture = Texture.create(size=(img.shape[1], img.shape[0]), colorfmt='rgb')
-        texture.blit_buffer(img.tobytes(), colorfmt='rgb', bufferfmt='ubyte')
-
-        self.camera_display.texture = texture
-
-    def send_absensi(self, nrp, image_path_local):
-        """Mengirim data absensi ke API"""
-        global manual_lat, manual_lon, today_attendance_status
-        
-        print(f"📤 Mengirim absensi untuk NRP: {nrp}")
-        
-        # Kirim ke API
-        response = send_absensi_to_api(
-            nrp=nrp,
-            image_path=image_path_local,
-            latitude=self.manual_lat,
-            longitude=self.manual_lon
-        )
+        # Crop tampilan dan orientasi ditangani FrameTexture di UI thread
+        return img
+
+    def handle_absensi_result(self, event, response):
+        """Callback outbox setelah event absensi terkirim (dipanggil dari thread worker)"""
+        global today_attendance_status
         
+        nrp = event['nrp']
         print(f"📥 Response dari API: {response}")
         
         if response and response.get('status') == 200:
@@ -1069,6 +1221,12 @@ class MainContent(BoxLayout):
             error_msg = response.get('message', 'Unknown error') if response else 'Tidak ada response'
             print(f"❌ Absensi gagal: {nrp} - {error_msg}")
 
+    def handle_absensi_queued(self, event, error):
+        """Callback outbox saat backend tidak terjangkau: absensi tetap tersimpan lokal"""
+        waktu_display = datetime.strptime(event['waktu'], "%Y-%m-%d %H:%M:%S").strftime("%d/%m/%Y %H:%M:%S")
+        name = event['name'] or event['nrp']
+        Clock.schedule_once(lambda dt: self.show_absen_notif(name, "Tersimpan (Offline)", waktu_display))
+
     def show_absen_notif(self, name, status, waktu):
         if self.active_notif_bar and self.active_notif_bar.parent:
             self.root_layout.remove_widget(self.active_notif_bar)
@@ -1248,13 +1406,18 @@ class MainContent(BoxLayout):
         self.no_internet_dialog.open()
 
     def check_internet_connection(self, dt):
-        if not is_internet_available():
+        run_api(is_internet_available, on_done=self.on_internet_status)
+
+    def on_internet_status(self, available):
+        if not available:
             if not hasattr(self, 'no_internet_dialog') or not self.no_internet_dialog:
                 self.show_no_internet_dialog()
         else:
             if hasattr(self, 'no_internet_dialog') and self.no_internet_dialog:
                 self.no_internet_dialog.dismiss()
                 self.no_internet_dialog = None
+                # Koneksi kembali: kirim antrean absensi tanpa menunggu jadwal backoff
+                absensi_outbox.flush_now()
 
     def update_location(self, **kwargs):
         global manual_lat, manual_lon
@@ -1267,7 +1430,9 @@ class MainContent(BoxLayout):
         self.manual_lat = lat
         self.manual_lon = lon
 
-        address = self.get_address_from_lat_lon(lat, lon)
+        run_api(self.get_address_from_lat_lon, lat, lon, on_done=self.set_location_text)
+
+    def set_location_text(self, address):
         self.location_label.text = address
         self.location_label.texture_update()
 
@@ -1275,7 +1440,7 @@ class MainContent(BoxLayout):
         try:
             url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}&zoom=18&addressdetails=1"
             headers = {"User-Agent": "AttendanceHRIS/1.0"}
-            response = requests.get(url, headers=headers, timeout=5)
+            response = api_client.get(url, headers=headers, timeout=5)
             data = response.json()
 
             if "address" in data:
@@ -1443,7 +1608,7 @@ class MainContent(BoxLayout):
             self.marker = MapMarker(lat=new_lat, lon=new_lon)
             self.mapview.add_widget(self.marker)
 
-            self.location_label.text = self.get_address_from_lat_lon(new_lat, new_lon)
+            run_api(self.get_address_from_lat_lon, new_lat, new_lon, on_done=self.set_location_text)
             
             self.show_update_success_dialog()
 
@@ -1685,6 +1850,7 @@ class Registration(BoxLayout):
         self.screen_manager = screen_manager
         self.orientation = 'vertical'
         self.size_hint = (0.8, 1)
+        self.frame_texture = FrameTexture()
 
         with self.canvas.before:
             Color(1, 1, 1, 1)
@@ -1888,16 +2054,11 @@ class Registration(BoxLayout):
 
         frame = cv2.flip(frame, 1)
         
-        h, w, _ = frame.shape
-        x_center, y_center = w // 2, h // 2
-        crop_w, crop_h = 960, 1280
-        x1 = max(0, x_center - crop_w // 2)
-        x2 = min(w, x_center + crop_w // 2)
-        y1 = max(0, y_center - crop_h // 2)
-        y2 = min(h, y_center + crop_h // 2)
+        crop_rect = center_crop_rect(frame.shape)
+        x1, y1, x2, y2 = crop_rect
         frame_cropped = frame[y1:y2, x1:x2]
         
-        img_rgb = cv2.cvtColor(frame_cropped, cv2.COLOR_BGR2RGB)
+        frame_clean = frame_cropped.copy()
         results = model(frame_cropped, stream=False, verbose=False)
         face_detected = False
         current_time = time.time()
@@ -1915,25 +2076,10 @@ class Registration(BoxLayout):
                     face_detected = True
 
                     if self.is_registering_face:
-                        faces = app.get(img_rgb)
-                        best_face = None
-                        best_iou = 0
-                        for face in faces:
-                            fx1, fy1, fx2, fy2 = face.bbox.astype(int)
-                            xx1 = max(x1, fx1)
-                            yy1 = max(y1, fy1)
-                            xx2 = min(x2, fx2)
-                            yy2 = min(y2, fy2)
-                            inter_area = max(0, xx2 - xx1) * max(0, yy2 - yy1)
-                            box_area = (x2 - x1) * (y2 - y1)
-                            face_area = (fx2 - fx1) * (fy2 - fy1)
-                            union_area = box_area + face_area - inter_area
-                            iou = inter_area / union_area if union_area > 0 else 0
-                            if iou > best_iou:
-                                best_iou = iou
-                                best_face = face
+                        # Embedding dari box YOLO (BGR, sama seperti saat pengenalan)
+                        best_face = face_embedder.embed(frame_clean, (x1, y1, x2, y2))
                                 
-                        if best_face is not None and best_iou > 0.1:
+                        if best_face is not None:
                             face_embedding = best_face.normed_embedding.tolist()
                             if self.locked_face is None:
                                 self.locked_face = face_embedding
@@ -1963,10 +2109,12 @@ class Registration(BoxLayout):
         if face_detected:
             self.last_seen_time = current_time
 
-        buf = cv2.flip(frame_cropped, 0).tobytes()
-        texture = Texture.create(size=(frame_cropped.shape[1], frame_cropped.shape[0]), colorfmt='bgr')
-        texture.blit_buffer(buf, colorfmt='bgr', bufferfmt='ubyte')
-        self.camera_display.texture = texture
+        # frame_cropped adalah view dari frame, jadi anotasi ikut ter-upload
+        with latency.stage('texture_upload'):
+            texture = self.frame_texture.update(frame, crop_rect)
+        if self.camera_display.texture is not texture:
+            self.camera_display.texture = texture
+        self.camera_display.canvas.ask_update()
 
     def start_face_registration(self, *args):
         nrp = self.nrp_input.text.strip()
@@ -1979,8 +2127,11 @@ class Registration(BoxLayout):
             self.show_warning_dialog("NRP harus terdiri dari 10 digit!")
             return
 
-        karyawan = get_karyawan_from_api(nrp)
-        
+        self.register_button.disabled = True
+        run_api(get_karyawan_from_api, nrp, on_done=lambda karyawan: self.on_karyawan_checked(nrp, karyawan))
+
+    def on_karyawan_checked(self, nrp, karyawan):
+        self.register_button.disabled = False
         if not karyawan:
             self.show_warning_dialog(
                 f"NRP {nrp} tidak ditemukan dalam database.\nSilahkan tambahkan data karyawan terlebih dahulu."
@@ -2116,10 +2267,15 @@ class Registration(BoxLayout):
         if not nrp or not self.face_encodings_list:
             return
 
-        mean_encoding = np.mean(self.face_encodings_list, axis=0).tolist()
+        # Simpan beberapa template yang paling beragam, bukan satu rata-rata
+        templates = select_templates(self.face_encodings_list, MAX_TEMPLATES_PER_NRP).tolist()
 
-        response = send_registration_to_api(nrp, mean_encoding)
+        # Berhenti merekam selama upload agar frame berikutnya tidak memicu simpan ulang
+        self.is_registering_face = False
+        self.instruction_main.text = "Menyimpan data wajah..."
+        run_api(send_registration_to_api, nrp, templates, on_done=lambda response: self.on_face_data_saved(nrp, response))
 
+    def on_face_data_saved(self, nrp, response):
         if response and response.get('status') == 200:
             thread = threading.Thread(target=load_face_data_from_api)
             thread.start()
@@ -2127,6 +2283,8 @@ class Registration(BoxLayout):
             self.stop_face_registration(is_cancelled=False)
         else:
             error_msg = response.get('message', 'Gagal menyimpan data ke server') if response else 'Gagal menyimpan data ke server'
+            self.stop_face_registration(is_cancelled=True)
+            self.nrp_input.text = nrp
             self.show_result_dialog(
                 error_msg,
                 "assets/fail_icon.png",
@@ -2221,10 +2379,17 @@ class myapp(MDApp):
 
         sm.current = "main"
         
+        # Cache disk dipetakan dulu, lalu direkonsiliasi dengan backend di background
+        load_face_data_from_cache()
         threading.Thread(target=load_face_data_from_api).start()
-        threading.Thread(target=load_today_attendance_status).start()
+        attendance_stream.start()
+        absensi_outbox.start()
         
         return sm
 
+    def on_stop(self):
+        attendance_stream.stop()
+        absensi_outbox.stop()
+
 if __name__ == '__main__':
     myapp().run()
\ No newline at end of file
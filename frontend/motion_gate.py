@@ -0,0 +1,96 @@
+import time
+
+import cv2
+import numpy as np
+
+# ==================== KONFIGURASI MOTION GATE ====================
+GATE_WIDTH = 160              # Frame diperkecil ke lebar ini sebelum differencing
+PIXEL_DIFF_THRESHOLD = 25     # Selisih intensitas (0-255) agar piksel dianggap berubah
+CHANGE_RATIO_THRESHOLD = 0.01 # Fraksi piksel berubah agar frame dianggap ada gerakan
+BACKGROUND_ALPHA = 0.05       # Laju adaptasi background (perubahan cahaya perlahan)
+ACTIVE_HOLD = 3.0             # Detik inference tetap jalan setelah gerakan terakhir
+KEEPALIVE_INTERVAL = 5.0      # Detik; inference paksa sesekali walau tidak ada gerakan
+
+
+# ==================== MOTION GATE ====================
+class MotionGate:
+    """Detektor perubahan scene murah di depan YOLO
+
+    Frame diperkecil ke grayscale 160 px dan dibandingkan dengan background
+    running-average. Selama tidak ada gerakan (dan tidak ada wajah yang
+    sedang di-track) inference dilewati dan anotasi sebelumnya dipakai ulang.
+    """
+
+    def __init__(self, change_threshold=CHANGE_RATIO_THRESHOLD, hold=ACTIVE_HOLD,
+                 keepalive=KEEPALIVE_INTERVAL, enabled=True):
+        self.change_threshold = change_threshold
+        self.hold = hold
+        self.keepalive = keepalive
+        self.enabled = enabled
+        self._background = None
+        self._last_motion = 0.0
+        self._last_inference = 0.0
+        self._idle = False
+        self._wake_at = None
+        self.last_change = 0.0
+        self.frames = 0
+        self.skipped = 0
+        self.wake_latencies = []
+
+    def _change_ratio(self, frame):
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (GATE_WIDTH, max(1, h * GATE_WIDTH // w)), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0).astype(np.float32)
+        if self._background is None:
+            self._background = gray
+            return 1.0
+        diff = cv2.absdiff(gray, self._background)
+        cv2.accumulateWeighted(gray, self._background, BACKGROUND_ALPHA)
+        return float(np.count_nonzero(diff > PIXEL_DIFF_THRESHOLD)) / diff.size
+
+    def should_infer(self, frame, now=None, active=False):
+        """True jika YOLO perlu dijalankan untuk frame ini; `active` = masih ada track wajah"""
+        now = now or time.time()
+        self.frames += 1
+        if not self.enabled:
+            return True
+
+        self.last_change = self._change_ratio(frame)
+        if self.last_change >= self.change_threshold or active:
+            if self._idle:
+                self._idle = False
+                self._wake_at = now
+            self._last_motion = now
+
+        run = (now - self._last_motion <= self.hold) or (now - self._last_inference >= self.keepalive)
+        if not run:
+            self._idle = True
+            self.skipped += 1
+        return run
+
+    def inference_done(self, now=None):
+        """Dipanggil setelah YOLO selesai; mencatat latensi bangun dari idle"""
+        now = now or time.time()
+        self._last_inference = now
+        if self._wake_at is not None:
+            self.wake_latencies.append(now - self._wake_at)
+            self.wake_latencies = self.wake_latencies[-100:]
+            self._wake_at = None
+
+    def reset(self):
+        self._background = None
+        self._idle = False
+        self._wake_at = None
+
+    @property
+    def idle(self):
+        return self._idle
+
+    def stats(self):
+        latencies = self.wake_latencies
+        return {
+            'idle': self._idle,
+            'skip_ratio': self.skipped / self.frames if self.frames else 0.0,
+            'wake_latency_ms': float(np.median(latencies)) * 1000 if latencies else None,
+            'wake_latency_max_ms': max(latencies) * 1000 if latencies else None
+        }
@@ -0,0 +1,258 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+import requests
+
+from latency import latency
+
+# ==================== KONFIGURASI OUTBOX ====================
+OUTBOX_PATH = "./outbox/absensi.db"  # Terpisah dari ./captures yang dibersihkan berkala
+OUTBOX_BATCH_SIZE = 20
+BACKOFF_BASE = 2.0        # Detik; jeda retry ke-n = BACKOFF_BASE * 2^n (dengan jitter)
+BACKOFF_MAX = 300.0
+SEND_TIMEOUT = 15
+DEAD_RETENTION_DAYS = 30  # Baris gagal permanen disimpan untuk audit sebelum dihapus
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_id TEXT UNIQUE NOT NULL,
+    nrp TEXT NOT NULL,
+    name TEXT,
+    waktu TEXT NOT NULL,
+    latitude TEXT,
+    longitude TEXT,
+    foto BLOB NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt);
+"""
+
+
+class RetryableError(Exception):
+    """Backend tidak bisa dihubungi atau error sementara; event dicoba lagi nanti"""
+
+
+# ==================== ATTENDANCE OUTBOX ====================
+class AttendanceOutbox:
+    """Outbox SQLite (WAL) untuk absensi: simpan lokal dulu, kirim di background
+
+    `enqueue` hanya menulis satu baris ke SQLite lalu kembali, sehingga thread
+    recognition tidak pernah menunggu backend. Worker mengirim event yang
+    sudah jatuh tempo per batch; kegagalan sementara dijadwalkan ulang dengan
+    exponential backoff, sedangkan penolakan permanen (4xx) ditandai 'dead'.
+    Setiap event membawa event_id dan waktu kejadian sehingga pengiriman
+    ulang tidak menggandakan absensi di backend.
+    """
+
+    def __init__(self, url, batch_url=None, path=OUTBOX_PATH, batch_size=OUTBOX_BATCH_SIZE, on_result=None,
+                 session=None):
+        self.url = url
+        self.batch_url = batch_url  # /api/v2/absen/batch; None = kirim satu per satu
+        self.path = path
+        self.batch_size = batch_size
+        self.on_result = on_result  # on_result(event, response_json) dipanggil dari thread worker
+        self.on_retry = None        # on_retry(event, error) saat pengiriman pertama gagal
+        self.session = session or requests.Session()  # Bisa memakai session bersama ApiClient
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")  # Commit = sudah di disk
+        self._conn.executescript(SCHEMA)
+
+    # ---------- Producer ----------
+    def enqueue(self, nrp, name, foto, latitude, longitude, waktu=None):
+        """Menyimpan event absensi (foto = bytes JPEG); mengembalikan event_id"""
+        event_id = uuid.uuid4().hex
+        waktu = waktu or time.strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO outbox (event_id, nrp, name, waktu, latitude, longitude, foto, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (event_id, str(nrp), name, waktu, str(latitude), str(longitude), sqlite3.Binary(foto), time.time())
+            )
+        self._wake.set()
+        return event_id
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    # ---------- Worker ----------
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="absensi-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def flush_now(self):
+        """Memicu pengiriman segera (misalnya saat koneksi internet kembali)"""
+        with self._lock:
+            self._conn.execute("UPDATE outbox SET next_attempt = 0 WHERE status = 'pending'")
+        self._wake.set()
+
+    def _run(self):
+        self._purge_dead()
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                self._flush_due()
+            except Exception as e:
+                print(f"❌ Error outbox absensi: {e}")
+            self._wake.wait(self._seconds_until_next_due())
+
+    def _due_batch(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT * FROM outbox WHERE status = 'pending' AND next_attempt <= ? ORDER BY id LIMIT ?",
+                (time.time(), self.batch_size)
+            ).fetchall()
+
+    def _flush_due(self):
+        while not self._stop.is_set():
+            batch = self._due_batch()
+            if not batch:
+                return
+            if self.batch_url:
+                try:
+                    results = self._send_batch(batch)
+                except RetryableError as e:
+                    self._reschedule(batch, str(e))
+                    return
+                if results is not None:
+                    for event, result in zip(batch, results):
+                        self._complete(event, result)
+                    continue
+            for event in batch:
+                try:
+                    result = self._send(event)
+                except RetryableError as e:
+                    # Backend down: sisa batch ikut ditunda agar tidak membanjiri request gagal
+                    self._reschedule(batch[batch.index(event):], str(e))
+                    return
+                self._complete(event, result)
+
+    def _send(self, event):
+        data = {
+            'nrp': event['nrp'],
+            'latitude': event['latitude'],
+            'longitude': event['longitude'],
+            'waktu': event['waktu'],
+            'event_id': event['event_id']
+        }
+        files = {'foto': (f"{event['nrp']}_{event['event_id']}.jpg", bytes(event['foto']), 'image/jpeg')}
+        try:
+            with latency.stage('send_absensi'):
+                response = self.session.post(self.url, data=data, files=files, timeout=SEND_TIMEOUT)
+        except requests.RequestException as e:
+            raise RetryableError(e)
+        if response.status_code >= 500 or response.status_code == 429:
+            raise RetryableError(f"HTTP {response.status_code}")
+        try:
+            return response.json()
+        except ValueError:
+            return {'status': response.status_code, 'message': response.text}
+
+    def _send_batch(self, events):
+        """Mengirim banyak event dalam satu request; None jika backend belum punya endpoint batch"""
+        records = []
+        files = []
+        for i, event in enumerate(events):
+            part = f"foto_{i}"
+            records.append({
+                'event_id': event['event_id'],
+                'nrp': event['nrp'],
+                'latitude': event['latitude'],
+                'longitude': event['longitude'],
+                'waktu': event['waktu'],
+                'foto': part
+            })
+            files.append((part, (f"{event['nrp']}_{event['event_id']}.jpg", bytes(event['foto']), 'image/jpeg')))
+        try:
+            with latency.stage('send_absensi'):
+                response = self.session.post(
+                    self.batch_url, data={'records': json.dumps(records)}, files=files, timeout=SEND_TIMEOUT
+                )
+        except requests.RequestException as e:
+            raise RetryableError(e)
+        if response.status_code in (404, 405):
+            print("⚠️ Endpoint absensi batch tidak tersedia, kirim satu per satu")
+            self.batch_url = None
+            return None
+        if response.status_code >= 500 or response.status_code == 429:
+            raise RetryableError(f"HTTP {response.status_code}")
+        try:
+            body = response.json()
+        except ValueError:
+            raise RetryableError(f"Response batch tidak valid: HTTP {response.status_code}")
+        if body.get('status') != 200:
+            # Seluruh batch ditolak (misalnya payload tidak valid): tandai per event
+            return [body] * len(events)
+        return body['data']
+
+    def _complete(self, event, result):
+        with self._lock:
+            if result.get('status') == 200:
+                self._conn.execute("DELETE FROM outbox WHERE id = ?", (event['id'],))
+            else:
+                self._conn.execute(
+                    "UPDATE outbox SET status = 'dead', last_error = ? WHERE id = ?",
+                    (str(result.get('message')), event['id'])
+                )
+                print(f"❌ Absensi {event['nrp']} ditolak backend: {result.get('message')}")
+        if self.on_result:
+            self.on_result(dict(event), result)
+
+    def _reschedule(self, events, error):
+        now = time.time()
+        with self._lock:
+            for event in events:
+                attempts = event['attempts'] + 1
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+                self._conn.execute(
+                    "UPDATE outbox SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                    (attempts, now + delay, error, event['id'])
+                )
+        print(f"⚠️ Outbox absensi: {len(events)} event ditunda ({error})")
+        if self.on_retry:
+            for event in events:
+                if event['attempts'] == 0:
+                    self.on_retry(dict(event), error)
+
+    def _seconds_until_next_due(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt) FROM outbox WHERE status = 'pending'"
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def _purge_dead(self):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM outbox WHERE status = 'dead' AND created_at < ?",
+                (time.time() - DEAD_RETENTION_DAYS * 86400,)
+            )
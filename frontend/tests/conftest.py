@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modul kiosk diimpor dengan nama lokal (dijalankan dari folder frontend)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,69 @@
+from tracker import FaceTracker, Track
+
+START = 1_700_000_000.0  # Waktu epoch seperti time.time() di kiosk
+
+
+def recognitions_over(score, seconds, step=0.5):
+    """Jumlah panggilan embedding untuk satu track yang terus dikenali dengan `score`"""
+    track = Track(1, (0, 0, 100, 100), now=START)
+    now = START
+    while now <= START + seconds:
+        if track.needs_recognition(now):
+            track.set_identity('1001', 'Budi', score, now=now)
+        now += step
+    return track.recognitions
+
+
+def test_borderline_match_is_not_reembedded_every_few_seconds():
+    assert recognitions_over(0.75, 10) == 1
+    assert recognitions_over(0.75, 20) == 2
+
+
+def test_strong_match_keeps_identity_longer():
+    assert recognitions_over(0.95, 25) == 1
+
+
+def test_unknown_face_retried_quickly():
+    track = Track(1, (0, 0, 100, 100), now=START)
+    track.set_identity(None, None, 0.0, now=START)
+    assert not track.needs_recognition(START + 0.5)
+    assert track.needs_recognition(START + 1.5)
+
+
+def test_new_face_in_same_spot_after_miss_is_recognized_again():
+    tracker = FaceTracker()
+    box = (100, 100, 200, 220)
+    track, = tracker.update([box], now=START)
+    track.set_identity('1001', 'Budi', 0.95, now=START)
+    assert not track.needs_recognition(START + 0.5)
+
+    tracker.update([], now=START + 0.5)  # Orang pertama pergi
+    same, = tracker.update([(104, 98, 203, 221)], now=START + 1.0)  # Orang berikutnya di posisi yang sama
+
+    assert same is track
+    assert same.nrp is None
+    assert same.needs_recognition(START + 1.0)
+
+
+def test_box_jump_without_miss_drops_identity():
+    tracker = FaceTracker()
+    track, = tracker.update([(100, 100, 200, 200)], now=START)
+    track.set_identity('1001', 'Budi', 0.95, now=START)
+
+    steady, = tracker.update([(102, 101, 202, 201)], now=START + 0.5)
+    assert steady.nrp == '1001'
+
+    jumped, = tracker.update([(80, 80, 240, 240)], now=START + 1.0)  # Wajah jauh lebih besar, IoU tetap cukup
+    assert jumped is track
+    assert jumped.needs_recognition(START + 1.0)
+
+
+def test_stale_recognition_result_is_ignored_after_reset():
+    tracker = FaceTracker()
+    track, = tracker.update([(100, 100, 200, 200)], now=START)
+    epoch = track.epoch  # Frame orang pertama dikirim ke thread recognition
+    tracker.update([], now=START + 0.5)
+    tracker.update([(100, 100, 200, 200)], now=START + 1.0)
+
+    assert not track.set_identity('1001', 'Budi', 0.95, now=START + 1.2, epoch=epoch)
+    assert track.nrp is None
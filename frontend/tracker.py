@@ -0,0 +1,177 @@
+import itertools
+import time
+
+import numpy as np
+
+# ==================== KONFIGURASI TRACKER ====================
+IOU_THRESHOLD = 0.3          # IoU minimal agar box dianggap track yang sama
+CENTROID_MAX_SHIFT = 0.5     # Fallback: geser centroid maks. (relatif terhadap lebar box)
+# Identitas track dibuang (wajah dikenali ulang) jika box melompat sejauh/sebesar ini antar inference;
+# di antrean kiosk orang berikutnya sering berdiri di posisi yang hampir sama
+IDENTITY_MAX_SHIFT = 0.25    # Geser centroid relatif terhadap lebar box
+IDENTITY_MAX_AREA_RATIO = 1.5
+MAX_MISSES = 15              # Track dihapus setelah tidak terlihat sekian frame
+IDENTITY_HALF_LIFE = 30.0    # Detik; skor identitas yang di-cache meluruh setengahnya
+UNKNOWN_RETRY_INTERVAL = 1.0 # Detik sebelum wajah tidak dikenal dicoba lagi
+# Sengaja di bawah MATCH_THRESHOLD (0.7): batas itu untuk menerima kecocokan, bukan untuk
+# verifikasi ulang. Kecocokan tipis (0.75) baru dikenali ulang setelah ~17 detik, bukan ~3 detik
+REVERIFY_THRESHOLD = 0.5
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """IoU antar semua pasangan box (x1, y1, x2, y2)"""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    xx1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    yy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    xx2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    yy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+# ==================== TRACK ====================
+class Track:
+    """Satu wajah yang diikuti antar frame beserta identitas hasil pengenalan terakhir"""
+
+    def __init__(self, track_id, bbox, now):
+        self.id = track_id
+        self.bbox = tuple(int(v) for v in bbox)
+        self.hits = 1
+        self.misses = 0
+        self.last_seen = now
+        self.nrp = None
+        self.name = None
+        self.score = 0.0
+        self.recognized_at = None
+        self.recognitions = 0    # Jumlah panggilan embedding untuk track ini
+        self.pending = False     # Sedang dikenali di thread recognition
+        self.epoch = 0           # Naik setiap identitas dibuang; hasil recognition lama diabaikan
+
+    def set_identity(self, nrp, name, score, now=None, epoch=None):
+        """Menyimpan hasil pengenalan; False jika hasil untuk `epoch` lama (orang sebelumnya)"""
+        if epoch is not None and epoch != self.epoch:
+            return False
+        self.nrp = nrp
+        self.name = name
+        self.score = float(score)
+        self.recognized_at = now or time.time()
+        self.recognitions += 1
+        return True
+
+    def reset_identity(self):
+        """Box ini mungkin sudah wajah orang lain: kenali ulang sebelum nama ditampilkan lagi"""
+        self.nrp = None
+        self.name = None
+        self.score = 0.0
+        self.recognized_at = None
+        self.epoch += 1
+
+    def confidence(self, now):
+        """Skor identitas yang meluruh seiring waktu sejak pengenalan terakhir"""
+        if self.recognized_at is None:
+            return 0.0
+        return self.score * 0.5 ** ((now - self.recognized_at) / IDENTITY_HALF_LIFE)
+
+    def needs_recognition(self, now, threshold=REVERIFY_THRESHOLD):
+        if self.pending:
+            return False
+        if self.recognized_at is None:
+            return True
+        if self.nrp is None:
+            return now - self.recognized_at > UNKNOWN_RETRY_INTERVAL
+        return self.confidence(now) < threshold
+
+
+# ==================== FACE TRACKER ====================
+class FaceTracker:
+    """Tracker IoU/centroid sederhana untuk box YOLO agar embedding tidak dihitung ulang tiap interval"""
+
+    def __init__(self, iou_threshold=IOU_THRESHOLD, max_misses=MAX_MISSES):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, boxes, now=None):
+        """Mencocokkan box frame ini ke track yang ada; mengembalikan track yang terlihat"""
+        now = now or time.time()
+        boxes = [tuple(int(v) for v in box) for box in boxes]
+        matched_tracks, matched_boxes = set(), set()
+        visible = []
+
+        if self.tracks and boxes:
+            ious = iou_matrix([t.bbox for t in self.tracks], boxes)
+            # Greedy: pasangan dengan IoU tertinggi dipasangkan lebih dulu
+            for flat in np.argsort(-ious, axis=None):
+                ti, bi = np.unravel_index(flat, ious.shape)
+                if ious[ti, bi] < self.iou_threshold:
+                    break
+                if ti in matched_tracks or bi in matched_boxes:
+                    continue
+                matched_tracks.add(ti)
+                matched_boxes.add(bi)
+                visible.append(self._refresh(self.tracks[ti], boxes[bi], now))
+
+            # Fallback centroid untuk gerakan cepat yang membuat IoU kecil
+            for ti, track in enumerate(self.tracks):
+                if ti in matched_tracks:
+                    continue
+                best, best_dist = None, None
+                for bi, box in enumerate(boxes):
+                    if bi in matched_boxes:
+                        continue
+                    dist = self._centroid_shift(track.bbox, box)
+                    if dist <= CENTROID_MAX_SHIFT and (best_dist is None or dist < best_dist):
+                        best, best_dist = bi, dist
+                if best is not None:
+                    matched_tracks.add(ti)
+                    matched_boxes.add(best)
+                    visible.append(self._refresh(track, boxes[best], now))
+
+        survivors = []
+        for ti, track in enumerate(self.tracks):
+            if ti not in matched_tracks:
+                track.misses += 1
+            if track.misses <= self.max_misses:
+                survivors.append(track)
+
+        for bi, box in enumerate(boxes):
+            if bi not in matched_boxes:
+                track = Track(next(self._ids), box, now)
+                survivors.append(track)
+                visible.append(track)
+
+        self.tracks = survivors
+        return visible
+
+    def reset(self):
+        self.tracks = []
+
+    @classmethod
+    def _refresh(cls, track, box, now):
+        # Hilang di inference sebelumnya atau box melompat: bisa jadi orang berikutnya di antrean
+        if track.misses > 0 or cls._identity_jump(track.bbox, box):
+            track.reset_identity()
+        track.bbox = box
+        track.hits += 1
+        track.misses = 0
+        track.last_seen = now
+        return track
+
+    @classmethod
+    def _identity_jump(cls, a, b):
+        area_a = max(1, (a[2] - a[0]) * (a[3] - a[1]))
+        area_b = max(1, (b[2] - b[0]) * (b[3] - b[1]))
+        ratio = max(area_a, area_b) / min(area_a, area_b)
+        return ratio > IDENTITY_MAX_AREA_RATIO or cls._centroid_shift(a, b) > IDENTITY_MAX_SHIFT
+
+    @staticmethod
+    def _centroid_shift(a, b):
+        width = max(1, a[2] - a[0])
+        ax, ay = (a[0] + a[2]) / 2, (a[1] + a[3]) / 2
+        bx, by = (b[0] + b[2]) / 2, (b[1] + b[3]) / 2
+        return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5 / width
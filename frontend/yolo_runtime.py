@@ -0,0 +1,302 @@
+import glob
+import hashlib
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+try:
+    import onnxruntime as ort
+except ImportError:  # onnxruntime opsional; tanpa itu kiosk memakai model .pt
+    ort = None
+
+# ==================== KONFIGURASI MODEL YOLO ====================
+PT_MODEL_PATH = "model/l_versions_3_100.pt"
+ONNX_MODEL_PATH = "model/l_versions_3_100.onnx"
+ONNX_INT8_MODEL_PATH = "model/l_versions_3_100.int8.onnx"
+CALIBRATION_DIR = "../Test Yolo/Dataset/SplitData/val/images"
+DATA_YAML = "../Test Yolo/Dataset/SplitData/data.yaml"
+CLASS_NAMES = ["fake", "real"]
+IMG_SIZE = 640
+NMS_IOU = 0.45
+MIN_SCORE = 0.25              # Skor minimal sebelum NMS; filter confidence kiosk tetap di main.py
+ORT_INTRA_OP_THREADS = 0      # 0 = onnxruntime memilih sesuai jumlah core fisik
+PARITY_REPORT_PATH = "model/parity.json"  # Ditulis oleh `python yolo_runtime.py`
+MAX_MAP_DROP = 0.01           # Penurunan mAP50 / mAP50-95 maksimal vs .pt agar model ONNX boleh dipakai
+
+
+def letterbox(img, size=IMG_SIZE, color=(114, 114, 114)):
+    """Resize dengan rasio tetap + padding seperti Ultralytics; mengembalikan (img, scale, (pad_x, pad_y))"""
+    h, w = img.shape[:2]
+    scale = min(size / h, size / w)
+    nh, nw = int(round(h * scale)), int(round(w * scale))
+    pad_x, pad_y = (size - nw) / 2, (size - nh) / 2
+    if (nh, nw) != (h, w):
+        img = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return img, scale, (left, top)
+
+
+def preprocess(img, size=IMG_SIZE):
+    """Frame BGR -> tensor NCHW float32 RGB 0..1"""
+    padded, scale, pad = letterbox(img, size)
+    blob = cv2.dnn.blobFromImage(padded, 1 / 255.0, swapRB=True)
+    return blob, scale, pad
+
+
+# ==================== HASIL DETEKSI ====================
+class Box:
+    """Satu deteksi dengan atribut yang sama seperti ultralytics Boxes (xyxy[0], conf[0], cls[0])"""
+
+    __slots__ = ('xyxy', 'conf', 'cls')
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy.reshape(1, 4)
+        self.conf = np.array([conf], dtype=np.float32)
+        self.cls = np.array([cls], dtype=np.float32)
+
+
+class Result:
+    __slots__ = ('boxes',)
+
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+# ==================== ONNX DETECTOR ====================
+class OnnxDetector:
+    """Detektor anti-spoof YOLOv8 lewat onnxruntime CPU (FP32 atau INT8)
+
+    Pemanggilan `detector(img, stream=..., verbose=...)` mengembalikan list
+    Result sehingga bisa menggantikan objek YOLO di main.py tanpa mengubah
+    loop pembacaan box.
+    """
+
+    def __init__(self, path, img_size=IMG_SIZE, intra_op_threads=ORT_INTRA_OP_THREADS):
+        if ort is None:
+            raise ImportError("onnxruntime tidak terinstal")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        options.enable_mem_pattern = True
+        options.enable_cpu_mem_arena = True
+        # Thread onnxruntime tidak spin-wait agar UI Kivy dan InsightFace tetap kebagian CPU
+        options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+
+        self.path = path
+        self.img_size = img_size
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, img, stream=False, verbose=False, conf=MIN_SCORE, iou=NMS_IOU):
+        blob, scale, (pad_x, pad_y) = preprocess(img, self.img_size)
+        output = self.session.run(None, {self.input_name: blob})[0]
+        return [Result(self._postprocess(output[0], scale, pad_x, pad_y, img.shape[:2], conf, iou))]
+
+    @staticmethod
+    def _postprocess(pred, scale, pad_x, pad_y, shape, conf, iou):
+        # Output YOLOv8: (4 + nc, anchors) -> (anchors, 4 + nc)
+        pred = pred.T
+        scores = pred[:, 4:]
+        cls_ids = scores.argmax(axis=1)
+        cls_scores = scores[np.arange(len(scores)), cls_ids]
+        keep = cls_scores > conf
+        if not keep.any():
+            return []
+        xywh, cls_ids, cls_scores = pred[keep, :4], cls_ids[keep], cls_scores[keep]
+
+        xyxy = np.empty_like(xywh)
+        xyxy[:, 0] = (xywh[:, 0] - xywh[:, 2] / 2 - pad_x) / scale
+        xyxy[:, 1] = (xywh[:, 1] - xywh[:, 3] / 2 - pad_y) / scale
+        xyxy[:, 2] = (xywh[:, 0] + xywh[:, 2] / 2 - pad_x) / scale
+        xyxy[:, 3] = (xywh[:, 1] + xywh[:, 3] / 2 - pad_y) / scale
+        h, w = shape
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, w)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, h)
+
+        # NMS per kelas (offset koordinat per kelas seperti Ultralytics)
+        offset = cls_ids[:, None] * max(h, w)
+        nms_boxes = np.concatenate([xyxy[:, :2] + offset, xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+        indices = cv2.dnn.NMSBoxes(nms_boxes.tolist(), cls_scores.tolist(), conf, iou)
+        return [Box(xyxy[i], cls_scores[i], cls_ids[i]) for i in np.array(indices).reshape(-1)]
+
+
+def load_yolo_model(backend="pt"):
+    """Memuat detektor sesuai backend ('pt', 'onnx', 'onnx-int8')
+
+    Model ONNX hanya dipakai jika file-nya sama persis dengan yang lolos
+    parity check terakhir (PARITY_REPORT_PATH); selain itu fallback ke .pt.
+    """
+    path = {'onnx': ONNX_MODEL_PATH, 'onnx-int8': ONNX_INT8_MODEL_PATH}.get(backend)
+    if path is not None:
+        if ort is None or not os.path.exists(path):
+            print(f"⚠️ Model {path} atau onnxruntime tidak tersedia, memakai {PT_MODEL_PATH}")
+        elif not parity_passed(backend, path):
+            print(f"⚠️ Model {path} belum lolos parity check ({PARITY_REPORT_PATH}), memakai {PT_MODEL_PATH}")
+        else:
+            print(f"✅ Model YOLO dimuat via onnxruntime: {path}")
+            return OnnxDetector(path)
+
+    from ultralytics import YOLO
+    return YOLO(PT_MODEL_PATH)
+
+
+# ==================== EXPORT ====================
+class _CalibrationReader:
+    """CalibrationDataReader onnxruntime dari gambar split val dataset anti-spoof"""
+
+    def __init__(self, image_dir, input_name, img_size=IMG_SIZE, limit=None):
+        paths = sorted(glob.glob(os.path.join(image_dir, "*.jpg")) + glob.glob(os.path.join(image_dir, "*.png")))
+        if not paths:
+            raise FileNotFoundError(f"Tidak ada gambar kalibrasi di {image_dir}")
+        self.paths = iter(paths[:limit])
+        self.input_name = input_name
+        self.img_size = img_size
+
+    def get_next(self):
+        for path in self.paths:
+            img = cv2.imread(path)
+            if img is not None:
+                return {self.input_name: preprocess(img, self.img_size)[0]}
+        return None
+
+
+def export_onnx(pt_path=PT_MODEL_PATH, onnx_path=ONNX_MODEL_PATH, img_size=IMG_SIZE):
+    """Export .pt ke ONNX (FP32, opset 12, input statis 640) lewat Ultralytics"""
+    from ultralytics import YOLO
+    exported = YOLO(pt_path).export(format='onnx', imgsz=img_size, opset=12, simplify=True, dynamic=False)
+    if os.path.abspath(exported) != os.path.abspath(onnx_path):
+        os.replace(exported, onnx_path)
+    print(f"✅ Export ONNX: {onnx_path}")
+    return onnx_path
+
+
+def quantize_int8(onnx_path=ONNX_MODEL_PATH, int8_path=ONNX_INT8_MODEL_PATH,
+                  calibration_dir=CALIBRATION_DIR, limit=None):
+    """Kuantisasi statis INT8 (QDQ, per-channel) dengan kalibrasi dari split val"""
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    prepared = onnx_path.replace(".onnx", ".prep.onnx")
+    quant_pre_process(onnx_path, prepared)
+    input_name = ort.InferenceSession(prepared, providers=['CPUExecutionProvider']).get_inputs()[0].name
+    try:
+        quantize_static(
+            prepared,
+            int8_path,
+            _CalibrationReader(calibration_dir, input_name, limit=limit),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=CalibrationMethod.MinMax
+        )
+    finally:
+        os.remove(prepared)
+    print(f"✅ Kuantisasi INT8: {int8_path}")
+    return int8_path
+
+
+# ==================== PARITY & BENCHMARK ====================
+def evaluate_map(path, data_yaml=DATA_YAML, img_size=IMG_SIZE):
+    """mAP50 / mAP50-95 pada split val lewat validator Ultralytics (mendukung .pt dan .onnx)"""
+    from ultralytics import YOLO
+    metrics = YOLO(path, task='detect').val(data=data_yaml, split='val', imgsz=img_size,
+                                            batch=1, device='cpu', plots=False, verbose=False)
+    return {'map50': float(metrics.box.map50), 'map50_95': float(metrics.box.map)}
+
+
+def benchmark_latency(detector, frames, warmup=3):
+    """Latensi per frame (ms) p50/p95 untuk detektor apa pun yang dipanggil seperti model YOLO"""
+    for frame in frames[:warmup]:
+        list(detector(frame, stream=True, verbose=False))
+    times = []
+    for frame in frames:
+        start = time.perf_counter()
+        list(detector(frame, stream=True, verbose=False))
+        times.append((time.perf_counter() - start) * 1000)
+    return {'p50_ms': float(np.percentile(times, 50)), 'p95_ms': float(np.percentile(times, 95))}
+
+
+def parity_report(calibration_dir=CALIBRATION_DIR, frame_size=(1280, 720), limit=50):
+    """Membandingkan .pt vs ONNX FP32 vs ONNX INT8: mAP pada val dan latensi per frame kiosk"""
+    from ultralytics import YOLO
+
+    paths = sorted(glob.glob(os.path.join(calibration_dir, "*.jpg")))[:limit]
+    frames = [cv2.resize(cv2.imread(p), frame_size) for p in paths]
+    candidates = [('pt', PT_MODEL_PATH, lambda: YOLO(PT_MODEL_PATH))]
+    for name, path in (('onnx', ONNX_MODEL_PATH), ('onnx-int8', ONNX_INT8_MODEL_PATH)):
+        if os.path.exists(path):
+            candidates.append((name, path, lambda p=path: OnnxDetector(p)))
+
+    report = {}
+    for name, path, factory in candidates:
+        report[name] = {**evaluate_map(path), **benchmark_latency(factory(), frames), 'sha256': file_sha256(path)}
+    return report
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parity_failures(report, max_drop=MAX_MAP_DROP):
+    """backend -> alasan gagal untuk setiap model ONNX yang mAP-nya turun lebih dari `max_drop` dari .pt"""
+    base = report['pt']
+    failures = {}
+    for name, r in report.items():
+        if name == 'pt':
+            continue
+        drops = {metric: base[metric] - r[metric] for metric in ('map50', 'map50_95')}
+        bad = [f"{metric} turun {drop:.3f}" for metric, drop in drops.items() if drop > max_drop]
+        if bad:
+            failures[name] = ', '.join(bad)
+    return failures
+
+
+def parity_passed(backend, path, report_path=PARITY_REPORT_PATH):
+    try:
+        with open(report_path, 'r') as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return False
+    entry = report.get(backend)
+    return (
+        entry is not None and 'pt' in report
+        and entry.get('sha256') == file_sha256(path)
+        and backend not in parity_failures(report)
+    )
+
+
+if __name__ == '__main__':
+    import sys
+
+    if 'export' in sys.argv:
+        export_onnx()
+        if 'int8' in sys.argv:
+            quantize_int8()
+
+    print("=" * 50)
+    print("⏱  Parity & latensi YOLO anti-spoof (val split)")
+    print("=" * 50)
+    report = parity_report()
+    for name, r in report.items():
+        print(f"   {name:<10} mAP50 {r['map50']:.3f} | mAP50-95 {r['map50_95']:.3f}"
+              f" | p50 {r['p50_ms']:6.1f} ms | p95 {r['p95_ms']:6.1f} ms")
+
+    with open(PARITY_REPORT_PATH, 'w') as f:
+        json.dump(report, f, indent=2)
+    failures = parity_failures(report)
+    for name, reason in failures.items():
+        print(f"❌ {name} tidak lolos parity (maks turun {MAX_MAP_DROP}): {reason}")
+    print(f"📝 Laporan parity: {PARITY_REPORT_PATH}")
+    sys.exit(1 if failures else 0)
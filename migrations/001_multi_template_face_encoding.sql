@@ -0,0 +1,11 @@
+-- Multi-template: face_encoding sekarang menyimpan JSON list beberapa embedding
+-- per karyawan (bukan satu vektor rata-rata), sehingga TEXT (64 KB) tidak cukup.
+USE hrd_absensi;
+
+ALTER TABLE karyawan MODIFY face_encoding MEDIUMTEXT;
+
+-- Bungkus data lama (satu vektor) menjadi list berisi satu template
+UPDATE karyawan
+SET face_encoding = CONCAT('[', face_encoding, ']')
+WHERE face_encoding IS NOT NULL
+  AND face_encoding NOT LIKE '[[%';
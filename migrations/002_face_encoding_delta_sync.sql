@@ -0,0 +1,11 @@
+-- Delta sync face encoding: kiosk mengirim ?since=<cursor> ke /api/v2/face-recognition
+-- dan hanya menerima NRP yang berubah (updated_at) atau dihapus (tombstone).
+USE hrd_absensi;
+
+ALTER TABLE karyawan ADD INDEX idx_updated_at (updated_at);
+
+CREATE TABLE IF NOT EXISTS karyawan_deleted (
+    nrp VARCHAR(20) PRIMARY KEY,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_deleted_at (deleted_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
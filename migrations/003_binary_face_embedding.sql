@@ -0,0 +1,6 @@
+-- Embedding biner: template disimpan sebagai float16 di kolom BLOB, bukan JSON TEXT.
+-- Setelah kolom dibuat, jalankan `python migrate_face_embedding.py` dari folder backend
+-- untuk mengonversi face_encoding (JSON) yang sudah ada ke face_embedding.
+USE hrd_absensi;
+
+ALTER TABLE karyawan ADD COLUMN face_embedding MEDIUMBLOB AFTER face_encoding;
@@ -0,0 +1,7 @@
+-- Idempotency key absensi dari outbox kiosk: event yang dikirim ulang setelah
+-- timeout/offline tidak boleh tercatat dua kali. NULL untuk absensi lama.
+USE hrd_absensi;
+
+ALTER TABLE absensi
+    ADD COLUMN event_id VARCHAR(36) NULL AFTER foto_path,
+    ADD UNIQUE INDEX uq_event_id (event_id);
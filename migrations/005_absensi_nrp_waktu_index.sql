@@ -0,0 +1,10 @@
+-- Index komposit untuk query absensi per karyawan per hari:
+--   WHERE nrp = ? AND waktu >= ? AND waktu <= ? ORDER BY waktu DESC LIMIT 1
+-- Query backend sudah memakai rentang waktu (bukan DATE(waktu) = ?) sehingga
+-- index ini dan idx_waktu bisa dipakai. Pada tabel besar ALTER berjalan online
+-- (ALGORITHM=INPLACE, LOCK=NONE) tanpa memblokir insert absensi.
+USE hrd_absensi;
+
+ALTER TABLE absensi
+    ADD INDEX idx_nrp_waktu (nrp, waktu),
+    ALGORITHM=INPLACE, LOCK=NONE;
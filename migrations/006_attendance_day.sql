@@ -0,0 +1,35 @@
+-- Status absensi per karyawan per hari. Backend memperbarui baris ini dalam
+-- transaksi yang sama dengan INSERT absensi, sehingga penentuan Check In /
+-- Check Out / "Sudah ..." cukup satu lookup primary key dan kiosk bisa
+-- mengambil peta status hari ini (GET /api/v2/absensi/today?view=status).
+USE hrd_absensi;
+
+CREATE TABLE IF NOT EXISTS attendance_day (
+    nrp VARCHAR(20) NOT NULL,
+    tanggal DATE NOT NULL,
+    check_in_at DATETIME NULL,   -- Check In pertama hari itu
+    check_out_at DATETIME NULL,  -- Check Out pertama hari itu
+    last_status VARCHAR(50),     -- Status absensi terakhir (termasuk "Sudah ...")
+    last_at DATETIME NOT NULL,   -- Waktu absensi terakhir, dasar aturan 4 jam check out
+    PRIMARY KEY (nrp, tanggal),
+    INDEX idx_tanggal (tanggal),
+    FOREIGN KEY (nrp) REFERENCES karyawan(nrp) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Isi dari riwayat absensi yang sudah ada
+INSERT INTO attendance_day (nrp, tanggal, check_in_at, check_out_at, last_status, last_at)
+SELECT nrp,
+       DATE(waktu),
+       MIN(CASE WHEN status = 'Check In' THEN waktu END),
+       MIN(CASE WHEN status = 'Check Out' THEN waktu END),
+       NULL,
+       MAX(waktu)
+FROM absensi
+WHERE waktu IS NOT NULL
+GROUP BY nrp, DATE(waktu)
+ON DUPLICATE KEY UPDATE last_at = last_at;
+
+UPDATE attendance_day d
+JOIN absensi a ON a.nrp = d.nrp AND a.waktu = d.last_at
+SET d.last_status = a.status
+WHERE d.last_status IS NULL;
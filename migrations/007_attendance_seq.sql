@@ -0,0 +1,16 @@
+-- Sequence perubahan status absensi untuk long-poll kiosk (/api/v2/absensi/changes).
+-- Setiap transaksi absensi menaikkan attendance_seq.seq tepat sebelum commit
+-- dan menyimpannya di attendance_day.seq; kunci baris ini membuat urutan
+-- sequence sama dengan urutan commit.
+USE hrd_absensi;
+
+CREATE TABLE IF NOT EXISTS attendance_seq (
+    id TINYINT PRIMARY KEY,
+    seq BIGINT NOT NULL
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO attendance_seq (id, seq) VALUES (1, 0);
+
+ALTER TABLE attendance_day
+    ADD COLUMN seq BIGINT NOT NULL DEFAULT 0,
+    ADD INDEX idx_seq (seq);
@@ -0,0 +1,25 @@
+-- Cursor delta sync galeri wajah berbasis sequence, menggantikan updated_at >= NOW() lama.
+-- Transaksi yang mengubah karyawan (register wajah, ganti nama, hapus) menaikkan
+-- gallery_seq.seq sebelum commit dan menyimpannya di karyawan.gallery_seq /
+-- karyawan_deleted.seq; kunci baris counter membuat urutan sequence sama dengan
+-- urutan commit, jadi perubahan yang commit belakangan tidak pernah terlewat.
+-- purged_seq: sequence tombstone terbesar yang sudah dibersihkan; cursor di
+-- bawahnya menerima full snapshot.
+-- Kiosk dengan cursor lama (format tanggal) otomatis menerima full snapshot sekali.
+USE hrd_absensi;
+
+CREATE TABLE IF NOT EXISTS gallery_seq (
+    id TINYINT PRIMARY KEY,
+    seq BIGINT NOT NULL,
+    purged_seq BIGINT NOT NULL DEFAULT 0
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO gallery_seq (id, seq) VALUES (1, 0);
+
+ALTER TABLE karyawan
+    ADD COLUMN gallery_seq BIGINT NOT NULL DEFAULT 0,
+    ADD INDEX idx_gallery_seq (gallery_seq);
+
+ALTER TABLE karyawan_deleted
+    ADD COLUMN seq BIGINT NOT NULL DEFAULT 0,
+    ADD INDEX idx_seq (seq);
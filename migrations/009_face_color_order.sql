@@ -0,0 +1,12 @@
+-- Urutan warna frame saat face_embedding dibuat.
+-- Registrasi kiosk lama meng-embed salinan RGB, sedangkan pengenalan meng-embed
+-- frame BGR dari kamera; template lama tetap cocok tetapi dengan skor lebih rendah.
+-- Kiosk sekarang meng-embed BGR dan mengirim color_order='BGR' saat registrasi.
+-- Semua template yang sudah ada ditandai RGB dan tampil sebagai
+-- 'Perlu Daftar Ulang' di daftar karyawan sampai wajahnya didaftarkan ulang.
+USE hrd_absensi;
+
+ALTER TABLE karyawan
+    ADD COLUMN face_color_order CHAR(3) NULL AFTER face_embedding;
+
+UPDATE karyawan SET face_color_order = 'RGB' WHERE face_embedding IS NOT NULL;